@@ -0,0 +1,63 @@
+# cache_consistency_check.py
+
+"""
+结果缓存一致性检查：
+- 同一 (配置, 种子, 玩家数, 局数) 先完整运行一次（写入缓存），再运行一次命中缓存
+- 比较两次的全部输出：JSON_DIR 下的日志文件逐字节比较，Excel 报表按单元格内容比较（xlsx 文件内含写出时间，不做字节比较）
+- 任一文件不一致即说明缓存恢复路径与原运行不等价（如 JSON 字符串键未还原）
+"""
+
+import os
+import glob
+from config import JSON_DIR, EXCEL_DIR, DEBUG_DIR, DEFAULT_SIMULATION_CONFIG
+from result_cache import ResultCache, make_cache_key
+
+CHECK_ROUNDS = 15
+CHECK_PLAYERS = 6
+CHECK_SEED = 7
+
+
+def collect_outputs() -> dict:
+    import pandas as pd
+
+    outputs = {}
+    for path in sorted(glob.glob(os.path.join(JSON_DIR, "*"))):
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                outputs[os.path.relpath(path)] = f.read()
+    for path in sorted(glob.glob(os.path.join(EXCEL_DIR, "*.xlsx")) + glob.glob(os.path.join(DEBUG_DIR, "*.xlsx"))):
+        outputs[os.path.relpath(path)] = pd.read_excel(path, sheet_name=None)
+    return outputs
+
+def _same(a, b) -> bool:
+    if isinstance(a, bytes) or isinstance(b, bytes):
+        return a == b
+    return a.keys() == b.keys() and all(a[sheet].equals(b[sheet]) for sheet in a)
+
+
+# ✅ 返回不一致的文件列表（空列表表示命中缓存的输出与完整运行完全一致）
+def check_cache_consistency(rounds: int = CHECK_ROUNDS, num_players: int = CHECK_PLAYERS, seed: int = CHECK_SEED) -> list:
+    from fast_simulation import run_simulation
+
+    cache = ResultCache()
+    cache.remove(make_cache_key(DEFAULT_SIMULATION_CONFIG, seed, num_players, rounds, runner="fast_simulation"))
+
+    run_simulation(rounds, num_players, seed=seed, use_cache=True)
+    fresh = collect_outputs()
+    run_simulation(rounds, num_players, seed=seed, use_cache=True)
+    cached = collect_outputs()
+
+    names = sorted(set(fresh) | set(cached))
+    return [name for name in names if name not in fresh or name not in cached or not _same(fresh[name], cached[name])]
+
+
+def main():
+    print(f"\n🔍 结果缓存一致性检查：{CHECK_ROUNDS} 局 × {CHECK_PLAYERS} 名玩家，种子 {CHECK_SEED}...")
+    mismatched = check_cache_consistency()
+    if mismatched:
+        print(f"⚠️ 命中缓存的输出与完整运行不一致：{', '.join(mismatched)}")
+    else:
+        print("✅ 命中缓存的输出与完整运行完全一致")
+
+if __name__ == "__main__":
+    main()
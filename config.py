@@ -1,5 +1,7 @@
 # config.py
 
+from dataclasses import dataclass, asdict, replace
+
 # 赔率配置
 PAYOUT_RATES = {
     1: 5,
@@ -41,18 +43,104 @@ MEMORY_DECAY_ALPHA = 0.3 # 衰减函数参数，控制遗忘速度
 # 最近计算RTP的局数
 RECENT_RTP_WINDOW = 30  # 默认使用最近100局计算 RTP
 
+# ✅ 玩家逐局投注 / 返奖历史（PlayerStats.history）的保留方式，模拟本身不读取该历史
+# "off"：不保留（默认，每个玩家内存恒定）；"ring"：只保留最近 PLAYER_HISTORY_LIMIT 局；"columnar"：全量保留为 float64 分块数组
+PLAYER_HISTORY_MODE = "off"
+PLAYER_HISTORY_LIMIT = 1000
+PLAYER_HISTORY_CHUNK_SIZE = 256      # 分块大小（局）；满块冻结后在 copy() 副本间共享
+
+# ✅ 长时运行（下注回放 / 收敛判停）的状态历史：水池逐笔流水只保留最近 N 条，玩家逐局 RTP 历史（state["rtp_history"]）不保留
+LONG_RUN_POOL_HISTORY_LIMIT = 1000
+
+# ✅ 玩家数达到该值时，initialize_players 改用批量列式生成（numpy 数组一次抽取全部画像，Player 为轻量视图）
+BULK_POPULATION_MIN_PLAYERS = 10_000
+
 # ✅ 控制结构筛选策略各阶段的启用状态
 ENABLE_STD_FILTER = True             # 第一阶段：RTP标准差是否启用
 ENABLE_MEMORY_FILTER = True         # 第二阶段：态势影响是否启用
 
-# 设置最大并行线程数，默认值为物理核心数的一半
+# 设置最大并行线程数，默认值为物理核心数的一半（单核机器至少保留 1 个线程）
 import os
-MAX_STRUCTURE_SIM_THREADS = os.cpu_count() // 2
+MAX_STRUCTURE_SIM_THREADS = max(1, (os.cpu_count() or 2) // 2)
+
+# ✅ 结构评估方式："threaded" 逐结构线程模拟 / "bitmask" 位掩码批量评估 / "auto" 结构数达到阈值时自动切换
+STRUCTURE_EVAL_MODE = "auto"
+BITMASK_EVAL_MIN_STRUCTURES = 32
+
+# ✅ 决策截止时间（毫秒，自请求到达起算）：超时后返回已计算部分中的最优结构并记录回退；None 表示不限时
+DECISION_DEADLINE_MS = None
+
+# ✅ 影子策略：与主策略共用同一局的结构模拟结果，只记录假设选择与平台预计盈亏（shadow_log），不参与结算
+# 每项为 (标签, 策略名, SimulationConfig 覆盖项)，策略名见 strategy.STRATEGY_REGISTRY；空元组表示不启用
+# 例：(("no_memory_filter", "three_phase", {"enable_memory_filter": False}), ("min_rtp_std", "min_rtp_std", {}))
+SHADOW_STRATEGIES = ()
 
 # 结构筛选策略容许扩展幅度
 RTP_STD_EXPAND_RATIO = 110  # 表示110%
 MEMORY_STD_EXPAND_RATIO = 110  # 表示110%
 
+# ✅ 内存探针（可选）：每 N 局采样一次各日志容器与 tracemalloc 快照
+ENABLE_MEMORY_PROBE = False
+MEMORY_PROBE_INTERVAL = 100          # 采样间隔（局）
+MEMORY_PROBE_BUDGET_MB = 2048        # 内存预算（MB），超出时发出警告
+MEMORY_PROBE_TOP_ALLOCATIONS = 3     # 每次采样记录的 tracemalloc 热点行数
+
+
+
+# ✅ 在线汇总统计：运行中累积玩家终身指标、结构选中次数与水池分位数（内存与局数无关）
+ENABLE_ONLINE_AGGREGATES = True
+ONLINE_POOL_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+
+# ✅ 平台水池水位线 → 目标 RTP（百分比, 下限, 上限）
+POOL_RTP_THRESHOLDS = (
+    # (200,   10_000_000, float("inf")),
+    # (140,   8_000_000, 10_000_000),
+    # (120,   6_000_000, 8_000_000),
+    # (97,    4_000_000, 6_000_000),
+    # (80,    2_000_000, 4_000_000),
+    # (60,    0,         2_000_000),
+    # (0,     -float("inf"), 0),
+    (105,   2_500_000, float("inf")),
+    (100,   2_000_000, 2_500_000),
+    (97,    1_500_000, 2_000_000),
+    (90,    1000_000, 1_500_000),
+    (80,    500_000, 1000_000),
+    (70,    0,          500_000),
+    (50,     -float("inf"), 0),
+)
+
+
+# ✅ 单次模拟的策略参数集合：显式传入 controller / 评分 / 指标 / 策略，便于同进程内并行多组参数
+# 未传入时各模块使用 DEFAULT_SIMULATION_CONFIG（即上方模块常量）
+@dataclass(frozen=True)
+class SimulationConfig:
+    std_threshold: float = STD_THRESHOLD
+    confidence_level: float = CONFIDENCE_LEVEL
+    minimum_bet_threshold: float = MINIMUM_BET_THRESHOLD
+    target_rtp: float = TARGET_RTP
+    attitude_target: float = ATTITUDE_TARGET
+    memory_window: int = MEMORY_WINDOW
+    memory_decay_alpha: float = MEMORY_DECAY_ALPHA
+    recent_rtp_window: int = RECENT_RTP_WINDOW
+    enable_std_filter: bool = ENABLE_STD_FILTER
+    enable_memory_filter: bool = ENABLE_MEMORY_FILTER
+    rtp_std_expand_ratio: float = RTP_STD_EXPAND_RATIO
+    memory_std_expand_ratio: float = MEMORY_STD_EXPAND_RATIO
+    pool_rtp_thresholds: tuple = POOL_RTP_THRESHOLDS
+    pool_tax_rate: float = None  # None 表示 1 - target_rtp
+
+    def with_overrides(self, **overrides) -> "SimulationConfig":
+        return replace(self, **overrides)
+
+    def get_pool_tax_rate(self) -> float:
+        return self.pool_tax_rate if self.pool_tax_rate is not None else 1.0 - self.target_rtp
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+DEFAULT_SIMULATION_CONFIG = SimulationConfig()
 
 
 BASE_OUTPUT_DIR = "simulation_output"
@@ -60,4 +148,28 @@ BASE_OUTPUT_DIR = "simulation_output"
 JSON_DIR = os.path.join(BASE_OUTPUT_DIR, "json")         # ✅ 主日志输出
 EXCEL_DIR = os.path.join(BASE_OUTPUT_DIR, "excel")       # ✅ 表格导出
 DEBUG_DIR = os.path.join(BASE_OUTPUT_DIR, "debug")       # ✅ 精算调试
-SNAPSHOT_DIR = os.path.join(BASE_OUTPUT_DIR, "snapshot_dashboard")  # ✅ 仪表盘展示输出
\ No newline at end of file
+SNAPSHOT_DIR = os.path.join(BASE_OUTPUT_DIR, "snapshot_dashboard")  # ✅ 仪表盘展示输出
+CACHE_DIR = os.path.join(BASE_OUTPUT_DIR, "cache")       # ✅ 模拟结果缓存（按配置 + 种子 + 代码版本寻址）
+WORK_QUEUE_DIR = os.path.join(BASE_OUTPUT_DIR, "work_queue")  # ✅ 分布式任务队列（多机运行时指向共享目录）
+
+# ✅ 追加式实时日志：每局结束后将新增日志逐行写入 JSON_DIR/*.jsonl，仪表盘可实时跟踪运行中的模拟
+ENABLE_LIVE_LOG = True
+
+# ✅ 定长二进制轮次存储（numpy.memmap 按 round_id 随机访问的逐局数值序列）
+ENABLE_ROUND_STORE = True
+ROUND_STORE_PATH = os.path.join(JSON_DIR, "round_store.bin")
+
+# ✅ 结果缓存：相同 (配置, 种子, 玩家数, 局数, 代码版本) 的运行直接返回缓存结果
+ENABLE_RESULT_CACHE = True
+RESULT_CACHE_MAX_MB = 512            # 缓存目录容量上限（MB），超出时按最近最少使用淘汰
+RESULT_CACHE_STORE_LOGS = True       # 是否同时缓存压缩后的完整日志（主流程命中时可直接恢复导出）
+
+# ✅ 并行导出：各报表文件由进程池并行构建与写出（export_orchestrator），关闭时顺序导出
+ENABLE_PARALLEL_EXPORT = True
+EXPORT_MAX_WORKERS = max(1, os.cpu_count() or 1)
+
+# ✅ 运行时遥测：本地 HTTP 端点以 Prometheus 文本格式输出运行指标（telemetry），默认关闭
+ENABLE_TELEMETRY = False
+TELEMETRY_HOST = "127.0.0.1"
+TELEMETRY_PORT = 9108
+PROGRESS_INTERVAL_SEC = 1.0          # 控制台进度最短打印间隔（秒）
@@ -0,0 +1,167 @@
+# convergence.py
+
+"""
+收敛驱动的模拟运行器：
+- 运行中流式维护统计量：单局平台 RTP 与水池值的 Welford 均值 / 方差、平台 RTP 的批均值（batch means）置信区间、水位带占比
+- 每局检查一次：批均值置信区间半宽达到目标精度（且批数足够）即停止，否则运行到局数上限
+- 报告实际所需局数、收敛与否以及各项统计；统计量为 O(1)，日志按局清空
+- 控制器状态按长时运行构造：不保留玩家逐局 RTP 历史，水池流水只保留最近 LONG_RUN_POOL_HISTORY_LIMIT 条，
+  内存只随玩家数增长，与局数上限无关
+"""
+
+import math
+import time
+from typing import Dict, List
+from config import DEFAULT_SIMULATION_CONFIG
+from db_logger import LogStream, use_log_stream
+from fast_simulation import build_initial_state, seed_random
+from game_round_controller import GameRoundController
+from metrics_engine import compute_z_value
+from online_stats import Welford
+
+CONVERGENCE_PLAYERS = 20
+CONVERGENCE_SEED = None
+RTP_PRECISION = 0.005       # 平台 RTP 置信区间半宽目标
+CONFIDENCE = 0.95
+BATCH_SIZE = 50             # 每批局数（批均值法消除相邻局的自相关）
+MIN_BATCHES = 10            # 至少完成的批数，避免早期方差估计偏小导致提前停止
+MAX_ROUNDS = 20_000         # 局数上限
+
+
+# ✅ 批均值：每 batch_size 局合并为一批，批 RTP = 批内总赔付 / 批内总下注；批间独立近似成立后给出置信区间
+class BatchMeans:
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        self.batches = Welford()
+        self.total_bet = 0.0
+        self.total_payout = 0.0
+        self._batch_bet = 0.0
+        self._batch_payout = 0.0
+        self._batch_rounds = 0
+
+    def update(self, bet: float, payout: float):
+        self.total_bet += bet
+        self.total_payout += payout
+        self._batch_bet += bet
+        self._batch_payout += payout
+        self._batch_rounds += 1
+        if self._batch_rounds == self.batch_size:
+            if self._batch_bet > 0:
+                self.batches.update(self._batch_payout / self._batch_bet)
+            self._batch_bet, self._batch_payout, self._batch_rounds = 0.0, 0.0, 0
+
+    @property
+    def estimate(self) -> float:
+        return self.total_payout / self.total_bet if self.total_bet > 0 else 0.0
+
+    def half_width(self, confidence: float = CONFIDENCE) -> float:
+        k = self.batches.count
+        if k < 2:
+            return float("inf")
+        return compute_z_value(confidence) * self.batches.std / math.sqrt(k)
+
+
+# ✅ 水位带占比：按 pool_rtp_thresholds 统计每局结算后水池所在的带
+class BandOccupancy:
+    def __init__(self, pool_rtp_thresholds):
+        self.bands = sorted((tuple(t) for t in pool_rtp_thresholds), key=lambda t: t[1])
+        self.counts = [0] * len(self.bands)
+
+    def update(self, pool_value: float):
+        for i, (_, low, high) in enumerate(self.bands):
+            if low <= pool_value < high:
+                self.counts[i] += 1
+                return
+
+    def fractions(self) -> List[Dict]:
+        total = sum(self.counts) or 1
+        return [
+            {"target_rtp": rtp / 100.0, "low": low, "high": high, "fraction": c / total}
+            for (rtp, low, high), c in zip(self.bands, self.counts)
+        ]
+
+
+def run_until_converged(
+    sim_config=None,
+    num_players: int = CONVERGENCE_PLAYERS,
+    seed: int = CONVERGENCE_SEED,
+    precision: float = RTP_PRECISION,
+    confidence: float = CONFIDENCE,
+    batch_size: int = BATCH_SIZE,
+    min_batches: int = MIN_BATCHES,
+    max_rounds: int = MAX_ROUNDS,
+    progress: bool = False
+) -> Dict:
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+    if seed is not None:
+        seed_random(seed)
+    state = build_initial_state(num_players, sim_config=cfg, bounded_history=True)
+    controller = GameRoundController(state)
+    logs = LogStream()
+
+    round_rtp, pool_stats = Welford(), Welford()
+    platform_rtp = BatchMeans(batch_size)
+    occupancy = BandOccupancy(cfg.pool_rtp_thresholds)
+    converged = False
+    start = time.time()
+
+    while controller.round_id < max_rounds:
+        with use_log_stream(logs):
+            controller.initialize_round()
+            controller.prepare_round_data()
+            controller.simulate_structures()
+            controller.choose_final_structure()
+            controller.settle_outcome()
+            controller.finalize_round()
+        logs.clear()
+
+        summary = state["_summary"]
+        bet, payout = summary["total_bet_amount_platform"], summary["total_payout_amount_platform"]
+        if bet > 0:
+            round_rtp.update(payout / bet)
+        platform_rtp.update(bet, payout)
+        pool_value = controller.pool.get_pool_value()
+        pool_stats.update(pool_value)
+        occupancy.update(pool_value)
+
+        half_width = platform_rtp.half_width(confidence)
+        if progress and controller.round_id % batch_size == 0:
+            print(
+                f"\r已完成 {controller.round_id} 局，RTP {platform_rtp.estimate:.4f} ± {half_width:.4f}，用时 {time.time() - start:.1f} 秒",
+                end="", flush=True
+            )
+        if platform_rtp.batches.count >= min_batches and half_width <= precision:
+            converged = True
+            break
+
+    return {
+        "converged": converged,
+        "rounds": controller.round_id,
+        "precision_target": precision,
+        "confidence": confidence,
+        "platform_rtp": platform_rtp.estimate,
+        "platform_rtp_half_width": platform_rtp.half_width(confidence),
+        "batches": platform_rtp.batches.count,
+        "round_rtp_mean": round_rtp.mean,
+        "round_rtp_std": round_rtp.std,
+        "pool_mean": pool_stats.mean,
+        "pool_std": pool_stats.std,
+        "pool_final": controller.pool.get_pool_value(),
+        "band_occupancy": occupancy.fractions(),
+        "elapsed_sec": time.time() - start
+    }
+
+
+def main():
+    print(f"\n🎯 收敛模式启动：目标 RTP 精度 ±{RTP_PRECISION}（{CONFIDENCE:.0%}），上限 {MAX_ROUNDS} 局...")
+    report = run_until_converged(progress=True)
+    status = "已收敛" if report["converged"] else "达到局数上限仍未收敛"
+    print(
+        f"\n✅ {status}：共 {report['rounds']} 局（{report['batches']} 批），平台 RTP {report['platform_rtp']:.4f} "
+        f"± {report['platform_rtp_half_width']:.4f}，水池均值 {report['pool_mean']:,.0f}，用时 {report['elapsed_sec']:.1f} 秒"
+    )
+    for band in report["band_occupancy"]:
+        print(f"  [{band['low']:>12,.0f}, {band['high']:>12,.0f}) 目标 {band['target_rtp']:.2f}：{band['fraction']:.1%}")
+
+if __name__ == "__main__":
+    main()
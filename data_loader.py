@@ -1,9 +1,87 @@
 import os
 import json
 import pandas as pd
-from config import JSON_DIR
+from config import JSON_DIR, SNAPSHOT_DIR, ROUND_STORE_PATH
 from metrics_engine import aggregate_area_totals
 
+STRUCTURE_COLUMNS = [
+    "轮次", "结构", "RTP_STD", "态势STD", "相关投注", "预计赔付", "系统盈亏",
+    "第一轮", "第二轮", "第三轮",
+]
+PLAYER_COLUMNS = [
+    "轮次", "玩家ID", "总投注", "返奖", "净盈亏", "充值", "态势",
+    "记忆盈亏", "记忆均注", "历史RTP", "当局RTP"
+] + [f"区域{i}" for i in range(1, 9)]
+
+
+# 单局结构模拟结果行（rtp / 态势 STD 按 (轮次, 结构ID) 关联）
+def build_structure_rows(entry: dict, rtp_map: dict, att_map: dict) -> list:
+    rows = []
+    rid = entry["round_id"]
+    for sid, s in enumerate(entry.get("structure_results_simulation_output", [])):
+        rtp_std = round(rtp_map.get((rid, sid), {}).get("rtp_std_structure_after_simulation", 0), 6)
+        att_std = round(att_map.get((rid, sid), {}).get("attitude_std_structure_after_simulation", 0), 6)
+
+        rows.append({
+            "轮次": str(rid),
+            "结构": s.get("game_areas") or s.get("areas"),
+            "RTP_STD": rtp_std,
+            "态势STD": att_std,
+            "相关投注": int(s.get("related_bet", 0)),
+            "预计赔付": int(s.get("expected_award", 0)),
+            "系统盈亏": int(s.get("profit_estimate", 0)),
+            "第一轮": int(s.get("entered_phase1", False)),
+            "第二轮": int(s.get("entered_phase2", False)),
+            "第三轮": int(s.get("entered_phase3", False)),
+        })
+    return rows
+
+# 单条玩家明细行
+def build_player_row(entry: dict) -> dict:
+    bet_map = entry.get("bet_area_distribution_player_real", {})
+    row = {
+        "轮次": str(entry["round_id"]),
+        "玩家ID": entry["player_id"],
+        "总投注": entry.get("total_bet_amount_player_real", 0),
+        "返奖": entry.get("total_payout_amount_player_real", 0),
+        "净盈亏": entry.get("net_profit_player_real", 0),
+        "充值": entry.get("recharge_amount_player_initial", 0),
+        "态势": round(entry.get("attitude_value_player_real", 0), 6),
+        "记忆盈亏": round(entry.get("memory_profit_player_real", 0), 2),
+        "记忆均注": round(entry.get("memory_avg_bet_player_real", 0)),
+        "历史RTP": round(entry.get("rtp_historical_player_real", 0), 6),
+        "当局RTP": round(entry.get("rtp_current_round_player_real", 0), 6),
+    }
+    for i in range(1, 9):
+        row[f"区域{i}"] = bet_map.get(str(i), 0)
+    return row
+
+# 单局展示字段：结构表、侧边栏概览、区域投注柱状图数据
+def enrich_round_entry(r: dict, structure_df) -> dict:
+    rid = r["round_id"]
+    r["_structure_df"] = structure_df
+    r["_sidebar_info"] = {
+        "游戏名": "PROJECT ONE",
+        "轮次": rid,
+        "参与人数": len(r.get("all_player_bets_map_platform", {})),
+        "当前水池值": r.get("pool_value_platform", 0),
+        "目标RTP": r.get("target_rtp_platform_dynamic", 0),
+        "置信度": 0.95,
+        "置信区间": r.get("rtp_confidence_bounds_active", (0, 0))
+    }
+
+    # ✅ 新增：将区域总投注额显式写入 round_data，用于柱状图展示
+    area_totals = {i: 0 for i in range(1, 9)}
+    for struct in r.get("structure_results_simulation_output", [])[:8]:
+        areas = struct.get("game_areas", [])
+        bet = struct.get("related_bet", 0)
+        for a in areas:
+            if a in area_totals:
+                area_totals[a] += bet
+    r["area_total_bets_platform"] = area_totals
+    return r
+
+
 # ✅ 仪表盘专用：按轮次构建快照数据
 def load_logs_by_round():
     # === 1. 读取 JSON 文件 ===
@@ -39,89 +117,19 @@ def load_logs_by_round():
     att_map = {(e["round_id"], e["structure_id"]): e for e in attitude_std_log}
 
     for entry in round_log:
-        rid = entry["round_id"]
-        final_areas = entry.get("winning_areas_final_result", [])
-        structures = entry.get("structure_results_simulation_output", [])
-
-        for sid, s in enumerate(structures):
-            rtp_std = round(rtp_map.get((rid, sid), {}).get("rtp_std_structure_after_simulation", 0), 6)
-            att_std = round(att_map.get((rid, sid), {}).get("attitude_std_structure_after_simulation", 0), 6)
-
-            structure_df_rows.append({
-                "轮次": str(rid),
-                "结构": s.get("game_areas") or s.get("areas"),
-                "RTP_STD": rtp_std,
-                "态势STD": att_std,
-                "相关投注": int(s.get("related_bet", 0)),
-                "预计赔付": int(s.get("expected_award", 0)),
-                "系统盈亏": int(s.get("profit_estimate", 0)),
-                "第一轮": int(s.get("entered_phase1", False)),
-                "第二轮": int(s.get("entered_phase2", False)),
-                "第三轮": int(s.get("entered_phase3", False)),
-            })
-
-    df_structure = pd.DataFrame(structure_df_rows)[:25000][[
-        "轮次", "结构", "RTP_STD", "态势STD", "相关投注", "预计赔付", "系统盈亏",
-        "第一轮", "第二轮", "第三轮",
-    ]]
-
-    # === 3. 构造玩家明细 DataFrame ===
-    player_df_rows = []
-    round_final_map = {e["round_id"]: e.get("winning_areas_final_result", []) for e in round_log}
-
-    for entry in player_log:
-        rid = entry["round_id"]
-        pid = entry["player_id"]
-        bet_map = entry.get("bet_area_distribution_player_real", {})
-
-        row = {
-            "轮次": str(rid),
-            "玩家ID": pid,
-            "总投注": entry.get("total_bet_amount_player_real", 0),
-            "返奖": entry.get("total_payout_amount_player_real", 0),
-            "净盈亏": entry.get("net_profit_player_real", 0),
-            "充值": entry.get("recharge_amount_player_initial", 0),
-            "态势": round(entry.get("attitude_value_player_real", 0), 6),
-            "记忆盈亏": round(entry.get("memory_profit_player_real", 0), 2),
-            "记忆均注": round(entry.get("memory_avg_bet_player_real", 0)),
-            "历史RTP": round(entry.get("rtp_historical_player_real", 0), 6),
-            "当局RTP": round(entry.get("rtp_current_round_player_real", 0), 6),
-        }
-        for i in range(1, 9):
-            row[f"区域{i}"] = bet_map.get(str(i), 0)
+        structure_df_rows.extend(build_structure_rows(entry, rtp_map, att_map))
 
-        player_df_rows.append(row)
+    df_structure = pd.DataFrame(structure_df_rows)[:25000][STRUCTURE_COLUMNS]
 
-    col_order = [
-        "轮次", "玩家ID", "总投注", "返奖", "净盈亏", "充值", "态势",
-        "记忆盈亏", "记忆均注", "历史RTP", "当局RTP"
-    ] + [f"区域{i}" for i in range(1, 9)]
-    df_player = pd.DataFrame(player_df_rows)[col_order]
+    # === 3. 构造玩家明细 DataFrame ===
+    player_df_rows = [build_player_row(entry) for entry in player_log]
+    df_player = pd.DataFrame(player_df_rows)[PLAYER_COLUMNS]
 
     # === 4. 构造返回结构 ===
     round_dict = {}
     for r in round_log:
         rid = r["round_id"]
-        r["_structure_df"] = df_structure[df_structure["轮次"] == str(rid)]
-        r["_sidebar_info"] = {
-            "游戏名": "PROJECT ONE",
-            "轮次": rid,
-            "参与人数": len(r.get("all_player_bets_map_platform", {})),
-            "当前水池值": r.get("pool_value_platform", 0),
-            "目标RTP": r.get("target_rtp_platform_dynamic", 0),
-            "置信度": 0.95,
-            "置信区间": r.get("rtp_confidence_bounds_active", (0, 0))
-        }
-
-        # ✅ 新增：将区域总投注额显式写入 round_data，用于柱状图展示
-        area_totals = {i: 0 for i in range(1, 9)}
-        for struct in r.get("structure_results_simulation_output", [])[:8]:
-            areas = struct.get("game_areas", [])
-            bet = struct.get("related_bet", 0)
-            for a in areas:
-                if a in area_totals:
-                    area_totals[a] += bet
-        r["area_total_bets_platform"] = area_totals
+        enrich_round_entry(r, df_structure[df_structure["轮次"] == str(rid)])
         round_dict[rid] = r
 
     player_dict = {}
@@ -142,3 +150,206 @@ def load_logs_by_round():
         round_dict[int(rid)]["_player_df"] = df.drop(columns=["轮次"])
         
     return round_dict, player_dict, sorted(round_dict.keys())
+
+
+# ✅ 趋势视图：从 round_log / player_log 构建多分辨率金字塔，按源文件修改时间缓存为 .npz
+TREND_PYRAMID_FILE = "trend_pyramids.npz"
+
+# 趋势序列逐局累加（批量加载与实时跟踪共用）
+class TrendSeriesBuilder:
+    def __init__(self):
+        self.rounds = []
+        self.series = {"水池值": [], "目标RTP": [], "当局平台RTP": [], "累计平台RTP": [], "玩家平均RTP": []}
+        self._bet_sum = 0.0
+        self._payout_sum = 0.0
+
+    def add(self, entry: dict, player_entries: list):
+        bet = entry.get("total_bet_amount_platform", 0)
+        payout = entry.get("total_payout_amount_platform", 0)
+        self._bet_sum += bet
+        self._payout_sum += payout
+        player_rtps = [p.get("rtp_historical_player_real", 0) for p in player_entries]  # 当局下注玩家的历史 RTP 均值
+
+        self.rounds.append(entry["round_id"])
+        self.series["水池值"].append(entry.get("pool_value_platform", 0))
+        self.series["目标RTP"].append(entry.get("target_rtp_platform_dynamic", 0))
+        self.series["当局平台RTP"].append(payout / bet if bet > 0 else 0.0)
+        self.series["累计平台RTP"].append(self._payout_sum / self._bet_sum if self._bet_sum > 0 else 0.0)
+        self.series["玩家平均RTP"].append(sum(player_rtps) / len(player_rtps) if player_rtps else 0.0)
+
+def build_trend_series(round_log: list, player_log: list) -> tuple:
+    players_by_round = {}
+    for p in player_log:
+        players_by_round.setdefault(p["round_id"], []).append(p)
+    builder = TrendSeriesBuilder()
+    for entry in round_log:
+        builder.add(entry, players_by_round.get(entry["round_id"], []))
+    return builder.rounds, builder.series
+
+def load_trend_pyramids() -> dict:
+    from downsample import build_pyramids, save_pyramids, load_pyramids
+
+    round_json = os.path.join(JSON_DIR, "round_log.json")
+    player_json = os.path.join(JSON_DIR, "player_log.json")
+    if not os.path.exists(round_json):
+        return {}
+    source_mtime = max(os.path.getmtime(p) for p in (round_json, player_json) if os.path.exists(p))
+
+    cache_path = os.path.join(SNAPSHOT_DIR, TREND_PYRAMID_FILE)
+    if os.path.exists(cache_path):
+        pyramids, meta = load_pyramids(cache_path)
+        if meta.get("source_mtime") == source_mtime:
+            return pyramids
+
+    with open(round_json, "r", encoding="utf-8") as f:
+        round_log = json.load(f)
+    player_log = []
+    if os.path.exists(player_json):
+        with open(player_json, "r", encoding="utf-8") as f:
+            player_log = json.load(f)
+
+    rounds, series = build_trend_series(round_log, player_log)
+    pyramids = build_pyramids(rounds, series)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    save_pyramids(cache_path, pyramids, source_mtime=source_mtime)
+    return pyramids
+
+
+# ✅ 追加式日志跟随器：记住已读字节偏移，只解析新增的完整行；文件被截断或重写时从头读取
+HEAD_SIGNATURE_BYTES = 256
+
+class JsonlFollower:
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self._head = b""
+
+    def _read_head(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read(HEAD_SIGNATURE_BYTES)
+
+    # 文件比已读位置短，或开头内容变化（新一轮模拟重写了文件）
+    def was_reset(self) -> bool:
+        if not os.path.exists(self.path):
+            return self.offset > 0
+        if os.path.getsize(self.path) < self.offset:
+            return True
+        return self.offset > 0 and not self._read_head().startswith(self._head[:self.offset])
+
+    def reset(self):
+        self.offset = 0
+        self._head = b""
+
+    def read_new(self) -> list:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []  # 只有未写完的半行，等待下次刷新
+        chunk = data[:end + 1]
+        if self.offset < HEAD_SIGNATURE_BYTES:
+            self._head = (self._head + chunk)[:HEAD_SIGNATURE_BYTES]
+        self.offset += len(chunk)
+        return [json.loads(line) for line in chunk.decode("utf-8").splitlines() if line.strip()]
+
+
+# ✅ 实时轮次索引：增量合并新增日志，结构与 load_logs_by_round 的返回值一致；刷新代价只与新增局数相关
+class LiveRoundIndex:
+    def __init__(self, directory: str = JSON_DIR):
+        self.followers = {
+            name: JsonlFollower(os.path.join(directory, f"{name}.jsonl"))
+            for name in ("rtp_std_log", "attitude_std_log", "player_log", "round_log")
+        }
+        self._reset_state()
+
+    def _reset_state(self):
+        self.round_dict = {}
+        self.player_dict = {}
+        self.round_ids = []
+        self.trend = TrendSeriesBuilder()
+        self._pending = []          # 已读到平台日志、明细尚未齐全的局（按顺序）
+        self._rtp_map = {}
+        self._att_map = {}
+        self._pyramid_builders = {}
+        self._pyramid_rounds = 0    # 已并入金字塔的局数
+
+    # 返回本次新增的局数
+    def refresh(self) -> int:
+        if any(f.was_reset() for f in self.followers.values()):
+            for f in self.followers.values():
+                f.reset()
+            self._reset_state()
+
+        # 写入顺序为明细在前、round_log 在后：先读 round_log，再读明细，读到的每一局其明细都已落盘
+        self._pending.extend(self.followers["round_log"].read_new())
+        # 已完成的局不再接收迟到的结构明细（避免在映射中长期残留）
+        for e in self.followers["rtp_std_log"].read_new():
+            if e["round_id"] not in self.round_dict:
+                self._rtp_map[(e["round_id"], e["structure_id"])] = e
+        for e in self.followers["attitude_std_log"].read_new():
+            if e["round_id"] not in self.round_dict:
+                self._att_map[(e["round_id"], e["structure_id"])] = e
+        for p in self.followers["player_log"].read_new():
+            self.player_dict.setdefault(p["round_id"], []).append(p)
+
+        added = 0
+        while self._pending and self._details_ready(self._pending[0]):
+            self._add_round(self._pending.pop(0))
+            added += 1
+        return added
+
+    # 明细齐全：每名下注玩家一条玩家日志，且至少一条结构 RTP 明细（无结构时不要求）
+    def _details_ready(self, r: dict) -> bool:
+        rid = r["round_id"]
+        if len(self.player_dict.get(rid, [])) < len(r.get("all_player_bets_map_platform") or {}):
+            return False
+        structures = r.get("structure_results_simulation_output") or []
+        return not structures or any((rid, sid) in self._rtp_map for sid in range(len(structures)))
+
+    def _add_round(self, r: dict):
+        rid = r["round_id"]
+        structure_df = pd.DataFrame(build_structure_rows(r, self._rtp_map, self._att_map), columns=STRUCTURE_COLUMNS)
+        for sid in range(len(r.get("structure_results_simulation_output", []))):
+            self._rtp_map.pop((rid, sid), None)
+            self._att_map.pop((rid, sid), None)
+        enrich_round_entry(r, structure_df)
+
+        players = self.player_dict.get(rid, [])
+        if players:
+            df = pd.DataFrame([build_player_row(p) for p in players])[PLAYER_COLUMNS]
+            r["_player_df"] = df.drop(columns=["轮次"])
+
+        self.round_dict[rid] = r
+        self.round_ids.append(rid)
+        self.trend.add(r, players)
+
+    # 趋势金字塔增量追加：只并入上次调用以来的新局
+    def trend_pyramids(self) -> dict:
+        from downsample import PyramidBuilder
+
+        if not self.round_ids:
+            return {}
+        start = self._pyramid_rounds
+        for name, values in self.trend.series.items():
+            builder = self._pyramid_builders.setdefault(name, PyramidBuilder())
+            builder.append(self.trend.rounds[start:], values[start:])
+        self._pyramid_rounds = len(self.trend.rounds)
+        return {name: builder.pyramid() for name, builder in self._pyramid_builders.items()}
+
+
+# ✅ 定长轮次存储：memmap 读取逐局数值序列（不存在时返回 None）
+def load_round_store():
+    from round_store import RoundStore
+
+    if not os.path.exists(ROUND_STORE_PATH):
+        return None
+    return RoundStore(ROUND_STORE_PATH)
+
+# 任意轮次区间的标量字段 → DataFrame（只读取所选区间）
+def round_store_frame(store, start_round: int = None, end_round: int = None) -> pd.DataFrame:
+    view = store.slice(start_round, end_round)
+    scalar_names = [name for name in view.dtype.names if view.dtype[name].shape == ()]
+    return pd.DataFrame({name: view[name] for name in scalar_names})
@@ -3,14 +3,72 @@
 """
 统一日志记录模块（字段标准化版 + 全语义精确命名）：
 - 所有字段命名需表达唯一含义与归属职责
+- 条目为 __slots__ 记录（log_records），模式即下方 REQUIRED_*_FIELDS；支持字典式读取，导出时再转为字典
 """
 
+import os
+import json
+from contextlib import contextmanager
+from log_records import record_type, json_default
+
 # ✅ 全局日志容器（运行时内存存储）
 round_log = []          # 每局结构&开奖信息（平台维度）
 player_log = []         # 每局玩家结算明细（玩家真实）
 rtp_std_log = []        # 每局结构RTP标准差分析（结构模拟）
 attitude_std_log = []   # 每局结构态势标准差分析（结构模拟）
 confidence_log = []  # ✅ 每局置信区间计算的详细日志
+shadow_log = []         # 每局影子策略的假设选择与预计盈亏（紧凑格式）
+
+
+# ✅ 日志流：一组独立的日志容器（多房间场景下每个房间一组）
+class LogStream:
+    def __init__(self, round_log=None, player_log=None, rtp_std_log=None, attitude_std_log=None, confidence_log=None, shadow_log=None):
+        self.round_log = round_log if round_log is not None else []
+        self.player_log = player_log if player_log is not None else []
+        self.rtp_std_log = rtp_std_log if rtp_std_log is not None else []
+        self.attitude_std_log = attitude_std_log if attitude_std_log is not None else []
+        self.confidence_log = confidence_log if confidence_log is not None else []
+        self.shadow_log = shadow_log if shadow_log is not None else []
+
+    def all_logs(self) -> dict:
+        return {
+            "round_log": self.round_log,
+            "player_log": self.player_log,
+            "rtp_std_log": self.rtp_std_log,
+            "attitude_std_log": self.attitude_std_log,
+            "confidence_log": self.confidence_log,
+            "shadow_log": self.shadow_log
+        }
+
+    def backlog_size(self) -> int:
+        return sum(len(v) for v in self.all_logs().values())
+
+    def clear(self):
+        for v in self.all_logs().values():
+            v.clear()
+
+
+# 默认日志流直接包装上面的全局容器，保证 `from db_logger import round_log` 的旧用法不变
+default_log_stream = LogStream(round_log, player_log, rtp_std_log, attitude_std_log, confidence_log, shadow_log)
+_active_stream = default_log_stream
+
+def get_active_log_stream() -> LogStream:
+    return _active_stream
+
+def set_active_log_stream(stream: LogStream) -> LogStream:
+    global _active_stream
+    previous = _active_stream
+    _active_stream = stream if stream is not None else default_log_stream
+    return previous
+
+# ✅ 在 with 块内把所有 log_* 写入指定日志流，退出后恢复
+@contextmanager
+def use_log_stream(stream: LogStream):
+    previous = set_active_log_stream(stream)
+    try:
+        yield stream
+    finally:
+        set_active_log_stream(previous)
 
 # ✅ 精算日志：置信区间计算明细
 def log_confidence_bounds_details(
@@ -21,30 +79,17 @@ def log_confidence_bounds_details(
     std_bounds: tuple,
     player_contributions: list  # 仅包含 player_id, equivalent_rounds, weighted_contribution
 ):
-    # ✅ 从已有 player_log 中提取 recent_bet_sum 和 current_bet，确保数据一致性
-    player_data_map = {
-        (x["round_id"], x["player_id"]): x for x in player_log
-    }
-
-    enriched_contributions = []
-    for contrib in player_contributions:
-        pid = contrib["player_id"]
-        pdata = player_data_map.get((round_id, pid), {})
-        enriched_contributions.append({
-            "player_id": pid,
-            "equivalent_rounds": contrib.get("equivalent_rounds"),
-            "weighted_contribution": contrib.get("weighted_contribution")
-        })
-
-    confidence_log.append({
-        "round_id": round_id,
-        "base_std_input": base_std,
-        "confidence_level_input": confidence_level,
-        "sample_size_equivalent": sample_size,
-        "std_bounds_low": std_bounds[0],
-        "std_bounds_high": std_bounds[1],
-        "player_contributions": enriched_contributions
-    })
+    enriched_contributions = [ConfidenceContributionRecord.from_mapping(contrib) for contrib in player_contributions]
+
+    _active_stream.confidence_log.append(ConfidenceLogRecord(
+        round_id=round_id,
+        base_std_input=base_std,
+        confidence_level_input=confidence_level,
+        sample_size_equivalent=sample_size,
+        std_bounds_low=std_bounds[0],
+        std_bounds_high=std_bounds[1],
+        player_contributions=enriched_contributions
+    ))
 
 # 主要日志之一：平台视角
 def log_round_summary(
@@ -57,7 +102,8 @@ def log_round_summary(
     structures: list = None,
     pool_value: float = None,
     target_rtp: float = None,
-    std_bounds: tuple = None
+    std_bounds: tuple = None,
+    decision_fallback: list = None
 ):
     EXCLUDE_KEYS = {"simulated_players"}
     clean_structures = []
@@ -67,20 +113,29 @@ def log_round_summary(
             s_clean.pop(k, None)
         clean_structures.append(s_clean)
 
-    entry = {
-        "round_id": round_id,
-        "all_player_bets_map_platform": player_bets,
-        "area_total_bets_platform": area_totals,
-        "winning_areas_final_result": winning_areas,
-        "total_bet_amount_platform": total_bet,
-        "total_payout_amount_platform": total_payout,
-        "net_profit_platform": total_bet - total_payout,
-        "structure_results_simulation_output": clean_structures,
-        "pool_value_platform": pool_value,
-        "target_rtp_platform_dynamic": target_rtp,
-        "rtp_confidence_bounds_active": std_bounds
-    }
-    round_log.append(entry)
+    entry = RoundLogRecord(
+        round_id=round_id,
+        all_player_bets_map_platform=player_bets,
+        area_total_bets_platform=area_totals,
+        winning_areas_final_result=winning_areas,
+        total_bet_amount_platform=total_bet,
+        total_payout_amount_platform=total_payout,
+        net_profit_platform=total_bet - total_payout,
+        structure_results_simulation_output=clean_structures,
+        pool_value_platform=pool_value,
+        target_rtp_platform_dynamic=target_rtp,
+        rtp_confidence_bounds_active=std_bounds,
+        decision_fallback_reasons=list(decision_fallback or [])  # 限时决策回退记录（空表示完整计算）
+    )
+    _active_stream.round_log.append(entry)
+
+# ✅ 影子策略日志：每局一条，shadows = {标签: [structure_id, 平台预计盈亏]}（未选出结构时为 [None, None]）
+def log_shadow_decisions(round_id: int, primary_structure_id, shadows: dict):
+    _active_stream.shadow_log.append(ShadowLogRecord(
+        round_id=round_id,
+        primary_structure_id=primary_structure_id,
+        shadows={label: list(choice) for label, choice in shadows.items()}
+    ))
 
 # 主要日志之一：玩家视角
 def log_player_detail(
@@ -98,23 +153,23 @@ def log_player_detail(
     stat_players: dict  # ✅ 新增参数
 ):
     recent_bets_list = list(stat_players[player_id].recent_bets)
-    entry = {
-        "round_id": round_id,
-        "player_id": player_id,
-        "bet_area_distribution_player_real": area_bets,
-        "total_bet_amount_player_real": total_bet,
-        "total_payout_amount_player_real": payout,
-        "net_profit_player_real": payout - total_bet,
-        "recharge_amount_player_initial": recharge,
-        "attitude_value_player_real": attitude,
-        "memory_profit_player_real": memory_profit,
-        "memory_avg_bet_player_real": memory_avg_bet,
-        "rtp_historical_player_real": rtp,
-        "rtp_current_round_player_real": current_rtp,
-        "recent_bet_sum": sum(recent_bets_list),
-        "past_bet_sum": sum(recent_bets_list[:-1]) if len(recent_bets_list) > 1 else 0
-    }
-    player_log.append(entry)
+    entry = PlayerLogRecord(
+        round_id=round_id,
+        player_id=player_id,
+        bet_area_distribution_player_real=area_bets,
+        total_bet_amount_player_real=total_bet,
+        total_payout_amount_player_real=payout,
+        net_profit_player_real=payout - total_bet,
+        recharge_amount_player_initial=recharge,
+        attitude_value_player_real=attitude,
+        memory_profit_player_real=memory_profit,
+        memory_avg_bet_player_real=memory_avg_bet,
+        rtp_historical_player_real=rtp,
+        rtp_current_round_player_real=current_rtp,
+        recent_bet_sum=sum(recent_bets_list),
+        past_bet_sum=sum(recent_bets_list[:-1]) if len(recent_bets_list) > 1 else 0
+    )
+    _active_stream.player_log.append(entry)
 
 
 # ✅ 精算日志：结构RTP_std分析
@@ -128,21 +183,16 @@ def log_rtp_std_details(
     player_details: list,
     game_areas: list  # ✅ 新增
 ):
-    rtp_std_log.append({
-        "round_id": round_id,
-        "structure_id": structure_id,
-        "game_areas": game_areas,  # ✅ 修复字段缺失
-        "expected_rtp_structure_simulation": expected_rtp,
-        "rtp_std_structure_after_simulation": rtp_std,
-        "rtp_total_weight_structure_simulated": total_weight,
-        "rtp_total_variance_structure_simulated": total_var,
-        "rtp_effects_per_player_simulated": [
-            {
-                **p,
-                "total_bet_amount_player_simulated": p["total_bet_amount_player_simulated"]
-            } for p in player_details
-        ]
-    })
+    _active_stream.rtp_std_log.append(RtpStdLogRecord(
+        round_id=round_id,
+        structure_id=structure_id,
+        game_areas=game_areas,  # ✅ 修复字段缺失
+        expected_rtp_structure_simulation=expected_rtp,
+        rtp_std_structure_after_simulation=rtp_std,
+        rtp_total_weight_structure_simulated=total_weight,
+        rtp_total_variance_structure_simulated=total_var,
+        rtp_effects_per_player_simulated=[RtpEffectRecord.from_mapping(p) for p in player_details]
+    ))
 
 # ✅ 精算日志：结构态势_std分析
 def log_attitude_std_details(
@@ -152,36 +202,34 @@ def log_attitude_std_details(
     player_details: list,
     game_areas: list  # ✅ 新增
 ):
-    attitude_std_log.append({
-        "round_id": round_id,
-        "structure_id": structure_id,
-        "game_areas": game_areas,  # ✅ 修复字段缺失
-        "attitude_std_structure_after_simulation": attitude_std,
-        "attitude_effects_per_player_simulated": [
-            {
-                **p,
-                "total_bet_amount_player_simulated": p["total_bet_amount_player_simulated"]
-            } for p in player_details
-        ]
-    })
+    _active_stream.attitude_std_log.append(AttitudeStdLogRecord(
+        round_id=round_id,
+        structure_id=structure_id,
+        game_areas=game_areas,  # ✅ 修复字段缺失
+        attitude_std_structure_after_simulation=attitude_std,
+        attitude_effects_per_player_simulated=[AttitudeEffectRecord.from_mapping(p) for p in player_details]
+    ))
 
 # ---------------------
-# ✅ [日志字段校验区：用于导出前清理]
+# ✅ [日志字段模式区：各记录类型的字段即下列列表]
 # ---------------------
 REQUIRED_CONFIDENCE_LOG_FIELDS = [
     "round_id", "base_std_input", "confidence_level_input",
     "sample_size_equivalent", "std_bounds_low", "std_bounds_high", "player_contributions"
 ]
 
+REQUIRED_CONFIDENCE_CONTRIBUTION_FIELDS = ["player_id", "equivalent_rounds", "weighted_contribution"]
+
 REQUIRED_PLAYER_LOG_FIELDS = [
     "round_id", "player_id", "bet_area_distribution_player_real", "total_bet_amount_player_real", "total_payout_amount_player_real", "net_profit_player_real",
-    "memory_profit_player_real", "attitude_value_player_real", "rtp_historical_player_real", "recharge_amount_player_initial", "rtp_current_round_player_real", "memory_avg_bet_player_real"
+    "recharge_amount_player_initial", "attitude_value_player_real", "memory_profit_player_real", "memory_avg_bet_player_real",
+    "rtp_historical_player_real", "rtp_current_round_player_real", "recent_bet_sum", "past_bet_sum"
 ]
 
 REQUIRED_ROUND_LOG_FIELDS = [
     "round_id", "all_player_bets_map_platform", "area_total_bets_platform", "winning_areas_final_result",
     "total_bet_amount_platform", "total_payout_amount_platform", "net_profit_platform", "structure_results_simulation_output",
-    "pool_value_platform", "target_rtp_platform_dynamic", "rtp_confidence_bounds_active"
+    "pool_value_platform", "target_rtp_platform_dynamic", "rtp_confidence_bounds_active", "decision_fallback_reasons"
 ]
 
 REQUIRED_RTP_STD_LOG_FIELDS = [
@@ -193,29 +241,93 @@ REQUIRED_ATTITUDE_STD_LOG_FIELDS = [
     "round_id", "structure_id", "game_areas", "attitude_std_structure_after_simulation", "attitude_effects_per_player_simulated"
 ]
 
-# 字段工具
-def sanitize_logs():
-    for entry in confidence_log:
-        for k in list(entry):
-            if k not in REQUIRED_CONFIDENCE_LOG_FIELDS:
-                del entry[k]
-                
-    for entry in player_log:
-        for k in list(entry):
-            if k not in REQUIRED_PLAYER_LOG_FIELDS:
-                del entry[k]
-
-    for entry in round_log:
-        for k in list(entry):
-            if k not in REQUIRED_ROUND_LOG_FIELDS:
-                del entry[k]
-
-    for entry in rtp_std_log:
-        for k in list(entry):
-            if k not in REQUIRED_RTP_STD_LOG_FIELDS:
-                del entry[k]
-
-    for entry in attitude_std_log:
-        for k in list(entry):
-            if k not in REQUIRED_ATTITUDE_STD_LOG_FIELDS:
-                del entry[k]
+REQUIRED_RTP_EFFECT_FIELDS = [
+    "player_id", "total_bet_amount_player_simulated", "rtp_player_simulated", "rtp_diff_player_simulated",
+    "rtp_diff_sq_player_simulated", "rtp_var_contrib_player_simulated", "recent_bets_sum", "recent_payouts_sum"
+]
+
+REQUIRED_ATTITUDE_EFFECT_FIELDS = [
+    "player_id", "memory_avg_bet_player_simulated", "total_bet_amount_player_simulated", "payout_amount_player_simulated",
+    "memory_profit_player_simulated", "attitude_value_player_simulated", "attitude_diff_player_simulated",
+    "attitude_diff_sq_player_simulated", "attitude_var_contrib_player_simulated", "recharge_weight_player_simulated"
+]
+
+REQUIRED_SHADOW_LOG_FIELDS = ["round_id", "primary_structure_id", "shadows"]
+
+ConfidenceLogRecord = record_type("ConfidenceLogRecord", REQUIRED_CONFIDENCE_LOG_FIELDS, __name__)
+ConfidenceContributionRecord = record_type("ConfidenceContributionRecord", REQUIRED_CONFIDENCE_CONTRIBUTION_FIELDS, __name__)
+PlayerLogRecord = record_type("PlayerLogRecord", REQUIRED_PLAYER_LOG_FIELDS, __name__)
+RoundLogRecord = record_type("RoundLogRecord", REQUIRED_ROUND_LOG_FIELDS, __name__)
+RtpStdLogRecord = record_type("RtpStdLogRecord", REQUIRED_RTP_STD_LOG_FIELDS, __name__)
+AttitudeStdLogRecord = record_type("AttitudeStdLogRecord", REQUIRED_ATTITUDE_STD_LOG_FIELDS, __name__)
+RtpEffectRecord = record_type("RtpEffectRecord", REQUIRED_RTP_EFFECT_FIELDS, __name__)
+AttitudeEffectRecord = record_type("AttitudeEffectRecord", REQUIRED_ATTITUDE_EFFECT_FIELDS, __name__)
+ShadowLogRecord = record_type("ShadowLogRecord", REQUIRED_SHADOW_LOG_FIELDS, __name__)
+
+
+# JSON 只支持字符串键：下注区域键还原为 int（与模拟时写入的日志一致）
+def _area_keys(area_map: dict) -> dict:
+    return {int(area): value for area, value in (area_map or {}).items()}
+
+_LOG_RESTORERS = {
+    "round_log": lambda e: RoundLogRecord.from_mapping({
+        **e,
+        "all_player_bets_map_platform": {pid: _area_keys(bets) for pid, bets in (e.get("all_player_bets_map_platform") or {}).items()},
+        "area_total_bets_platform": _area_keys(e.get("area_total_bets_platform"))
+    }),
+    "player_log": lambda e: PlayerLogRecord.from_mapping({
+        **e, "bet_area_distribution_player_real": _area_keys(e.get("bet_area_distribution_player_real"))
+    }),
+    "rtp_std_log": lambda e: RtpStdLogRecord.from_mapping({
+        **e, "rtp_effects_per_player_simulated": [RtpEffectRecord.from_mapping(p) for p in e.get("rtp_effects_per_player_simulated") or []]
+    }),
+    "attitude_std_log": lambda e: AttitudeStdLogRecord.from_mapping({
+        **e, "attitude_effects_per_player_simulated": [AttitudeEffectRecord.from_mapping(p) for p in e.get("attitude_effects_per_player_simulated") or []]
+    }),
+    "confidence_log": lambda e: ConfidenceLogRecord.from_mapping({
+        **e, "player_contributions": [ConfidenceContributionRecord.from_mapping(c) for c in e.get("player_contributions") or []]
+    }),
+    "shadow_log": ShadowLogRecord.from_mapping,
+}
+
+# ✅ 从 JSON（结果缓存 / 日志文件）恢复日志条目：还原为对应记录类型与 int 区域键，导出结果与原运行一致
+def restore_log_entries(name: str, entries: list) -> list:
+    restore = _LOG_RESTORERS[name]
+    return [restore(e) for e in entries]
+
+# ✅ 追加式日志：每局结束后把日志流中新增的条目逐行写入 .jsonl（仪表盘可边跑边增量读取）
+# 明细日志先写、round_log 最后写：读到某局的平台日志时，该局明细已全部落盘
+LIVE_LOG_NAMES = ["player_log", "rtp_std_log", "attitude_std_log", "round_log"]
+
+class JsonlLogWriter:
+    def __init__(self, directory: str, stream: LogStream = None, names: list = None, truncate: bool = True):
+        self.directory = directory
+        self.stream = stream
+        self.names = names or LIVE_LOG_NAMES
+        self._written = {name: 0 for name in self.names}
+        os.makedirs(directory, exist_ok=True)
+        if truncate:
+            for name in self.names:
+                open(self.path(name), "w", encoding="utf-8").close()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.jsonl")
+
+    # 写入自上次 flush 以来新增的条目；日志流被清空时从头计数
+    # clear_stream：写入后清空日志流并重置计数（逐局落盘、内存不随局数增长）
+    def flush(self, clear_stream: bool = False) -> int:
+        stream = self.stream or _active_stream
+        logs = stream.all_logs()
+        written = 0
+        for name in self.names:
+            items = logs[name]
+            start = self._written[name] if self._written[name] <= len(items) else 0
+            if start < len(items):
+                with open(self.path(name), "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(e, ensure_ascii=False, default=json_default) + "\n" for e in items[start:]))
+                written += len(items) - start
+            self._written[name] = len(items)
+        if clear_stream:
+            stream.clear()
+            self._written = {name: 0 for name in self.names}
+        return written
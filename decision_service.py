@@ -0,0 +1,292 @@
+# decision_service.py
+
+"""
+开奖决策服务（asyncio）：
+- 接收一局下注（实时或从 round_log 的 all_player_bets_map_platform 回放），返回选中的结构
+- 决策链路：simulate_structures → choose_final_structure；结算时再更新玩家统计与水池
+- 支持进程内队列与本地 socket（逐行 JSON）两种接入方式
+- 附带压测器：按指定局/秒回放下注，统计决策延迟 p50 / p99 / p999
+"""
+
+import os
+import json
+import math
+import time
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List
+from config import JSON_DIR, DECISION_DEADLINE_MS
+from db_logger import LogStream, use_log_stream
+from fast_simulation import build_initial_state
+from game_round_controller import GameRoundController
+from platform_pool_and_generate_bet import generate_player_bets
+from player_profiles import initialize_players
+from replay_engine import validate_bets, iter_round_log_bets
+
+HOST = "127.0.0.1"
+PORT = 8765
+LOAD_RPS = 20           # 压测回放速率（局/秒）
+LOAD_ROUNDS = 200       # 压测局数
+LOAD_TRANSPORT = "queue"  # "queue" 进程内队列 / "socket" 本地 socket
+STANDIN_PLAYERS = 50    # 无 round_log 时，本地下注源的玩家数
+
+
+# 决策服务：单工作协程串行处理请求，计算放在独立线程执行，事件循环保持可响应
+class DecisionService:
+    def __init__(self, state: dict = None, keep_logs: bool = False, deadline_ms: float = DECISION_DEADLINE_MS):
+        self.state = state if state is not None else build_initial_state(0)
+        self.deadline_ms = deadline_ms
+        self.controller = GameRoundController(self.state)
+        self.logs = LogStream()
+        self.keep_logs = keep_logs
+        self.pending_settlement = False
+        self.last_settle_error = None   # 自动结算失败原因（决策已返回，无法随响应带回），随下一次决策响应上报
+        self._queue: asyncio.Queue = None
+        self._worker: asyncio.Task = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    # ✅ 进程内接入：提交请求并等待响应
+    async def submit(self, request: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future, time.perf_counter()))
+        return await future
+
+    async def decide(self, bets: Dict, auto_settle: bool = False) -> dict:
+        return await self.submit({"type": "decide", "bets": bets, "auto_settle": auto_settle})
+
+    async def settle(self) -> dict:
+        return await self.submit({"type": "settle"})
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            request, future, enqueued_at = await self._queue.get()
+            try:
+                if request.get("type") == "decide":
+                    # 截止时间自请求到达起算：突发排队时自动压缩计算预算，延迟保持有界
+                    deadline = enqueued_at + self.deadline_ms / 1000 if self.deadline_ms is not None else None
+                    result = await loop.run_in_executor(self._executor, self._decide, request.get("bets"), deadline)
+                    future.set_result(result)
+                    # 决策结果先返回，再在同一串行队列内完成结算，保证下一局使用结算后的状态
+                    if request.get("auto_settle"):
+                        try:
+                            await loop.run_in_executor(self._executor, self._settle)
+                        except Exception as e:
+                            print(f"⚠️ 第 {self.controller.round_id} 局自动结算失败：{self.last_settle_error or e}")
+                elif request.get("type") == "settle":
+                    future.set_result(await loop.run_in_executor(self._executor, self._settle))
+                else:
+                    future.set_result({"error": f"未知请求类型: {request.get('type')}"})
+            except Exception as e:  # 单个请求失败不影响服务
+                if not future.done():
+                    future.set_result({"error": str(e)})
+
+    def _decide(self, bets: Dict, deadline: float = None) -> dict:
+        if self.pending_settlement:
+            raise RuntimeError(f"第 {self.controller.round_id} 局尚未结算")
+        bets = validate_bets(bets)  # 先校验再开局：非法请求不占用局号、不影响水池与玩家统计
+        with use_log_stream(self.logs):
+            self.controller.initialize_round()
+            self.controller.prepare_round_data(bets)
+            self.controller.simulate_structures(deadline=deadline)
+            self.controller.choose_final_structure(deadline=deadline)
+        self.pending_settlement = True
+        outcome = self.state["final_outcome"]
+        response = {
+            "round_id": self.controller.round_id,
+            "game_areas": outcome.get("game_areas"),
+            "structure_id": outcome.get("structure_id"),
+            "fallback": list(self.state["decision_fallback"])
+        }
+        if self.last_settle_error:
+            response["previous_settle_error"] = self.last_settle_error
+            self.last_settle_error = None
+        return response
+
+    def _settle(self) -> dict:
+        if not self.pending_settlement:
+            raise RuntimeError("没有待结算的对局")
+        try:
+            with use_log_stream(self.logs):
+                self.controller.settle_outcome()
+                self.controller.finalize_round()
+        except Exception as e:
+            # 结算失败也释放本局，否则之后的每次决策都会因"尚未结算"被拒绝
+            self.last_settle_error = f"第 {self.controller.round_id} 局结算失败：{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.pending_settlement = False
+            if not self.keep_logs:
+                self.logs.clear()
+        return {
+            "round_id": self.controller.round_id,
+            **self.state["_summary"],
+            "pool_value_platform": self.controller.pool.get_pool_value()
+        }
+
+    # ✅ 本地 socket 接入：每行一个 JSON 请求，响应带回请求 id
+    async def serve_socket(self, host: str = HOST, port: int = PORT):
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            write_lock = asyncio.Lock()
+
+            async def send(response: dict):
+                async with write_lock:
+                    writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                    await writer.drain()
+
+            async def respond(request: dict):
+                response = await self.submit(request)
+                response["id"] = request.get("id")
+                await send(response)
+
+            tasks = []
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    tasks.append(asyncio.create_task(send({"error": f"请求不是合法 JSON：{e}", "id": None})))
+                    continue
+                if not isinstance(request, dict):
+                    tasks.append(asyncio.create_task(send({"error": "请求须为 JSON 对象", "id": None})))
+                    continue
+                tasks.append(asyncio.create_task(respond(request)))
+            await asyncio.gather(*tasks)
+            writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+# 本地 socket 客户端：按请求 id 匹配响应，允许多个请求同时在途
+class DecisionClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._reader_task = asyncio.create_task(self._read())
+
+    @classmethod
+    async def connect(cls, host: str = HOST, port: int = PORT):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _read(self):
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self._pending.pop(response.get("id"), None)
+            if future and not future.done():
+                future.set_result(response)
+
+    async def submit(self, request: dict) -> dict:
+        self._next_id += 1
+        request = {**request, "id": self._next_id}
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        self.writer.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self._reader_task.cancel()
+
+
+# ✅ 下注源：优先回放 round_log.json，否则用本地玩家画像生成（真实下注流的替身）
+def replay_round_log_bets(path: str = None) -> Iterator[Dict]:
+    for _, bets in iter_round_log_bets(path):
+        yield bets
+
+def standin_bet_feed(num_players: int = STANDIN_PLAYERS) -> Iterator[Dict]:
+    players = initialize_players(num_players)
+    round_index = 0
+    while True:
+        round_index += 1
+        yield generate_player_bets(players, round_index)
+
+
+# 最近秩分位数（毫秒样本 → p50 / p99 / p999）
+LATENCY_QUANTILES = {"p50": 0.5, "p99": 0.99, "p999": 0.999}
+
+def latency_percentiles(samples: List[float], quantiles: Dict[str, float] = LATENCY_QUANTILES) -> Dict[str, float]:
+    if not samples:
+        return {label: 0.0 for label in quantiles}
+    ordered = sorted(samples)
+    return {
+        label: ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+        for label, q in quantiles.items()
+    }
+
+
+# ✅ 压测器：开环按固定速率发出每局决策请求，延迟 = 计划发送时刻 → 收到决策（含排队）
+async def run_load_test(submit, bet_feed: Iterator[Dict], rps: float = LOAD_RPS, rounds: int = LOAD_ROUNDS) -> dict:
+    loop = asyncio.get_running_loop()
+    latencies = []
+    fallbacks = 0
+
+    async def one_round(scheduled: float, bets: Dict):
+        nonlocal fallbacks
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        response = await submit({"type": "decide", "bets": bets, "auto_settle": True})
+        if "error" not in response:
+            latencies.append((loop.time() - scheduled) * 1000)
+            fallbacks += 1 if response.get("fallback") else 0
+
+    # 下注先全部取出，避免下注生成耗时计入决策延迟
+    round_bets = list(itertools.islice(bet_feed, rounds))
+    start = loop.time()
+    tasks = [asyncio.create_task(one_round(start + i / rps, bets)) for i, bets in enumerate(round_bets)]
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+
+    return {
+        "rounds": len(latencies),
+        "target_rps": rps,
+        "achieved_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "fallback_rounds": fallbacks,
+        **{f"{k}_ms": v for k, v in latency_percentiles(latencies).items()}
+    }
+
+
+async def _main():
+    round_json = os.path.join(JSON_DIR, "round_log.json")
+    bet_feed = replay_round_log_bets(round_json) if os.path.exists(round_json) else standin_bet_feed()
+    service = await DecisionService().start()
+
+    if LOAD_TRANSPORT == "socket":
+        server = await service.serve_socket()
+        client = await DecisionClient.connect()
+        report = await run_load_test(client.submit, bet_feed)
+        await client.close()
+        server.close()
+        await server.wait_closed()
+    else:
+        report = await run_load_test(service.submit, bet_feed)
+    await service.stop()
+
+    print(
+        f"✅ 决策压测完成：{report['rounds']} 局，目标 {report['target_rps']} 局/秒，实际 {report['achieved_rps']:.1f} 局/秒，"
+        f"限时回退 {report['fallback_rounds']} 局\n"
+        f"   延迟 p50 {report['p50_ms']:.2f}ms / p99 {report['p99_ms']:.2f}ms / p999 {report['p999_ms']:.2f}ms"
+    )
+
+def main():
+    asyncio.run(_main())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# downsample.py
+
+"""
+时间序列多分辨率聚合（趋势图降采样）：
+- 每条序列构建金字塔：第 0 层为逐局原始值，之后每层把上一层每 factor 个桶合并为一个桶（min / max / 均值 / 局数）
+- 查询某个轮次区间时，选择桶数不超过 max_points 的最细一层，只切出该区间（有序数组二分定位，无需扫描）
+- 另提供 LTTB（Largest-Triangle-Three-Buckets）降采样，用于保形的单线走势
+- 金字塔可存为 .npz，仪表盘按需加载，任意长度的运行都只向浏览器发送有限个点
+"""
+
+from typing import Dict, List
+import numpy as np
+
+DOWNSAMPLE_FACTOR = 4        # 相邻两层的桶合并倍数
+TOP_LEVEL_POINTS = 512       # 最粗一层的桶数不超过该值时停止构建
+TREND_MAX_POINTS = 2000      # 单次查询返回的最大点数
+
+FIELDS = ("start", "end", "min", "max", "sum", "count")
+
+
+# ✅ 单条序列的多分辨率金字塔
+class SeriesPyramid:
+    def __init__(self, levels: List[Dict[str, np.ndarray]]):
+        self.levels = levels
+
+    @classmethod
+    def build(cls, rounds, values, factor: int = DOWNSAMPLE_FACTOR, top_points: int = TOP_LEVEL_POINTS) -> "SeriesPyramid":
+        rounds = np.asarray(rounds, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(rounds, kind="stable")
+        rounds, values = rounds[order], values[order]
+
+        levels = [{
+            "start": rounds, "end": rounds, "min": values, "max": values,
+            "sum": values, "count": np.ones(len(values), dtype=np.int64)
+        }]
+        while len(levels[-1]["start"]) > top_points:
+            prev = levels[-1]
+            idx = np.arange(0, len(prev["start"]), factor)
+            levels.append({
+                "start": prev["start"][idx],
+                "end": prev["end"][np.minimum(idx + factor, len(prev["end"])) - 1],
+                "min": np.minimum.reduceat(prev["min"], idx),
+                "max": np.maximum.reduceat(prev["max"], idx),
+                "sum": np.add.reduceat(prev["sum"], idx),
+                "count": np.add.reduceat(prev["count"], idx)
+            })
+        return cls(levels)
+
+    def __len__(self):
+        return len(self.levels[0]["start"]) if self.levels else 0
+
+    @property
+    def round_range(self) -> tuple:
+        if not len(self):
+            return (0, 0)
+        return int(self.levels[0]["start"][0]), int(self.levels[0]["end"][-1])
+
+    # ✅ 区间查询：最细且桶数 ≤ max_points 的层级；返回每桶的起止轮次与 min / max / 均值
+    def query(self, start: int = None, end: int = None, max_points: int = TREND_MAX_POINTS) -> Dict[str, np.ndarray]:
+        if not len(self):
+            return {"start": np.array([]), "end": np.array([]), "min": np.array([]), "max": np.array([]), "mean": np.array([]), "level": 0}
+        low, high = self.round_range
+        start = low if start is None else start
+        end = high if end is None else end
+
+        for level_index, level in enumerate(self.levels):
+            lo = np.searchsorted(level["end"], start, side="left")
+            hi = np.searchsorted(level["start"], end, side="right")
+            if hi - lo <= max_points or level_index == len(self.levels) - 1:
+                break
+        return {
+            "start": level["start"][lo:hi],
+            "end": level["end"][lo:hi],
+            "min": level["min"][lo:hi],
+            "max": level["max"][lo:hi],
+            "mean": level["sum"][lo:hi] / level["count"][lo:hi],
+            "level": level_index
+        }
+
+    # ✅ LTTB 查询：在原始分辨率的区间上做保形降采样（单线走势）
+    def query_lttb(self, start: int = None, end: int = None, max_points: int = TREND_MAX_POINTS):
+        base = self.levels[0]
+        low, high = self.round_range
+        lo = np.searchsorted(base["start"], low if start is None else start, side="left")
+        hi = np.searchsorted(base["start"], high if end is None else end, side="right")
+        return lttb(base["start"][lo:hi], base["sum"][lo:hi], max_points)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}/{i}/{field}": level[field] for i, level in enumerate(self.levels) for field in FIELDS}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str) -> "SeriesPyramid":
+        levels = []
+        while f"{prefix}/{len(levels)}/start" in arrays:
+            i = len(levels)
+            levels.append({field: arrays[f"{prefix}/{i}/{field}"] for field in FIELDS})
+        return cls(levels)
+
+
+# ✅ 增量金字塔：按轮次顺序追加新点，只重算各层受影响的末尾桶（代价与新增点数成正比）
+# 各层为容量倍增的缓冲区，pyramid() 返回当前长度的视图；结果与对全部点调用 SeriesPyramid.build 一致
+class PyramidBuilder:
+    def __init__(self, factor: int = DOWNSAMPLE_FACTOR, top_points: int = TOP_LEVEL_POINTS):
+        self.factor = factor
+        self.top_points = top_points
+        self._levels: List[Dict[str, np.ndarray]] = []
+        self._sizes: List[int] = []
+
+    def _add_level(self):
+        self._levels.append({
+            field: np.empty(0, dtype=np.int64 if field in ("start", "end", "count") else np.float64) for field in FIELDS
+        })
+        self._sizes.append(0)
+
+    def _reserve(self, level_index: int, size: int):
+        level = self._levels[level_index]
+        capacity = len(level["start"])
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 64)
+        used = self._sizes[level_index]
+        for field in FIELDS:
+            buffer = np.empty(new_capacity, dtype=level[field].dtype)
+            buffer[:used] = level[field][:used]
+            level[field] = buffer
+
+    # 追加的轮次须大于已有轮次（实时日志按局顺序到达）
+    def append(self, rounds, values):
+        rounds = np.asarray(rounds, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(rounds):
+            return
+        if not self._levels:
+            self._add_level()
+
+        old, size = self._sizes[0], self._sizes[0] + len(rounds)
+        self._reserve(0, size)
+        base = self._levels[0]
+        base["start"][old:size] = rounds
+        base["end"][old:size] = rounds
+        base["min"][old:size] = values
+        base["max"][old:size] = values
+        base["sum"][old:size] = values
+        base["count"][old:size] = 1
+        self._sizes[0] = size
+
+        # changed：上一层第一个发生变化的桶；本层从包含它的桶开始重算
+        changed, level_index, f = old, 1, self.factor
+        while True:
+            prev_size = self._sizes[level_index - 1]
+            if level_index == len(self._levels):
+                if prev_size <= self.top_points:
+                    break
+                self._add_level()
+                changed = 0
+            prev = self._levels[level_index - 1]
+            first = changed // f
+            size = -(-prev_size // f)
+            self._reserve(level_index, size)
+            level = self._levels[level_index]
+
+            idx = np.arange(first * f, prev_size, f)
+            segment = slice(first * f, prev_size)
+            offsets = idx - first * f
+            level["start"][first:size] = prev["start"][idx]
+            level["end"][first:size] = prev["end"][np.minimum(idx + f, prev_size) - 1]
+            level["min"][first:size] = np.minimum.reduceat(prev["min"][segment], offsets)
+            level["max"][first:size] = np.maximum.reduceat(prev["max"][segment], offsets)
+            level["sum"][first:size] = np.add.reduceat(prev["sum"][segment], offsets)
+            level["count"][first:size] = np.add.reduceat(prev["count"][segment], offsets)
+            self._sizes[level_index] = size
+            changed = first
+            level_index += 1
+
+    def pyramid(self) -> SeriesPyramid:
+        return SeriesPyramid([
+            {field: level[field][:size] for field in FIELDS} for level, size in zip(self._levels, self._sizes)
+        ])
+
+
+# ✅ LTTB：首尾点保留，中间每个桶选出与前一选中点、下一桶均值构成最大三角形的点
+def lttb(x, y, threshold: int):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean() if next_hi > next_lo else x[-1]
+        avg_y = y[next_lo:next_hi].mean() if next_hi > next_lo else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected.append(a)
+    selected.append(n - 1)
+    idx = np.array(selected)
+    return x[idx], y[idx]
+
+
+# ✅ 多条序列的金字塔集合，整体存取为一个 .npz 文件
+def build_pyramids(rounds, series: Dict[str, list], **kwargs) -> Dict[str, SeriesPyramid]:
+    return {name: SeriesPyramid.build(rounds, values, **kwargs) for name, values in series.items()}
+
+def save_pyramids(path: str, pyramids: Dict[str, SeriesPyramid], **meta):
+    arrays = {}
+    for name, pyramid in pyramids.items():
+        arrays.update(pyramid.to_arrays(name))
+    arrays["_names"] = np.array(list(pyramids.keys()))
+    for key, value in meta.items():
+        arrays[f"_meta/{key}"] = np.asarray(value)
+    np.savez(path, **arrays)
+
+def load_pyramids(path: str) -> tuple:
+    with np.load(path) as data:
+        arrays = {k: data[k] for k in data.files}
+    names = [str(n) for n in arrays.get("_names", [])]
+    meta = {k.split("/", 1)[1]: arrays[k].item() for k in arrays if k.startswith("_meta/")}
+    return {name: SeriesPyramid.from_arrays(arrays, name) for name in names}, meta
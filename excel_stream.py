@@ -0,0 +1,125 @@
+# excel_stream.py
+
+"""
+流式 Excel 导出（xlsxwriter constant_memory 模式）：
+- 逐行写入，已写完的行立即落盘，内存占用与总行数无关，无需先构建完整 DataFrame
+- 单个工作表达到 Excel 行数上限（1,048,576 行，含表头）时自动新建工作表；单文件工作表数达到上限时滚动到新文件
+- 导出结束写入清单（<文件名>.manifest.json），记录每个文件 / 工作表包含的轮次范围与行数
+"""
+
+import os
+import json
+import math
+from typing import Dict, Iterable, List, Tuple
+import xlsxwriter
+
+EXCEL_MAX_ROWS = 1_048_576       # Excel 单工作表行数上限（含表头）
+EXCEL_SHEETS_PER_FILE = 4        # 单个文件的工作表上限，超出后滚动到 *_part2.xlsx ...
+
+
+# ✅ 流式写入器：按列名写表头，逐行写入字典
+class StreamingExcelWriter:
+    def __init__(
+        self,
+        path: str,
+        columns: List[str],
+        rows_per_sheet: int = EXCEL_MAX_ROWS,
+        sheets_per_file: int = EXCEL_SHEETS_PER_FILE
+    ):
+        self.path = path
+        self.columns = list(columns)
+        self.rows_per_sheet = min(rows_per_sheet, EXCEL_MAX_ROWS)
+        self.sheets_per_file = sheets_per_file
+        self.manifest: List[Dict] = []
+        self.total_rows = 0
+
+        self._base, self._ext = os.path.splitext(path)
+        self._file_index = 0
+        self._workbook = None
+        self._sheet = None
+        self._sheet_count = 0
+        self._row = 0
+        self._header_format = None
+        self._entry = None
+
+    def _file_path(self) -> str:
+        return self.path if self._file_index == 1 else f"{self._base}_part{self._file_index}{self._ext}"
+
+    def _open_file(self):
+        self._close_file()
+        self._file_index += 1
+        self._workbook = xlsxwriter.Workbook(self._file_path(), {"constant_memory": True, "nan_inf_to_errors": True})
+        self._header_format = self._workbook.add_format({"bold": True, "border": 1, "align": "center"})
+        self._sheet_count = 0
+
+    def _close_file(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    def _open_sheet(self):
+        if self._workbook is None or self._sheet_count >= self.sheets_per_file:
+            self._open_file()
+        self._sheet_count += 1
+        self._sheet = self._workbook.add_worksheet(f"Sheet{self._sheet_count}")
+        self._sheet.write_row(0, 0, self.columns, self._header_format)
+        self._row = 1
+        self._entry = {
+            "file": os.path.basename(self._file_path()),
+            "sheet": self._sheet.name,
+            "first_round": None,
+            "last_round": None,
+            "rows": 0
+        }
+        self.manifest.append(self._entry)
+
+    # ✅ 写入一行；round_id 用于清单中的轮次范围
+    def write_row(self, row: Dict, round_id=None):
+        if self._sheet is None or self._row >= self.rows_per_sheet:
+            self._open_sheet()
+
+        for col, name in enumerate(self.columns):
+            value = row.get(name)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            if not isinstance(value, (int, float, str)):
+                value = str(value)
+            self._sheet.write(self._row, col, value)
+        self._row += 1
+        self._entry["rows"] += 1
+        self.total_rows += 1
+
+        if round_id is not None:
+            if self._entry["first_round"] is None:
+                self._entry["first_round"] = round_id
+            self._entry["last_round"] = round_id
+
+    def write_rows(self, rows: Iterable[Tuple[object, Dict]]):
+        for round_id, row in rows:
+            self.write_row(row, round_id)
+
+    # 关闭文件并写入清单；无数据时仍输出只含表头的文件
+    def close(self) -> Dict:
+        if self._sheet is None:
+            self._open_sheet()
+        self._close_file()
+        manifest = {
+            "path": os.path.basename(self.path),
+            "columns": self.columns,
+            "total_rows": self.total_rows,
+            "rows_per_sheet": self.rows_per_sheet,
+            "parts": self.manifest
+        }
+        with open(f"{self._base}.manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+
+# ✅ 便捷函数：将 (round_id, 行) 迭代器完整写入一个（或多个滚动的）Excel 文件
+def stream_rows_to_excel(path: str, columns: List[str], rows: Iterable[Tuple[object, Dict]], **kwargs) -> Dict:
+    writer = StreamingExcelWriter(path, columns, **kwargs)
+    try:
+        writer.write_rows(rows)
+    finally:
+        manifest = writer.close()
+    return manifest
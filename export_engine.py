@@ -4,15 +4,32 @@ import math
 from collections import deque, defaultdict
 from db_logger import round_log, player_log, rtp_std_log, attitude_std_log
 from config import EXCEL_DIR, DEBUG_DIR, RECENT_RTP_WINDOW
+from excel_stream import stream_rows_to_excel
 
 
 
-# 平台结构模拟明细
-def build_structure_results_df_from_log():
-    if not round_log:
-        return pd.DataFrame([])
+STRUCTURE_RESULT_COLUMNS = [
+    "轮次", "结构", "RTP_STD", "态势STD", "相关投注", "预计赔付", "系统盈亏",
+    "是否选中", "第一轮", "第二轮", "第三轮", "本轮中奖结构"
+]
+PLAYER_SUMMARY_COLUMNS = [
+    "轮次", "玩家ID", "总投注", "返奖", "净盈亏", "充值",
+    "态势", "记忆盈亏", "记忆均注", "历史RTP", "当局RTP"
+] + [f"区域{i}" for i in range(1, 9)]
+RTP_STD_DEBUG_COLUMNS = [
+    "轮次", "结构ID", "结构区域", "玩家ID", "投注额", "累计投注", "累计返奖",
+    "RTP", "偏差", "偏差平方", "方差贡献", "权重", "结构STD"
+]
+ATTITUDE_STD_DEBUG_COLUMNS = [
+    "轮次", "结构ID", "结构区域", "玩家ID", "投注", "返奖", "平均投注", "记忆值",
+    "影响值", "偏差", "偏差平方", "方差贡献", "权重", "态势STD"
+]
 
-    rows = []
+
+# 以下 iter_* 逐行产出 (round_id, 行)，供 DataFrame 构建与流式 Excel 导出（excel_stream）共用
+
+# 平台结构模拟明细
+def iter_structure_result_rows():
     rtp_map = {(e["round_id"], e["structure_id"]): e for e in rtp_std_log}
     attitude_map = {(e["round_id"], e["structure_id"]): e for e in attitude_std_log}
 
@@ -22,14 +39,14 @@ def build_structure_results_df_from_log():
         final_areas = entry.get("winning_areas_final_result", [])
 
         # ✅ 每轮添加分隔行：标注中奖结构
-        rows.append({"轮次": f"本次中奖结构: {final_areas}"})
+        yield round_id, {"轮次": f"本次中奖结构: {final_areas}"}
 
         for sid, s in enumerate(structures):
             rid_sid = (round_id, sid)
             rtp_std = round(rtp_map.get(rid_sid, {}).get("rtp_std_structure_after_simulation", 0), 6)
             attitude_std = round(attitude_map.get(rid_sid, {}).get("attitude_std_structure_after_simulation", 0), 6)
 
-            rows.append({
+            yield round_id, {
                 "轮次": round_id,
                 "结构": s.get("game_areas"),
                 "RTP_STD": rtp_std,
@@ -42,24 +59,20 @@ def build_structure_results_df_from_log():
                 "第二轮": int(s.get("entered_phase2", False)),
                 "第三轮": int(s.get("entered_phase3", False)),
                 "本轮中奖结构": str(final_areas)
-            })
+            }
 
-    return pd.DataFrame(rows)[:25000][[
-        "轮次", "结构", "RTP_STD", "态势STD", "相关投注", "预计赔付", "系统盈亏",
-        "是否选中", "第一轮", "第二轮", "第三轮", "本轮中奖结构"
-    ]]
+def build_structure_results_df_from_log():
+    if not round_log:
+        return pd.DataFrame([])
+    return pd.DataFrame([row for _, row in iter_structure_result_rows()])[STRUCTURE_RESULT_COLUMNS]
     
 # 玩家下注记录明细
-def build_player_summary_df_from_log():
-    if not player_log:
-        return pd.DataFrame([])
-
+def iter_player_summary_rows():
     round_final_map = {
         entry["round_id"]: entry.get("winning_areas_final_result", [])
         for entry in round_log
     }
 
-    rows = []
     current_round = None
 
     for entry in player_log:
@@ -67,7 +80,7 @@ def build_player_summary_df_from_log():
 
         if current_round != round_id:
             final_areas = round_final_map.get(round_id, [])
-            rows.append({"轮次": f"本次中奖结构: {final_areas}"})
+            yield round_id, {"轮次": f"本次中奖结构: {final_areas}"}
             current_round = round_id
 
         base_data = {
@@ -88,14 +101,12 @@ def build_player_summary_df_from_log():
         for area in range(1, 9):
             base_data[f"区域{area}"] = area_bets.get(area, 0)
 
-        rows.append(base_data)
-
-    columns_order = [
-        "轮次", "玩家ID", "总投注", "返奖", "净盈亏", "充值",
-        "态势", "记忆盈亏", "记忆均注", "历史RTP", "当局RTP"
-    ] + [f"区域{i}" for i in range(1, 9)] 
+        yield round_id, base_data
 
-    return pd.DataFrame(rows)[columns_order]
+def build_player_summary_df_from_log():
+    if not player_log:
+        return pd.DataFrame([])
+    return pd.DataFrame([row for _, row in iter_player_summary_rows()])[PLAYER_SUMMARY_COLUMNS]
 
 # 平台指标走势：水池、期望RTP
 def build_platform_context_df_from_log():
@@ -160,8 +171,7 @@ def build_player_metrics_log_from_log():
     return pd.DataFrame(rows)
         
 # RTP_STD明细、用于debug
-def build_rtp_std_debug_df():
-    rows = []
+def iter_rtp_std_debug_rows():
     last_round_id = None
     for entry in rtp_std_log:
         rid = entry.get("round_id")
@@ -170,11 +180,11 @@ def build_rtp_std_debug_df():
         rtp_std = entry.get("rtp_std_structure_after_simulation")
 
         if last_round_id is not None and rid != last_round_id:
-            rows.append({"轮次": last_round_id, "结构区域": "----------", "玩家ID": f"✅ 第 {last_round_id} 局结束"})
+            yield last_round_id, {"轮次": last_round_id, "结构区域": "----------", "玩家ID": f"✅ 第 {last_round_id} 局结束"}
         last_round_id = rid
 
         for p in entry.get("rtp_effects_per_player_simulated", []):
-            rows.append({
+            yield rid, {
                 "轮次": rid,
                 "结构ID": sid,
                 "结构区域": str(areas),
@@ -188,14 +198,15 @@ def build_rtp_std_debug_df():
                 "方差贡献": round(p["rtp_var_contrib_player_simulated"], 1),
                 "权重": p["total_bet_amount_player_simulated"],
                 "结构STD": round(rtp_std, 6),
-            })
+            }
     if last_round_id is not None:
-        rows.append({"轮次": last_round_id, "结构区域": "----------", "玩家ID": f"✅ 第 {last_round_id} 局结束"})
-    return pd.DataFrame(rows)
+        yield last_round_id, {"轮次": last_round_id, "结构区域": "----------", "玩家ID": f"✅ 第 {last_round_id} 局结束"}
+
+def build_rtp_std_debug_df():
+    return pd.DataFrame([row for _, row in iter_rtp_std_debug_rows()])
 
 # 态势_STD明细、用于debug
-def build_attitude_std_debug_df():
-    rows = []
+def iter_attitude_std_debug_rows():
     last_round_id = None
     for entry in attitude_std_log:
         rid = entry.get("round_id")
@@ -204,14 +215,14 @@ def build_attitude_std_debug_df():
         std = entry.get("attitude_std_structure_after_simulation")
 
         if last_round_id is not None and rid != last_round_id:
-            rows.append({"轮次": last_round_id, "结构区域": "----------", "玩家ID": f"✅ 第 {last_round_id} 局结束"})
+            yield last_round_id, {"轮次": last_round_id, "结构区域": "----------", "玩家ID": f"✅ 第 {last_round_id} 局结束"}
         last_round_id = rid
 
         for p in entry.get("attitude_effects_per_player_simulated", []):
             history_bets = p.get("recent_bets", [])
             round_bet = history_bets[-1] if history_bets else 0
 
-            rows.append({
+            yield rid, {
                 "轮次": rid,
                 "结构ID": sid,
                 "结构区域": str(areas),
@@ -226,10 +237,12 @@ def build_attitude_std_debug_df():
                 "方差贡献": p.get("attitude_var_contrib_player_simulated", 0),
                 "权重": p.get("recharge_weight_player_simulated", 0),
                 "态势STD": round(std, 6)
-            })
+            }
     if last_round_id is not None:
-        rows.append({"轮次": last_round_id, "结构区域": "----------", "玩家ID": f"✅ 第 {last_round_id} 局结束"})
-    return pd.DataFrame(rows)[:25000]
+        yield last_round_id, {"轮次": last_round_id, "结构区域": "----------", "玩家ID": f"✅ 第 {last_round_id} 局结束"}
+
+def build_attitude_std_debug_df():
+    return pd.DataFrame([row for _, row in iter_attitude_std_debug_rows()])
 
 
 # 玩家信息综合汇总
@@ -312,35 +325,69 @@ def build_player_lifetime_summary_df():
     ]]
 
 
+# ✅ 终身汇总：优先使用运行中的在线累计值（online_stats.OnlineAggregator），否则回放玩家日志
+def build_player_lifetime_summary_df_from_aggregator(aggregator):
+    from online_stats import LIFETIME_SUMMARY_COLUMNS
+
+    rows = aggregator.player_lifetime_rows()
+    if not rows:
+        return pd.DataFrame([])
+    return pd.DataFrame(rows)[LIFETIME_SUMMARY_COLUMNS]
+
+
+# ✅ 导出任务：每个任务独立构建并写出一个文件（互不依赖），可顺序执行，也可由 export_orchestrator 多进程并行执行
+# 逐行明细表流式写入（constant_memory），超出单表行数上限时自动分表 / 分文件
+def export_player_summary_log(aggregator=None):
+    stream_rows_to_excel(os.path.join(EXCEL_DIR, "player_summary_log.xlsx"), PLAYER_SUMMARY_COLUMNS, iter_player_summary_rows())
+
+def export_structure_result_log(aggregator=None):
+    stream_rows_to_excel(os.path.join(EXCEL_DIR, "structure_result_log.xlsx"), STRUCTURE_RESULT_COLUMNS, iter_structure_result_rows())
+
+def export_platform_context_log(aggregator=None):
+    build_platform_context_df_from_log().to_excel(os.path.join(EXCEL_DIR, "platform_context_log.xlsx"), index=False, engine='xlsxwriter')
+
+def export_player_metrics_log(aggregator=None):
+    build_player_metrics_log_from_log().to_excel(os.path.join(EXCEL_DIR, "player_metrics_log.xlsx"), index=False, engine='xlsxwriter')
+
+def export_player_lifetime_summary(aggregator=None):
+    df = build_player_lifetime_summary_df_from_aggregator(aggregator) if aggregator is not None else build_player_lifetime_summary_df()
+    df.to_excel(os.path.join(EXCEL_DIR, "player_lifetime_summary.xlsx"), index=False, engine='xlsxwriter')
+
+def export_rtp_std_debug_log(aggregator=None):
+    stream_rows_to_excel(os.path.join(DEBUG_DIR, "rtp_std_log.xlsx"), RTP_STD_DEBUG_COLUMNS, iter_rtp_std_debug_rows())
+
+def export_attitude_std_debug_log(aggregator=None):
+    stream_rows_to_excel(os.path.join(DEBUG_DIR, "attitude_std_log.xlsx"), ATTITUDE_STD_DEBUG_COLUMNS, iter_attitude_std_debug_rows())
+
+# 主日志任务（需要对局日志）与精算调试任务；按预计耗时从大到小排列，便于并行时先启动大任务
+MAIN_EXPORT_TASKS = {
+    "player_summary_log": export_player_summary_log,
+    "structure_result_log": export_structure_result_log,
+    "player_metrics_log": export_player_metrics_log,
+    "platform_context_log": export_platform_context_log,
+    "player_lifetime_summary": export_player_lifetime_summary,
+}
+DEBUG_EXPORT_TASKS = {
+    "rtp_std_log": export_rtp_std_debug_log,
+    "attitude_std_log": export_attitude_std_debug_log,
+}
+EXPORT_TASKS = {**MAIN_EXPORT_TASKS, **DEBUG_EXPORT_TASKS}
+
+
 # ✅ 写入（首次清空）
-def export_all_logs():
+def export_all_logs(aggregator=None):
     os.makedirs(EXCEL_DIR, exist_ok=True)
 
     if not round_log:
         print("⚠️ 无有效对局日志，跳过导出")
         return
 
-    latest_round = round_log[-1]["round_id"]
-
-    df1 = build_player_summary_df_from_log()
-    df2 = build_structure_results_df_from_log()
-    df3 = build_platform_context_df_from_log()
-    df4 = build_player_metrics_log_from_log()
-    df5 = build_player_lifetime_summary_df()
-
-    df1.to_excel(os.path.join(EXCEL_DIR, "player_summary_log.xlsx"), index=False, engine='xlsxwriter')
-    df2.to_excel(os.path.join(EXCEL_DIR, "structure_result_log.xlsx"), index=False, engine='xlsxwriter')
-    df3.to_excel(os.path.join(EXCEL_DIR, "platform_context_log.xlsx"), index=False, engine='xlsxwriter')
-    df4.to_excel(os.path.join(EXCEL_DIR, "player_metrics_log.xlsx"), index=False, engine='xlsxwriter')
-    df5.to_excel(os.path.join(EXCEL_DIR, "player_lifetime_summary.xlsx"), index=False, engine='xlsxwriter')
+    for task in MAIN_EXPORT_TASKS.values():
+        task(aggregator)
 
 
-# ✅ 写入 Excel 文件：用于所有精算级 debug 日志导出
+# ✅ 写入 Excel 文件：用于所有精算级 debug 日志导出（流式写入，不截断）
 def export_debug_inspection_logs():
     os.makedirs(DEBUG_DIR, exist_ok=True)
-    df1 = build_rtp_std_debug_df()
-    df2 = build_attitude_std_debug_df()
-    path1 = os.path.join(DEBUG_DIR, "rtp_std_log.xlsx")
-    path2 = os.path.join(DEBUG_DIR, "attitude_std_log.xlsx")
-    df1.to_excel(path1, index=False, engine="xlsxwriter")
-    df2.to_excel(path2, index=False, engine="xlsxwriter")
\ No newline at end of file
+    for task in DEBUG_EXPORT_TASKS.values():
+        task()
@@ -0,0 +1,104 @@
+# export_orchestrator.py
+
+"""
+并行导出编排：
+- 各报表文件互不依赖（export_engine.EXPORT_TASKS），xlsx 序列化是 CPU 密集型，按文件分配到进程池并行构建与写出
+- 主进程把当前日志与在线汇总器序列化为一份快照文件，工作进程启动时加载到自己的全局日志容器，之后直接复用 export_engine 的导出任务
+- 导出在后台进行，主进程可同时写 JSON 日志；输出文件与顺序导出完全一致
+"""
+
+import os
+import time
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from config import BASE_OUTPUT_DIR, EXCEL_DIR, DEBUG_DIR, EXPORT_MAX_WORKERS
+from db_logger import default_log_stream
+
+_snapshot_aggregator = None
+
+
+# ✅ 工作进程初始化：把快照中的日志恢复到全局容器（原地替换，保证 export_engine 的模块级引用有效）
+def _load_snapshot(path: str):
+    global _snapshot_aggregator
+    with open(path, "rb") as f:
+        snapshot = pickle.load(f)
+    for name, items in default_log_stream.all_logs().items():
+        items[:] = snapshot["logs"].get(name, [])
+    _snapshot_aggregator = snapshot["aggregator"]
+
+def _run_export_task(name: str) -> tuple:
+    from export_engine import EXPORT_TASKS
+
+    start = time.time()
+    EXPORT_TASKS[name](_snapshot_aggregator)
+    return name, time.time() - start
+
+
+# ✅ 一次并行导出：start() 提交全部任务后立即返回，wait() 等待完成并返回各文件耗时
+class ExportJob:
+    def __init__(self, aggregator=None, tasks: List[str] = None, max_workers: int = EXPORT_MAX_WORKERS):
+        from export_engine import MAIN_EXPORT_TASKS, DEBUG_EXPORT_TASKS
+
+        self.aggregator = aggregator
+        if tasks is None:
+            # 精算调试表（每局 × 结构 × 玩家一行）通常最大，先提交以缩短整体耗时
+            tasks = list(DEBUG_EXPORT_TASKS)
+            if default_log_stream.round_log:
+                tasks += list(MAIN_EXPORT_TASKS)
+            else:
+                print("⚠️ 无有效对局日志，跳过导出")
+        self.tasks = tasks
+        self.max_workers = max(1, min(max_workers, len(tasks)))
+        self.timings: Dict[str, float] = {}
+        self._executor = None
+        self._futures = []
+        self._snapshot_path = None
+        self._start_time = None
+
+    def _write_snapshot(self) -> str:
+        os.makedirs(BASE_OUTPUT_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="export_snapshot_", suffix=".pkl", dir=BASE_OUTPUT_DIR)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"logs": default_log_stream.all_logs(), "aggregator": self.aggregator}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def start(self) -> "ExportJob":
+        os.makedirs(EXCEL_DIR, exist_ok=True)
+        os.makedirs(DEBUG_DIR, exist_ok=True)
+        self._start_time = time.time()
+        if self.max_workers <= 1 or len(self.tasks) <= 1:
+            return self  # 单进程：在 wait() 中顺序执行
+
+        self._snapshot_path = self._write_snapshot()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_load_snapshot, initargs=(self._snapshot_path,)
+        )
+        self._futures = [self._executor.submit(_run_export_task, name) for name in self.tasks]
+        return self
+
+    def wait(self) -> Dict[str, float]:
+        try:
+            if self._executor is None:
+                global _snapshot_aggregator
+                _snapshot_aggregator = self.aggregator
+                results = [_run_export_task(name) for name in self.tasks]
+            else:
+                results = [future.result() for future in self._futures]
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+            if self._snapshot_path and os.path.exists(self._snapshot_path):
+                os.remove(self._snapshot_path)
+
+        self.timings = dict(results)
+        print(
+            f"📦 导出完成：{len(self.tasks)} 个文件，{self.max_workers} 进程，用时 {time.time() - self._start_time:.1f} 秒"
+            f"（单文件最长 {max(self.timings.values(), default=0.0):.1f} 秒）"
+        )
+        return self.timings
+
+
+def export_logs_parallel(aggregator=None, tasks: List[str] = None, max_workers: int = EXPORT_MAX_WORKERS) -> Dict[str, float]:
+    return ExportJob(aggregator, tasks, max_workers).start().wait()
@@ -1,68 +1,209 @@
 import time
 import json
 import os
+import random
 from game_round_controller import GameRoundController
 from player_profiles import initialize_players, PlayerStats
 from platform_pool_and_generate_bet import PlatformPool
-from config import TARGET_RTP, CONFIDENCE_LEVEL
-from export_engine import export_all_logs, export_debug_inspection_logs
-from db_logger import round_log, player_log, rtp_std_log, attitude_std_log, confidence_log
-from config import JSON_DIR
+from config import DEFAULT_SIMULATION_CONFIG, WINNING_STRUCTURES
+from db_logger import round_log, player_log, rtp_std_log, attitude_std_log, confidence_log, shadow_log, default_log_stream, JsonlLogWriter, restore_log_entries
+from log_records import json_default
+from config import JSON_DIR, ENABLE_MEMORY_PROBE, ENABLE_RESULT_CACHE, RESULT_CACHE_STORE_LOGS, ENABLE_ONLINE_AGGREGATES, ENABLE_LIVE_LOG
+from config import ENABLE_ROUND_STORE, ROUND_STORE_PATH, ENABLE_PARALLEL_EXPORT, ENABLE_TELEMETRY, LONG_RUN_POOL_HISTORY_LIMIT
+from memory_probe import MemoryProbe
+from result_cache import ResultCache, make_cache_key
+from random_streams import POPULATION
+from online_stats import OnlineAggregator
+from telemetry import Telemetry, ProgressPrinter
 
 ROUNDS = 20
 PLAYERS = 2
+SEED = None  # 固定种子时结果可复现并启用结果缓存；None 表示每次随机
+# 单局流水线各阶段（遥测按阶段计时）
+ROUND_STAGES = ("initialize_round", "prepare_round_data", "simulate_structures", "choose_final_structure", "settle_outcome", "finalize_round")
 
-# 脚本模拟主流程：批量执行 controller，连续模拟指定轮数
-def run_simulation(rounds, num_players):
-    print(f"\n🚀 快照模拟启动，共 {rounds} 局...")
-    start_time = time.time()
-
-    # ✅ 构造最小状态集，仅用于初始化 controller
+# ✅ 构造最小状态集，仅用于初始化 controller（overrides 可覆盖任意字段，如独立的 structures）
+# sim_config：本次模拟的参数集合，决定玩家统计窗口、水池水位线与策略参数
+# random_streams：可选的分用途随机流（公共随机数模式），玩家画像与逐局下注 / 开奖抽取各用独立随机流
+# bounded_history：长时运行（回放 / 收敛判停）时不保留玩家逐局 RTP 历史，水池流水只保留最近 LONG_RUN_POOL_HISTORY_LIMIT 条
+def build_initial_state(num_players, sim_config=None, random_streams=None, bounded_history=False, **overrides) -> dict:
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+    pool_history_limit = LONG_RUN_POOL_HISTORY_LIMIT if bounded_history else None
     state = {
-        "sim_players": initialize_players(num_players),
+        "sim_players": initialize_players(num_players, rng=random_streams.get(POPULATION) if random_streams else None),
         "stat_players": {},
-        "platform_pool": PlatformPool(),
-        "rtp_history": {},
+        "platform_pool": PlatformPool(
+            tax_rate=cfg.get_pool_tax_rate(), rtp_thresholds=cfg.pool_rtp_thresholds, history_limit=pool_history_limit
+        ),
+        "rtp_history": None if bounded_history else {},
         "round_id": 1,
-        "confidence_level": CONFIDENCE_LEVEL
+        "confidence_level": cfg.confidence_level,
+        "sim_config": cfg,
+        "random_streams": random_streams,
+        "online_aggregator": OnlineAggregator() if ENABLE_ONLINE_AGGREGATES else None
+    }
+    state["stat_players"] = {
+        pid: PlayerStats(cfg.recent_rtp_window, cfg.memory_window) for pid in state["sim_players"]
+    }
+    state.update(overrides)
+    return state
+
+# ✅ 固定随机种子（玩家画像、下注生成与结构抽样共用全局随机源）
+def seed_random(seed):
+    random.seed(seed)
+
+# ✅ 运行汇总：整体 RTP 与水池结果（同时作为结果缓存的条目内容）
+def summarize_run(state, rounds, num_players, seed) -> dict:
+    stats = state["stat_players"].values()
+    total_bet = sum(s.total_bet for s in stats)
+    total_payout = sum(s.total_payout for s in stats)
+    return {
+        "rounds": rounds,
+        "players": num_players,
+        "seed": seed,
+        "total_bet": total_bet,
+        "total_payout": total_payout,
+        "rtp": total_payout / total_bet if total_bet > 0 else 0.0,
+        "pool_value": state["platform_pool"].get_pool_value()
     }
-    state["stat_players"] = {pid: PlayerStats() for pid in state["sim_players"]}
+
+# ✅ 导出主日志 / 精算日志 / JSON 日志
+# 导出依赖 pandas，仅在真正导出时加载，模拟核心路径保持轻量导入
+# aggregator：可选的在线汇总器，提供时终身汇总直接取在线累计值，不再回放玩家日志
+# 并行导出开启时，报表在进程池中后台写出，主进程同时写 JSON 日志
+def write_outputs(aggregator=None):
+    if ENABLE_PARALLEL_EXPORT:
+        from export_orchestrator import ExportJob
+
+        job = ExportJob(aggregator).start()
+        write_json_logs()
+        job.wait()
+        return
+
+    from export_engine import export_all_logs, export_debug_inspection_logs
+
+    export_all_logs(aggregator)  # ✅ 主日志导出（导出至 EXPORT_DIR）
+    export_debug_inspection_logs()  # ✅ 精算调试日志导出（导出至 DEBUG_DIR）
+    write_json_logs()
+
+def write_json_logs():
+    os.makedirs(JSON_DIR, exist_ok=True)
+    with open(os.path.join(JSON_DIR, "round_log.json"), "w", encoding="utf-8") as f:
+        json.dump(round_log, f, ensure_ascii=False, indent=2, default=json_default)
+
+    with open(os.path.join(JSON_DIR, "player_log.json"), "w", encoding="utf-8") as f:
+        json.dump(player_log, f, ensure_ascii=False, indent=2, default=json_default)
+
+    with open(os.path.join(JSON_DIR, "rtp_std_log.json"), "w", encoding="utf-8") as f:
+        json.dump(rtp_std_log, f, ensure_ascii=False, indent=2, default=json_default)
+
+    with open(os.path.join(JSON_DIR, "attitude_std_log.json"), "w", encoding="utf-8") as f:
+        json.dump(attitude_std_log, f, ensure_ascii=False, indent=2, default=json_default)
+        
+    with open(os.path.join(JSON_DIR, "confidence_log.json"), "w", encoding="utf-8") as f:
+        json.dump(confidence_log, f, ensure_ascii=False, indent=2, default=json_default)
+
+    if shadow_log:
+        with open(os.path.join(JSON_DIR, "shadow_log.json"), "w", encoding="utf-8") as f:
+            json.dump(shadow_log, f, ensure_ascii=False, default=json_default)
+
+# ✅ 缓存命中：把缓存日志恢复到全局日志容器后直接导出
+def restore_cached_logs(logs: dict) -> bool:
+    if logs is None:
+        return False
+    for name, items in default_log_stream.all_logs().items():
+        items.clear()
+        items.extend(restore_log_entries(name, logs.get(name, [])))
+    return True
+
+# 脚本模拟主流程：批量执行 controller，连续模拟指定轮数
+# seed 给定时结果可复现，并启用结果缓存（相同配置 + 种子 + 代码版本直接复用）
+def run_simulation(rounds, num_players, seed=SEED, sim_config=None, use_cache=ENABLE_RESULT_CACHE):
+    cache = ResultCache() if use_cache and seed is not None else None
+    cache_key = None
+    if cache:
+        cache_key = make_cache_key(sim_config or DEFAULT_SIMULATION_CONFIG, seed, num_players, rounds, runner="fast_simulation")
+        summary = cache.get(cache_key)
+        if summary is not None and restore_cached_logs(cache.get_logs(cache_key)):
+            if ENABLE_LIVE_LOG:
+                JsonlLogWriter(JSON_DIR).flush()
+            if ENABLE_ROUND_STORE:
+                from round_store import rebuild_round_store
+                rebuild_round_store(ROUND_STORE_PATH, WINNING_STRUCTURES, round_log)
+            write_outputs()
+            print(f"\n⚡ 命中结果缓存（{cache_key[:12]}），RTP {summary['rtp']:.4f}，日志已从缓存恢复并写入")
+            return summary
+
+    print(f"\n🚀 快照模拟启动，共 {rounds} 局...")
+
+    if seed is not None:
+        seed_random(seed)
+    state = build_initial_state(num_players, sim_config=sim_config)
 
     controller = GameRoundController(state)
 
+    # ✅ 可选：内存探针（每 N 局采样一次，写入 DEBUG_DIR）
+    probe = MemoryProbe().start() if ENABLE_MEMORY_PROBE else None
+    # ✅ 追加式实时日志（仪表盘实时跟踪模式读取）
+    live_writer = JsonlLogWriter(JSON_DIR) if ENABLE_LIVE_LOG else None
+    # ✅ 定长轮次存储（numpy 仅在启用时加载）
+    store_writer = None
+    if ENABLE_ROUND_STORE:
+        from round_store import RoundStoreWriter
+        store_writer = RoundStoreWriter(ROUND_STORE_PATH, controller.structures)
+    # ✅ 可选：遥测端点（各阶段计时仅在启用时进行）
+    telemetry = None
+    if ENABLE_TELEMETRY:
+        telemetry = Telemetry(log_backlog=lambda: sum(len(items) for items in default_log_stream.all_logs().values()))
+        print(f"📡 遥测端点：{telemetry.serve()}")
+    progress = ProgressPrinter(rounds)
+
     for _ in range(rounds):
-        controller.initialize_round()
-        controller.prepare_round_data()
-        controller.simulate_structures()
-        controller.choose_final_structure()
-        controller.settle_outcome()
-        controller.finalize_round()
+        if telemetry:
+            for stage in ROUND_STAGES:
+                stage_start = time.perf_counter()
+                getattr(controller, stage)()
+                telemetry.observe_stage(stage, time.perf_counter() - stage_start)
+            stage_start = time.perf_counter()
+        else:
+            controller.initialize_round()
+            controller.prepare_round_data()
+            controller.simulate_structures()
+            controller.choose_final_structure()
+            controller.settle_outcome()
+            controller.finalize_round()
 
-        if state["round_id"] == rounds:
-            export_all_logs()  # ✅ 主日志导出（导出至 EXPORT_DIR）
-            export_debug_inspection_logs()  # ✅ 精算调试日志导出（导出至 DEBUG_DIR）
+        if live_writer:
+            live_writer.flush()
+        if store_writer:
+            store_writer.append_round(state)
+        if telemetry:
+            telemetry.observe_stage("persist", time.perf_counter() - stage_start)
+            telemetry.record_round(controller.pool.get_pool_value(), state["expected_rtp"])
 
-            os.makedirs(JSON_DIR, exist_ok=True)
-            with open(os.path.join(JSON_DIR, "round_log.json"), "w", encoding="utf-8") as f:
-                json.dump(round_log, f, ensure_ascii=False, indent=2)
+        if probe:
+            probe.maybe_sample(state["round_id"], state)
 
-            with open(os.path.join(JSON_DIR, "player_log.json"), "w", encoding="utf-8") as f:
-                json.dump(player_log, f, ensure_ascii=False, indent=2)
+        if state["round_id"] == rounds:
+            write_outputs(state.get("online_aggregator"))
 
-            with open(os.path.join(JSON_DIR, "rtp_std_log.json"), "w", encoding="utf-8") as f:
-                json.dump(rtp_std_log, f, ensure_ascii=False, indent=2)
+        progress.update(state["round_id"])
 
-            with open(os.path.join(JSON_DIR, "attitude_std_log.json"), "w", encoding="utf-8") as f:
-                json.dump(attitude_std_log, f, ensure_ascii=False, indent=2)
-                
-            with open(os.path.join(JSON_DIR, "confidence_log.json"), "w", encoding="utf-8") as f:
-                json.dump(confidence_log, f, ensure_ascii=False, indent=2)
+    if store_writer:
+        store_writer.close()
+    if telemetry:
+        telemetry.stop()
 
+    if probe:
+        probe.close()
+        print(f"\n🧠 内存探针采样 {len(probe.samples)} 次，已写入 {probe.output_path}")
 
-        elapsed = time.time() - start_time
-        print(f"\r已完成 {state['round_id']}/{rounds} 局，用时 {elapsed:.1f} 秒", end="", flush=True)
+    summary = summarize_run(state, rounds, num_players, seed)
+    if cache:
+        cache.put(cache_key, summary, default_log_stream.all_logs() if RESULT_CACHE_STORE_LOGS else None)
 
     print("\n✅ 模拟完成，日志已写入")
+    return summary
 
 def main():
     run_simulation(rounds=ROUNDS, num_players=PLAYERS)
@@ -1,10 +1,16 @@
+import time
+import random
 from enum import Enum, auto
-from config import PAYOUT_RATES, CONFIDENCE_LEVEL
+from config import PAYOUT_RATES, WINNING_STRUCTURES, DEFAULT_SIMULATION_CONFIG
 from player_profiles import Player, PlayerStats
 from platform_pool_and_generate_bet import generate_player_bets
-from score_engine import SimulationContext, simulate_structure_metrics, compute_attitude_std_for_all_structures
-from strategy import select_structure
-from db_logger import log_player_detail, log_round_summary
+from score_engine import (
+    SimulationContext, simulate_structure_metrics, simulate_structure_metrics_anytime, use_bitmask_evaluation,
+    compute_attitude_std_for_structure, compute_attitude_std_for_all_structures, compute_attitude_std_for_all_structures_batched
+)
+from strategy import select_structure, build_shadow_strategies, evaluate_shadow_strategies
+from random_streams import POPULATION, SELECTION, derive_seed
+from db_logger import log_player_detail, log_round_summary, log_shadow_decisions
 from metrics_engine import (
     compute_rtp, compute_memory_profit, compute_memory_avg_bet, compute_payout, compute_current_rtp, aggregate_area_totals, compute_attitude
 )
@@ -18,7 +24,15 @@ class GameRoundController:
         self.sim_players = state["sim_players"]
         self.stat_players = state["stat_players"]
         self.pool = state["platform_pool"]
-        self.confidence_level = state.get("confidence_level", CONFIDENCE_LEVEL)
+        self.sim_config = state.get("sim_config") or DEFAULT_SIMULATION_CONFIG  # 本次模拟的策略参数集合
+        self.confidence_level = state.get("confidence_level", self.sim_config.confidence_level)
+        self.structures = state.get("structures", WINNING_STRUCTURES)  # 多房间时每个房间持有独立的结构字典
+        self.random_streams = state.get("random_streams")  # 公共随机数模式：分用途随机流（None 时使用全局 random）
+        self.aggregator = state.get("online_aggregator")  # 在线汇总统计（None 时不累积）
+        # 影子策略：与主策略共用结构模拟结果，只记录假设选择（未传入时取 config.SHADOW_STRATEGIES，传入空列表表示不启用）
+        self.shadow_strategies = state.get("shadow_strategies")
+        if self.shadow_strategies is None:
+            self.shadow_strategies = build_shadow_strategies(base_config=self.sim_config)
 
     def initialize_round(self):
         self.round_id += 1
@@ -27,42 +41,139 @@ class GameRoundController:
         self.state["structure_result_cache"] = None
         self.state["current_bets"] = {}
         self.state["_summary"] = None
+        self.state["decision_fallback"] = []
         self.state["expected_rtp"] = self.pool.get_current_rtp_target()
 
-    def prepare_round_data(self):
-        bets = generate_player_bets(self.sim_players, self.round_id)
+    # bets：外部传入的本轮下注（服务模式 / 回放），提供时跳过随机生成
+    def prepare_round_data(self, bets=None):
+        if bets is None:
+            bets = generate_player_bets(self.sim_players, self.round_id, self.random_streams)
+        else:
+            self.ensure_players(bets)
         self.state["current_bets"] = bets
 
-    def simulate_structures(self):
+    # ✅ 外部下注中出现的新玩家：补建画像与统计状态
+    def ensure_players(self, player_ids):
+        for pid in player_ids:
+            if pid not in self.sim_players:
+                rng = self.random_streams.get(POPULATION) if self.random_streams else None
+                self.sim_players[pid] = Player(uid=pid, rng=rng)
+            if pid not in self.stat_players:
+                self.stat_players[pid] = PlayerStats(self.sim_config.recent_rtp_window, self.sim_config.memory_window)
+
+    # evaluation：可选的预计算位掩码评估结果（多房间合并批量评估时传入）
+    # deadline：可选的决策截止时间（time.perf_counter() 绝对值），逐结构模拟时按优先级限时计算
+    def simulate_structures(self, evaluation=None, deadline=None):
         context = SimulationContext(self.stat_players, self.state["current_bets"])
         expected_rtp = self.state["expected_rtp"]
 
-        results, std_bounds, sample_size = simulate_structure_metrics(
-            context, self.confidence_level, expected_rtp, current_round_id=self.round_id
-        )
-
-        recharge_map = {pid: p.recharge_amount for pid, p in self.sim_players.items()}
-        attitude_results = compute_attitude_std_for_all_structures(results, context.get_players(), recharge_map, self.round_id)
-        for res in results:
-            for att in attitude_results:
-                if att["game_areas"] == res["game_areas"]:
-                    res["attitude_std"] = att["attitude_std"]
-                    break
+        if deadline is not None and evaluation is None and not use_bitmask_evaluation(self.structures):
+            results, std_bounds, sample_size, meta = simulate_structure_metrics_anytime(
+                context, self.confidence_level, expected_rtp, self.round_id, deadline,
+                structures=self.structures, sim_config=self.sim_config
+            )
+            if meta["deadline_hit"]:
+                self.state["decision_fallback"].append(
+                    f"rtp_std_partial:{meta['rtp_std_evaluated']}/{meta['structures_total']}"
+                )
+        else:
+            results, std_bounds, sample_size = simulate_structure_metrics(
+                context, self.confidence_level, expected_rtp, current_round_id=self.round_id,
+                structures=self.structures, evaluation=evaluation, sim_config=self.sim_config
+            )
 
+        # ✅ 态势 STD 不在此处全量计算，由策略第二阶段对通过第一阶段的结构按需计算
         self.state["structure_result_cache"] = {
             "all_structures": results,
             "std_bounds": std_bounds,
-            "sample_size": sample_size
+            "sample_size": sample_size,
+            "context": context
         }
 
-    def choose_final_structure(self):
-        self.state["final_outcome"] = select_structure(self.state["structure_result_cache"]["all_structures"])
+    # ✅ 按需计算指定结构的态势 STD（按 structure_id 索引），供策略第二阶段回调
+    # 有截止时间时按 rtp_std 升序逐个计算、到时即停（至少计算一个），返回部分结果并记录回退
+    # record=False：不写 attitude_std_log、不回写结构字典（影子策略打分用）
+    def evaluate_attitude_std(self, structure_ids, deadline=None, record=True):
+        cache = self.state["structure_result_cache"]
+        context = cache["context"]
+        results = cache["all_structures"]
+        recharge_map = {pid: p.recharge_amount for pid, p in self.sim_players.items()}
+        if context.structure_evaluation is not None:
+            return compute_attitude_std_for_all_structures_batched(
+                results, context.get_players(), recharge_map, self.round_id, context.structure_evaluation, structure_ids,
+                sim_config=self.sim_config, record=record
+            )
+        # 限时决策未算到 rtp_std 的结构没有模拟玩家，态势无从计算（不返回，策略第二阶段自然排除）
+        structure_ids = [sid for sid in structure_ids if "simulated_players" in results[sid]]
+        if deadline is None:
+            return compute_attitude_std_for_all_structures(
+                results, context.get_players(), recharge_map, self.round_id, structure_ids,
+                sim_config=self.sim_config, record=record
+            )
+
+        attitude_map = {}
+        for sid in sorted(structure_ids, key=lambda i: results[i].get("rtp_std", float("inf"))):
+            if attitude_map and time.perf_counter() >= deadline:
+                break
+            attitude_map[sid] = compute_attitude_std_for_structure(
+                results[sid], sid, context.get_players(), recharge_map, self.round_id, self.sim_config, record
+            )
+        if len(attitude_map) < len(structure_ids):
+            self.state["decision_fallback"].append(f"attitude_std_partial:{len(attitude_map)}/{len(structure_ids)}")
+        return attitude_map
+
+    # ✅ 本局态势 STD 缓存，同一结构只计算一次
+    # record=False（影子策略）：先复用主策略已算出的值，缺失的结构另行计算并存入影子缓存，不写日志、不修改结构字典
+    def cached_attitude_evaluator(self, deadline=None, record=True):
+        cache = self.state["structure_result_cache"]
+        attitude_cache = cache.setdefault("attitude_std_map", {})
+        target = attitude_cache if record else cache.setdefault("shadow_attitude_std_map", {})
+
+        def evaluate(structure_ids):
+            missing = [sid for sid in structure_ids if sid not in attitude_cache and sid not in target]
+            if missing:
+                target.update(self.evaluate_attitude_std(missing, deadline, record))
+            return {
+                sid: attitude_cache[sid] if sid in attitude_cache else target[sid]
+                for sid in structure_ids if sid in attitude_cache or sid in target
+            }
+        return evaluate
+
+    # ✅ 本局第三阶段抽取种子：公共随机数模式下为本局 selection 流的种子，否则从全局 random 抽取一次
+    # 主策略与各影子策略都用该种子新建随机流，同配置的影子与主策略面对完全相同的抽取
+    def choose_final_structure(self, deadline=None):
+        if self.random_streams:
+            selection_seed = derive_seed(self.random_streams.seed, SELECTION, self.round_id)
+        else:
+            selection_seed = random.getrandbits(63)
+        self.state["selection_seed"] = selection_seed
+        self.state["final_outcome"] = select_structure(
+            self.state["structure_result_cache"]["all_structures"],
+            attitude_evaluator=self.cached_attitude_evaluator(deadline),
+            sim_config=self.sim_config,
+            rng=random.Random(selection_seed)
+        )
+
+    # ✅ 影子策略打分（本局汇总日志写出之后执行，不占用决策时间）：第三阶段与主策略共用本局抽取种子
+    # 态势 STD 走不记录的评估器，影子打分不改变结构字典与 attitude_std_log
+    def evaluate_shadows(self) -> dict:
+        results = self.state["structure_result_cache"]["all_structures"]
+        seed = self.state["selection_seed"]
+        shadows = evaluate_shadow_strategies(
+            results, self.shadow_strategies, self.cached_attitude_evaluator(record=False), lambda: random.Random(seed)
+        )
+        primary_sid = self.state["final_outcome"].get("structure_id")
+        log_shadow_decisions(self.round_id, primary_sid, shadows)
+        if self.aggregator is not None:
+            self.aggregator.update_shadows(primary_sid, shadows)
+        return shadows
 
     def settle_outcome(self):
         bets = self.state["current_bets"]
         outcome = self.state["final_outcome"]
         winning_areas = outcome["game_areas"]
         total_bet, total_payout = 0, 0
+        rtp_history = self.state.get("rtp_history")  # None：不保留逐局 RTP 历史（长时运行）
 
         for pid, bet in bets.items():
             bet_sum = sum(bet.values())
@@ -72,7 +183,8 @@ class GameRoundController:
             self.pool.outflow(payout)
 
             self.stat_players[pid].update(bet_sum, payout)
-            self.state["rtp_history"].setdefault(pid, []).append(compute_rtp(self.stat_players[pid]))
+            if rtp_history is not None:
+                rtp_history.setdefault(pid, []).append(compute_rtp(self.stat_players[pid]))
 
             total_bet += bet_sum
             total_payout += payout
@@ -88,7 +200,7 @@ class GameRoundController:
         outcome = self.state["final_outcome"]
         winning_areas = outcome["game_areas"]
         attitudes = {
-            pid: compute_attitude(stats)
+            pid: compute_attitude(stats, self.sim_config.memory_decay_alpha)
             for pid, stats in self.stat_players.items()
         }
 
@@ -114,6 +226,8 @@ class GameRoundController:
                 current_rtp=compute_current_rtp(bet, payout),
                 stat_players=self.stat_players  # ✅ 补上这里
             )
+            if self.aggregator is not None:
+                self.aggregator.update_player(pid, bet_sum, payout, attitudes[pid], compute_rtp(self.stat_players[pid]))
 
         area_totals = aggregate_area_totals(bets)
 
@@ -127,5 +241,19 @@ class GameRoundController:
             structures=self.state["structure_result_cache"]["all_structures"],
             pool_value=self.pool.get_pool_value(),
             target_rtp=self.state["expected_rtp"],
-            std_bounds=self.state["structure_result_cache"].get("std_bounds")
+            std_bounds=self.state["structure_result_cache"].get("std_bounds"),
+            decision_fallback=self.state.get("decision_fallback")
         )
+
+        if self.aggregator is not None:
+            self.aggregator.update_round(
+                round_id=self.round_id,
+                total_bet=self.state["_summary"]["total_bet_amount_platform"],
+                total_payout=self.state["_summary"]["total_payout_amount_platform"],
+                pool_value=self.pool.get_pool_value(),
+                target_rtp=self.state["expected_rtp"],
+                structures=self.state["structure_result_cache"]["all_structures"]
+            )
+
+        if self.shadow_strategies:
+            self.evaluate_shadows()
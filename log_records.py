@@ -0,0 +1,89 @@
+# log_records.py
+
+"""
+定长日志记录（__slots__ 类，替代长键名字典）：
+- 每类日志一个记录类型，字段即 db_logger 中对应的 REQUIRED_*_FIELDS 列表；字段名只在类上保存一份，单条记录只存值
+- 构造时只取模式内字段，多余字段直接丢弃，无需导出前再做字段清理
+- 保留字典式读取（record["key"] / record.get / keys / items / in），原有按键读取日志的代码无需修改
+- 只在导出时转换：JSON 序列化用 json_default，列式读取用 records_to_columns
+"""
+
+from typing import Dict, Iterable, List
+
+
+class LogRecord:
+    __slots__ = ()
+    FIELDS: tuple = ()
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.FIELDS, args):
+            setattr(self, name, value)
+        for name in self.FIELDS[len(args):]:
+            setattr(self, name, kwargs.get(name))
+
+    # 从字典构造：只保留模式内字段
+    @classmethod
+    def from_mapping(cls, data) -> "LogRecord":
+        return cls(**{name: data.get(name) for name in cls.FIELDS})
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(f"{type(self).__name__} 不包含字段 {key}")
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def keys(self):
+        return self.FIELDS
+
+    def values(self):
+        return [getattr(self, name) for name in self.FIELDS]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.FIELDS]
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __eq__(self, other):
+        if isinstance(other, LogRecord):
+            return type(self) is type(other) and self.values() == other.values()
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.items())})"
+
+
+# ✅ 按字段列表生成记录类型（类名需与模块级变量同名，保证可 pickle）
+def record_type(name: str, fields: Iterable[str], module: str = __name__) -> type:
+    fields = tuple(fields)
+    return type(name, (LogRecord,), {"__slots__": fields, "FIELDS": fields, "__module__": module})
+
+
+# ✅ json.dump(..., default=json_default)：记录在序列化时转为字典（嵌套记录同样处理）
+def json_default(obj):
+    if isinstance(obj, LogRecord):
+        return obj.to_dict()
+    raise TypeError(f"无法序列化类型 {type(obj).__name__}")
+
+
+# 列式读取：{字段: [值, ...]}（字段取第一条记录的模式，字典条目按键读取）
+def records_to_columns(records: List, fields: Iterable[str] = None) -> Dict[str, list]:
+    if fields is None:
+        fields = records[0].keys() if records else ()
+    return {name: [r.get(name) for r in records] for name in fields}
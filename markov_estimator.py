@@ -0,0 +1,215 @@
+# markov_estimator.py
+
+"""
+长期 RTP / 水池行为的马尔可夫链估计器：
+- 将水池值按 pool_rtp_thresholds 离散为若干水位带（状态）
+- 由短时校准模拟（每个水位带各起跑一段）或已有 round_log 估计：带间转移矩阵、各带单局下注 / 赔付均值
+- 求解平稳分布 π，长期 RTP = Σπ·E[赔付|带] / Σπ·E[下注|带]（更新-报酬比），并给出单局水池漂移
+- 带内按局重采样（bootstrap）给出置信区间
+- 假设：下一局所在水位带只依赖当前水位带（玩家记忆等状态视为带内平均），用于快速校验长期行为，而非替代逐局模拟
+"""
+
+import time
+import random
+from typing import Dict, List, Tuple
+import numpy as np
+from config import DEFAULT_SIMULATION_CONFIG, WINNING_STRUCTURES
+from db_logger import LogStream, use_log_stream
+from fast_simulation import build_initial_state, seed_random
+from game_round_controller import GameRoundController
+
+CALIBRATION_ROUNDS_PER_BAND = 200
+CALIBRATION_PLAYERS = 20
+CALIBRATION_SEED = 42
+BOOTSTRAP_SAMPLES = 500
+CI_LEVEL = 0.95
+
+# 单局样本：(起始水位带, 结束水位带, 本局下注, 本局赔付)
+Sample = Tuple[int, int, float, float]
+
+
+# ✅ 水位带：按下限升序排列的 (目标RTP百分比, 下限, 上限)
+def sorted_bands(pool_rtp_thresholds) -> List[tuple]:
+    return sorted((tuple(t) for t in pool_rtp_thresholds), key=lambda t: t[1])
+
+def band_of(pool_value: float, bands: List[tuple]) -> int:
+    for i, (_, low, high) in enumerate(bands):
+        if low <= pool_value < high:
+            return i
+    return 0 if pool_value < bands[0][1] else len(bands) - 1
+
+# 校准起点：有限区间取中点，无界区间取边界向外半个典型带宽
+def band_start_value(band: tuple, bands: List[tuple]) -> float:
+    widths = [high - low for _, low, high in bands if np.isfinite(low) and np.isfinite(high)]
+    span = float(np.median(widths)) if widths else 1_000_000.0
+    _, low, high = band
+    if np.isfinite(low) and np.isfinite(high):
+        return (low + high) / 2
+    return high - span / 2 if np.isfinite(high) else low + span / 2
+
+
+# ✅ 校准：每个水位带各起跑一段短模拟，记录逐局水位带转移与下注 / 赔付
+def calibrate_from_simulation(
+    sim_config=None,
+    rounds_per_band: int = CALIBRATION_ROUNDS_PER_BAND,
+    num_players: int = CALIBRATION_PLAYERS,
+    seed: int = CALIBRATION_SEED
+) -> List[Sample]:
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+    bands = sorted_bands(cfg.pool_rtp_thresholds)
+    samples = []
+    for band_index, band in enumerate(bands):
+        seed_random(seed + band_index)
+        structures = [{"areas": list(s["areas"]), "base_weight": s["base_weight"]} for s in WINNING_STRUCTURES]
+        state = build_initial_state(num_players, sim_config=cfg, structures=structures)
+        state["platform_pool"].pool_value = band_start_value(band, bands)
+        controller = GameRoundController(state)
+        logs = LogStream()
+
+        for _ in range(rounds_per_band):
+            before = band_of(controller.pool.get_pool_value(), bands)
+            with use_log_stream(logs):
+                controller.initialize_round()
+                controller.prepare_round_data()
+                controller.simulate_structures()
+                controller.choose_final_structure()
+                controller.settle_outcome()
+                controller.finalize_round()
+            logs.clear()
+            summary = state["_summary"]
+            after = band_of(controller.pool.get_pool_value(), bands)
+            samples.append((before, after, summary["total_bet_amount_platform"], summary["total_payout_amount_platform"]))
+    return samples
+
+# ✅ 由已有 round_log 还原逐局样本（结算前水池 = 结算后水池 - 抽水后流入 + 赔付）
+def samples_from_round_log(round_log: List[Dict], sim_config=None) -> List[Sample]:
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+    bands = sorted_bands(cfg.pool_rtp_thresholds)
+    keep_rate = 1 - cfg.get_pool_tax_rate()
+    samples = []
+    for entry in round_log:
+        bet = entry.get("total_bet_amount_platform", 0.0)
+        payout = entry.get("total_payout_amount_platform", 0.0)
+        after_value = entry.get("pool_value_platform", 0.0)
+        before_value = after_value - bet * keep_rate + payout
+        samples.append((band_of(before_value, bands), band_of(after_value, bands), bet, payout))
+    return samples
+
+
+# ✅ 由样本估计转移矩阵与各带均值；无样本的带视为吸收于自身（并在结果中标出）
+def fit_chain(samples: List[Sample], num_bands: int) -> dict:
+    counts = np.zeros((num_bands, num_bands))
+    bet_sum = np.zeros(num_bands)
+    payout_sum = np.zeros(num_bands)
+    for before, after, bet, payout in samples:
+        counts[before, after] += 1
+        bet_sum[before] += bet
+        payout_sum[before] += payout
+
+    visits = counts.sum(axis=1)
+    transition = np.eye(num_bands)
+    observed = visits > 0
+    transition[observed] = counts[observed] / visits[observed, None]
+    safe_visits = np.where(observed, visits, 1)
+    return {
+        "transition": transition,
+        "visits": visits,
+        "mean_bet": bet_sum / safe_visits,
+        "mean_payout": payout_sum / safe_visits,
+        "unobserved_bands": [int(i) for i in np.flatnonzero(~observed)]
+    }
+
+# ✅ 平稳分布：解 π(P - I) = 0 且 Σπ = 1（最小二乘，兼容可约链）
+def stationary_distribution(transition: np.ndarray) -> np.ndarray:
+    n = transition.shape[0]
+    a = np.vstack([(transition - np.eye(n)).T, np.ones(n)])
+    b = np.zeros(n + 1)
+    b[-1] = 1.0
+    pi, *_ = np.linalg.lstsq(a, b, rcond=None)
+    pi = np.clip(pi, 0.0, None)
+    return pi / pi.sum()
+
+def long_run_metrics(chain: dict, tax_rate: float) -> dict:
+    pi = stationary_distribution(chain["transition"])
+    expected_bet = float(pi @ chain["mean_bet"])
+    expected_payout = float(pi @ chain["mean_payout"])
+    drift = chain["mean_bet"] * (1 - tax_rate) - chain["mean_payout"]
+    return {
+        "stationary": pi,
+        "rtp": expected_payout / expected_bet if expected_bet > 0 else 0.0,
+        "pool_drift_per_round": float(pi @ drift),
+        "band_drift": drift
+    }
+
+
+# ✅ 带内 bootstrap：按起始水位带分组重采样，保持各带样本量不变
+def bootstrap_rtp(samples: List[Sample], num_bands: int, tax_rate: float, n: int = BOOTSTRAP_SAMPLES, seed: int = CALIBRATION_SEED) -> np.ndarray:
+    rng = random.Random(seed)
+    by_band = [[s for s in samples if s[0] == b] for b in range(num_bands)]
+    estimates = []
+    for _ in range(n):
+        resampled = [rng.choice(group) for group in by_band if group for _ in range(len(group))]
+        estimates.append(long_run_metrics(fit_chain(resampled, num_bands), tax_rate)["rtp"])
+    return np.array(estimates)
+
+
+# ✅ 估计入口：返回长期 RTP（含置信区间）、平稳分布与各带明细
+def estimate_long_run(samples: List[Sample], sim_config=None, bootstrap: int = BOOTSTRAP_SAMPLES, ci_level: float = CI_LEVEL) -> dict:
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+    bands = sorted_bands(cfg.pool_rtp_thresholds)
+    tax_rate = cfg.get_pool_tax_rate()
+    chain = fit_chain(samples, len(bands))
+    metrics = long_run_metrics(chain, tax_rate)
+
+    ci = (metrics["rtp"], metrics["rtp"])
+    if bootstrap > 0:
+        estimates = bootstrap_rtp(samples, len(bands), tax_rate, bootstrap)
+        tail = (1 - ci_level) / 2 * 100
+        ci = (float(np.percentile(estimates, tail)), float(np.percentile(estimates, 100 - tail)))
+
+    band_rows = [
+        {
+            "target_rtp": rtp_percent / 100.0,
+            "low": low,
+            "high": high,
+            "stationary_prob": float(metrics["stationary"][i]),
+            "rounds_observed": int(chain["visits"][i]),
+            "mean_bet": float(chain["mean_bet"][i]),
+            "mean_payout": float(chain["mean_payout"][i]),
+            "realized_rtp": float(chain["mean_payout"][i] / chain["mean_bet"][i]) if chain["mean_bet"][i] > 0 else 0.0,
+            "pool_drift": float(metrics["band_drift"][i])
+        }
+        for i, (rtp_percent, low, high) in enumerate(bands)
+    ]
+    return {
+        "rtp": metrics["rtp"],
+        "rtp_ci": ci,
+        "ci_level": ci_level,
+        "pool_drift_per_round": metrics["pool_drift_per_round"],
+        "samples": len(samples),
+        "unobserved_bands": chain["unobserved_bands"],
+        "transition": chain["transition"],
+        "bands": band_rows
+    }
+
+
+def main():
+    print(f"\n📐 马尔可夫估计：每个水位带校准 {CALIBRATION_ROUNDS_PER_BAND} 局，{CALIBRATION_PLAYERS} 名玩家...")
+    start = time.time()
+    samples = calibrate_from_simulation()
+    result = estimate_long_run(samples)
+    for band in result["bands"]:
+        print(
+            f"  [{band['low']:>12,.0f}, {band['high']:>12,.0f}) 目标 {band['target_rtp']:.2f} | "
+            f"π={band['stationary_prob']:.3f} 实际RTP {band['realized_rtp']:.4f} 漂移 {band['pool_drift']:+,.0f}/局（{band['rounds_observed']} 局）"
+        )
+    low, high = result["rtp_ci"]
+    print(
+        f"✅ 长期 RTP {result['rtp']:.4f}（{result['ci_level']:.0%} 区间 {low:.4f} ~ {high:.4f}），"
+        f"水池漂移 {result['pool_drift_per_round']:+,.0f}/局，用时 {time.time() - start:.1f} 秒"
+    )
+    if result["unobserved_bands"]:
+        print(f"⚠️ 以下水位带无校准样本，按吸收态处理：{result['unobserved_bands']}")
+
+if __name__ == "__main__":
+    main()
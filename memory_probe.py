@@ -0,0 +1,181 @@
+# memory_probe.py
+
+"""
+内存探针模块（可选启用）：
+- 每 N 局采样一次 tracemalloc 快照与各容器规模
+- 记录各日志列表条数与估算字节、玩家 history 长度、水池流水长度、结构上挂载的 simulated_players
+- 写入紧凑时序文件（CSV，一次采样一行），超出预算时发出 MemoryBudgetWarning
+"""
+
+import os
+import csv
+import sys
+import random
+import tracemalloc
+import warnings
+from collections import deque
+from config import (
+    DEBUG_DIR, WINNING_STRUCTURES, MEMORY_PROBE_INTERVAL, MEMORY_PROBE_BUDGET_MB, MEMORY_PROBE_TOP_ALLOCATIONS
+)
+import db_logger
+
+LOG_NAMES = ["round_log", "player_log", "rtp_std_log", "attitude_std_log", "confidence_log"]
+SAMPLE_SIZE = 32  # 估算字节时每个容器抽样的条目数
+
+
+# 超出内存预算时发出的警告类型（继承 UserWarning，默认过滤器下可见）
+class MemoryBudgetWarning(UserWarning):
+    pass
+
+
+# ✅ 递归估算单个对象占用字节（dict / list / tuple / deque / 普通对象的 __dict__）
+def deep_sizeof(obj, seen: set = None) -> int:
+    if seen is None:
+        seen = set()
+    oid = id(obj)
+    if oid in seen:
+        return 0
+    seen.add(oid)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(type(obj), "__slots__"):
+        # __slots__ 对象（如 log_records 中的日志记录）：字段值逐个计入，字段名由类共享不计
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in type(obj).__slots__ if hasattr(obj, name))
+    return size
+
+
+# ✅ 抽样估算列表总字节：容器自身 + 抽样条目平均深度大小 × 条数
+def estimate_list_bytes(items: list, sample_size: int = SAMPLE_SIZE) -> int:
+    count = len(items)
+    if count == 0:
+        return sys.getsizeof(items)
+    if count <= sample_size:
+        sample = items
+    else:
+        sample = [items[i] for i in random.Random(count).sample(range(count), sample_size)]
+    avg = sum(deep_sizeof(x) for x in sample) / len(sample)
+    return int(sys.getsizeof(items) + avg * count)
+
+
+# 内存探针：按固定间隔采样，输出到 DEBUG_DIR/memory_probe_log.csv
+class MemoryProbe:
+    def __init__(
+        self,
+        interval: int = MEMORY_PROBE_INTERVAL,
+        budget_mb: float = MEMORY_PROBE_BUDGET_MB,
+        top_n: int = MEMORY_PROBE_TOP_ALLOCATIONS,
+        output_path: str = None
+    ):
+        self.interval = max(1, int(interval))
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.top_n = top_n
+        self.output_path = output_path or os.path.join(DEBUG_DIR, "memory_probe_log.csv")
+        self.samples = []
+        self._writer = None
+        self._file = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        self._file = open(self.output_path, "w", newline="", encoding="utf-8")
+        self._writer = None
+        return self
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def maybe_sample(self, round_id: int, state: dict):
+        if round_id % self.interval == 0:
+            return self.sample(round_id, state)
+        return None
+
+    # ✅ 单次采样：容器条数、估算字节、玩家/水池/结构规模、tracemalloc 当前值与热点
+    def sample(self, round_id: int, state: dict) -> dict:
+        row = {"round_id": round_id}
+
+        estimated_total = 0
+        for name in LOG_NAMES:
+            items = getattr(db_logger, name)
+            est = estimate_list_bytes(items)
+            row[f"{name}_count"] = len(items)
+            row[f"{name}_bytes"] = est
+            estimated_total += est
+
+        history_lengths = [len(s.history) for s in state.get("stat_players", {}).values()]
+        row["player_count"] = len(history_lengths)
+        row["player_history_total"] = sum(history_lengths)
+        row["player_history_max"] = max(history_lengths, default=0)
+
+        rtp_history = state.get("rtp_history") or {}
+        row["rtp_history_total"] = sum(len(v) for v in rtp_history.values())
+
+        pool = state.get("platform_pool")
+        pool_history = pool.history if pool is not None else []
+        row["pool_history_count"] = len(pool_history)
+        row["pool_history_bytes"] = estimate_list_bytes(pool_history)
+        estimated_total += row["pool_history_bytes"]
+
+        # ✅ 结构上挂载的模拟玩家副本（结构字典来自 WINNING_STRUCTURES，会跨轮保留）
+        structures = list(WINNING_STRUCTURES)
+        cache = state.get("structure_result_cache") or {}
+        structures += [s for s in cache.get("all_structures", []) if all(s is not w for w in WINNING_STRUCTURES)]
+        sim_players = [s["simulated_players"] for s in structures if s.get("simulated_players")]
+        row["simulated_player_copies"] = sum(len(sp) for sp in sim_players)
+        row["simulated_history_total"] = sum(len(p.history) for sp in sim_players for p in sp.values())
+        row["simulated_players_bytes"] = sum(estimate_list_bytes(list(sp.values())) for sp in sim_players)
+        estimated_total += row["simulated_players_bytes"]
+
+        row["estimated_total_bytes"] = estimated_total
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        row["tracemalloc_current_bytes"] = current
+        row["tracemalloc_peak_bytes"] = peak
+        row["top_allocations"] = self._top_allocations()
+
+        self._write(row)
+        self.samples.append(row)
+        self._check_budget(row)
+        return row
+
+    def _top_allocations(self) -> str:
+        if not tracemalloc.is_tracing() or self.top_n <= 0:
+            return ""
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:self.top_n]
+        return " | ".join(
+            f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}={s.size // 1024}KiB"
+            for s in stats
+        )
+
+    def _write(self, row: dict):
+        if self._file is None:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(row.keys()))
+            self._writer.writeheader()
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def _check_budget(self, row: dict):
+        # ✅ 优先使用 tracemalloc 实测值；未追踪时退回抽样估算值（估算会重复计入共享的键字符串）
+        used = row["tracemalloc_current_bytes"] or row["estimated_total_bytes"]
+        if used > self.budget_bytes:
+            largest = max(LOG_NAMES + ["pool_history", "simulated_players"], key=lambda n: row.get(f"{n}_bytes", 0))
+            warnings.warn(
+                f"⚠️ 第 {row['round_id']} 局内存 {used / 1024 / 1024:.1f}MB 超出预算 "
+                f"{self.budget_bytes / 1024 / 1024:.0f}MB（最大容器：{largest}）",
+                MemoryBudgetWarning,
+                stacklevel=2
+            )
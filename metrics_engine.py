@@ -1,11 +1,18 @@
 from typing import Dict, List
 from config import MEMORY_DECAY_ALPHA, MEMORY_WINDOW, MINIMUM_BET_THRESHOLD
 from player_profiles import PlayerStats
-from scipy.stats import norm
+from statistics import NormalDist
+from functools import lru_cache
 import math
 from db_logger import log_confidence_bounds_details
 
 
+# ✅ 双侧置信水平对应的 z 值（标准库正态分布逆函数，按置信水平缓存，避免每局重复计算）
+@lru_cache(maxsize=None)
+def compute_z_value(confidence: float) -> float:
+    return NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+
+
 # ✅ 动态置信区间：根据置信水平和样本数量调整标准差的置信区间
 def compute_dynamic_std_confidence_interval(
     base_std: float,
@@ -14,7 +21,7 @@ def compute_dynamic_std_confidence_interval(
     round_id: int = -1,
     player_contributions: list = None
 ) -> tuple[float, float]:
-    z = norm.ppf(1 - (1 - confidence) / 2)
+    z = compute_z_value(confidence)
     margin = z * base_std / (sample_size ** 0.5)
     std_bounds = (0.0, base_std + margin)
 
@@ -55,10 +62,10 @@ def compute_rtp(stat: PlayerStats) -> float:
 
 
 # ✅ 态势值：记忆加权盈亏
-def compute_attitude(stat: PlayerStats) -> float:
+def compute_attitude(stat: PlayerStats, decay_alpha: float = MEMORY_DECAY_ALPHA) -> float:
     attitude = 0.0
     for i, m in enumerate(reversed(stat.memory_profits)):
-        weight = math.exp(-MEMORY_DECAY_ALPHA * i)
+        weight = math.exp(-decay_alpha * i)
         attitude += m * weight
     return attitude
 
@@ -0,0 +1,125 @@
+# multi_room.py
+
+"""
+多房间引擎：
+- 单进程内托管 N 个相互独立的牌桌（房间），每个房间拥有独立的 controller、水池、玩家、结构字典与日志流
+- 各房间按轮交错推进；位掩码评估模式下，同一轮所有房间的下注合并为一次矩阵运算
+- 输出整体吞吐（局/秒），用于评估单核可承载的桌数
+"""
+
+import time
+from typing import Dict, List
+from config import WINNING_STRUCTURES
+from db_logger import LogStream, use_log_stream
+from fast_simulation import build_initial_state
+from game_round_controller import GameRoundController
+from score_engine import use_bitmask_evaluation
+
+ROOMS = 8
+ROUNDS = 100
+PLAYERS = 20
+KEEP_LOGS = False  # 容量评估时默认每局清空房间日志，避免内存随轮数增长
+
+
+# 每个房间持有独立的结构字典（结构结果字段会在每轮写回字典）
+def copy_structures(structures: List[Dict] = WINNING_STRUCTURES) -> List[Dict]:
+    return [{"areas": list(s["areas"]), "base_weight": s["base_weight"]} for s in structures]
+
+
+# 单个房间：一套完整的单桌状态
+class GameRoom:
+    def __init__(self, room_id: int, num_players: int, keep_logs: bool = True):
+        self.room_id = room_id
+        self.keep_logs = keep_logs
+        self.logs = LogStream()
+        self.state = build_initial_state(num_players, structures=copy_structures())
+        self.controller = GameRoundController(self.state)
+        self.rounds_played = 0
+
+    # 开局：生成本轮下注（结构评估前的部分）
+    def begin_round(self):
+        with use_log_stream(self.logs):
+            self.controller.initialize_round()
+            self.controller.prepare_round_data()
+
+    # 完成本轮：结构评估 → 选择 → 结算 → 记录
+    def complete_round(self, evaluation=None):
+        with use_log_stream(self.logs):
+            self.controller.simulate_structures(evaluation=evaluation)
+            self.controller.choose_final_structure()
+            self.controller.settle_outcome()
+            self.controller.finalize_round()
+        self.rounds_played += 1
+        if not self.keep_logs:
+            self.logs.clear()
+
+    def summary(self) -> dict:
+        total_bet = sum(s.total_bet for s in self.state["stat_players"].values())
+        total_payout = sum(s.total_payout for s in self.state["stat_players"].values())
+        return {
+            "room_id": self.room_id,
+            "rounds": self.rounds_played,
+            "players": len(self.state["sim_players"]),
+            "total_bet": total_bet,
+            "total_payout": total_payout,
+            "rtp": total_payout / total_bet if total_bet > 0 else 0.0,
+            "pool_value": self.state["platform_pool"].get_pool_value()
+        }
+
+
+# ✅ 多房间引擎：交错推进所有房间，可合并批量评估
+class MultiRoomEngine:
+    def __init__(self, num_rooms: int, num_players: int, batch_evaluation: bool = True, keep_logs: bool = True):
+        self.rooms = [GameRoom(i + 1, num_players, keep_logs=keep_logs) for i in range(num_rooms)]
+        self.batch_evaluation = batch_evaluation
+        self.elapsed = 0.0
+
+    def _can_batch(self) -> bool:
+        return self.batch_evaluation and bool(self.rooms) and use_bitmask_evaluation(self.rooms[0].controller.structures)
+
+    def run_round(self):
+        for room in self.rooms:
+            room.begin_round()
+
+        evaluations = [None] * len(self.rooms)
+        if self._can_batch():
+            from structure_index import get_structure_index
+            index = get_structure_index(self.rooms[0].controller.structures)
+            evaluations = index.evaluate_many([room.state["current_bets"] for room in self.rooms])
+
+        for room, evaluation in zip(self.rooms, evaluations):
+            room.complete_round(evaluation)
+
+    def run(self, rounds: int) -> dict:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            self.run_round()
+        self.elapsed += time.perf_counter() - start
+        return self.report()
+
+    # ✅ 整体吞吐：所有房间累计局数 / 墙钟时间
+    def report(self) -> dict:
+        total_rounds = sum(room.rounds_played for room in self.rooms)
+        return {
+            "rooms": len(self.rooms),
+            "total_rounds": total_rounds,
+            "elapsed_sec": self.elapsed,
+            "rounds_per_sec": total_rounds / self.elapsed if self.elapsed > 0 else 0.0,
+            "batched_evaluation": self._can_batch(),
+            "room_summaries": [room.summary() for room in self.rooms]
+        }
+
+
+def main():
+    print(f"\n🏠 多房间模拟启动：{ROOMS} 个房间 × {ROUNDS} 局，每房间 {PLAYERS} 名玩家...")
+    engine = MultiRoomEngine(ROOMS, PLAYERS, keep_logs=KEEP_LOGS)
+    report = engine.run(ROUNDS)
+    for s in report["room_summaries"]:
+        print(f"  房间 {s['room_id']}: RTP {s['rtp']:.4f}，水池 {s['pool_value']:,.0f}")
+    print(
+        f"✅ 共 {report['total_rounds']} 局，用时 {report['elapsed_sec']:.2f} 秒，"
+        f"吞吐 {report['rounds_per_sec']:.1f} 局/秒（合并批量评估：{'是' if report['batched_evaluation'] else '否'}）"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# online_stats.py
+
+"""
+在线汇总统计（运行中累积，不依赖事后回放日志）：
+- 由 GameRoundController.finalize_round 逐局喂入，内存 O(玩家数 + 结构数)，与局数无关
+- 玩家终身累计：投注 / 返奖 / 赢钱次数、RTP 与态势极值、累计盈亏峰值 / 谷值、窗口净盈亏
+- 结构统计：各结构被选中次数与进入各筛选阶段次数
+- 平台统计：总投注 / 总返奖、水池轨迹的 Welford 均值方差与 P² 流式分位数
+"""
+
+import math
+from collections import deque
+from typing import Dict, List, Tuple
+from config import RECENT_RTP_WINDOW, ONLINE_POOL_QUANTILES
+
+LIFETIME_RTP_WARMUP_ROUNDS = 10  # 终身 RTP 极值从玩家第 11 局开始统计（与导出的终身汇总一致）
+
+LIFETIME_SUMMARY_COLUMNS = [
+    "玩家ID", "累计投注", "累计返奖", "净输赢", "RTP",
+    "投注次数", "赢钱次数", "最高RTP", "最低RTP",
+    "最高赢钱", "最低亏钱", "单局最高净盈利", "单局最高RTP", "单局最高净亏损",
+    "最高态势", "最低态势"
+]
+
+
+# ✅ Welford 在线均值 / 方差
+class Welford:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+# ✅ P² 流式分位数（Jain & Chlamtac）：5 个标记点，O(1) 内存
+class P2Quantile:
+    def __init__(self, p: float):
+        self.p = p
+        self._initial = []
+        self.heights = None
+        self.positions = None
+        self.desired = None
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def update(self, x: float):
+        if self.heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                p = self.p
+                self.heights = sorted(self._initial)
+                self.positions = [1, 2, 3, 4, 5]
+                self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+            return
+
+        q, n = self.heights, self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    def value(self) -> float:
+        if self.heights is not None:
+            return self.heights[2]
+        if not self._initial:
+            return float("nan")
+        ordered = sorted(self._initial)
+        return ordered[min(len(ordered) - 1, int(round(self.p * (len(ordered) - 1))))]
+
+
+# 单个玩家的终身累计量（字段与导出的终身汇总表一致）
+class PlayerAccumulator:
+    __slots__ = (
+        "rounds", "total_bet", "total_payout", "bet_count", "win_count", "cumulative_net",
+        "max_rtp", "min_rtp", "max_round_rtp", "peak_cumulative", "trough_cumulative",
+        "max_round_net", "min_round_net", "max_attitude", "min_attitude", "profit_window"
+    )
+
+    def __init__(self, profit_window: int):
+        self.rounds = 0
+        self.total_bet = 0.0
+        self.total_payout = 0.0
+        self.bet_count = 0
+        self.win_count = 0
+        self.cumulative_net = 0.0
+        self.max_rtp, self.min_rtp = float("-inf"), float("inf")
+        self.max_round_rtp = float("-inf")
+        self.peak_cumulative, self.trough_cumulative = float("-inf"), float("inf")
+        self.max_round_net, self.min_round_net = float("-inf"), float("inf")
+        self.max_attitude, self.min_attitude = float("-inf"), float("inf")
+        self.profit_window = deque(maxlen=profit_window)
+
+    def update(self, bet: float, payout: float, attitude: float, rtp_historical: float):
+        net = payout - bet
+        self.total_bet += bet
+        self.total_payout += payout
+        self.cumulative_net += net
+        self.bet_count += 1 if bet > 0 else 0
+        self.win_count += 1 if payout > bet else 0
+
+        self.max_round_rtp = max(self.max_round_rtp, payout / bet if bet > 0 else 0.0)
+        self.max_round_net = max(self.max_round_net, net)
+        self.min_round_net = min(self.min_round_net, net)
+        self.max_attitude = max(self.max_attitude, attitude)
+        self.min_attitude = min(self.min_attitude, attitude)
+        self.peak_cumulative = max(self.peak_cumulative, self.cumulative_net)
+        self.trough_cumulative = min(self.trough_cumulative, self.cumulative_net)
+
+        if self.rounds >= LIFETIME_RTP_WARMUP_ROUNDS:
+            self.max_rtp = max(self.max_rtp, rtp_historical)
+            self.min_rtp = min(self.min_rtp, rtp_historical)
+        self.rounds += 1
+        self.profit_window.append(net)
+
+    def lifetime_row(self, player_id: str) -> Dict:
+        return {
+            "玩家ID": player_id,
+            "累计投注": self.total_bet,
+            "累计返奖": self.total_payout,
+            "净输赢": self.total_payout - self.total_bet,
+            "RTP": self.total_payout / self.total_bet if self.total_bet > 0 else 0.0,
+            "投注次数": self.bet_count,
+            "赢钱次数": self.win_count,
+            "最高RTP": self.max_rtp,
+            "最低RTP": self.min_rtp,
+            "最高赢钱": self.peak_cumulative,
+            "最低亏钱": self.trough_cumulative,
+            "单局最高净盈利": self.max_round_net,
+            "单局最高RTP": self.max_round_rtp,
+            "单局最高净亏损": self.min_round_net,
+            "最高态势": self.max_attitude,
+            "最低态势": self.min_attitude
+        }
+
+
+# ✅ 在线汇总器：每局结算后更新，任意时刻可读取汇总
+class OnlineAggregator:
+    def __init__(self, pool_quantiles: Tuple[float, ...] = ONLINE_POOL_QUANTILES, profit_window: int = RECENT_RTP_WINDOW):
+        self.profit_window = profit_window
+        self.players: Dict[str, PlayerAccumulator] = {}
+        self.structure_counts: Dict[tuple, Dict[str, int]] = {}
+        self.rounds = 0
+        self.last_round_id = 0
+        self.total_bet = 0.0
+        self.total_payout = 0.0
+        self.pool = Welford()
+        self.pool_min, self.pool_max = float("inf"), float("-inf")
+        self.pool_quantiles = {q: P2Quantile(q) for q in pool_quantiles}
+        self.target_rtp_counts: Dict[float, int] = {}
+        self.shadow_totals: Dict[str, Dict[str, float]] = {}  # 影子策略：局数、与主策略一致的局数、累计预计盈亏
+
+    def update_player(self, player_id: str, bet: float, payout: float, attitude: float, rtp_historical: float):
+        acc = self.players.get(player_id)
+        if acc is None:
+            acc = self.players[player_id] = PlayerAccumulator(self.profit_window)
+        acc.update(bet, payout, attitude, rtp_historical)
+
+    def update_round(self, round_id: int, total_bet: float, total_payout: float, pool_value: float, target_rtp: float, structures: List[Dict] = None):
+        self.rounds += 1
+        self.last_round_id = round_id
+        self.total_bet += total_bet
+        self.total_payout += total_payout
+
+        self.pool.update(pool_value)
+        self.pool_min = min(self.pool_min, pool_value)
+        self.pool_max = max(self.pool_max, pool_value)
+        for estimator in self.pool_quantiles.values():
+            estimator.update(pool_value)
+        self.target_rtp_counts[target_rtp] = self.target_rtp_counts.get(target_rtp, 0) + 1
+
+        for s in structures or []:
+            key = tuple(s.get("game_areas") or s.get("areas") or ())
+            counts = self.structure_counts.setdefault(key, {"selected": 0, "phase1": 0, "phase2": 0})
+            counts["selected"] += 1 if s.get("is_final_outcome") else 0
+            counts["phase1"] += 1 if s.get("entered_phase1") else 0
+            counts["phase2"] += 1 if s.get("entered_phase2") else 0
+
+    # shadows = {标签: (structure_id, 平台预计盈亏)}
+    def update_shadows(self, primary_structure_id, shadows: Dict[str, tuple]):
+        for label, (sid, profit) in shadows.items():
+            totals = self.shadow_totals.setdefault(label, {"rounds": 0, "agree": 0, "profit": 0.0})
+            totals["rounds"] += 1
+            totals["agree"] += 1 if sid == primary_structure_id else 0
+            totals["profit"] += profit or 0.0
+
+    def shadow_summary_rows(self) -> List[Dict]:
+        return [
+            {"影子策略": label, "局数": t["rounds"], "与主策略一致率": t["agree"] / t["rounds"] if t["rounds"] else 0.0, "累计预计盈亏": t["profit"]}
+            for label, t in self.shadow_totals.items()
+        ]
+
+    # ✅ 玩家终身汇总（列与 export_engine 的终身汇总表一致）
+    def player_lifetime_rows(self) -> List[Dict]:
+        return [acc.lifetime_row(pid) for pid, acc in self.players.items()]
+
+    def window_net_profit(self, player_id: str) -> float:
+        acc = self.players.get(player_id)
+        return sum(acc.profit_window) if acc else 0.0
+
+    def structure_selection_rows(self) -> List[Dict]:
+        return [
+            {"结构": list(areas), "选中次数": c["selected"], "选中占比": c["selected"] / self.rounds if self.rounds else 0.0,
+             "进入第一阶段": c["phase1"], "进入第二阶段": c["phase2"]}
+            for areas, c in self.structure_counts.items()
+        ]
+
+    def pool_summary(self) -> Dict:
+        return {
+            "rounds": self.pool.count,
+            "mean": self.pool.mean,
+            "std": self.pool.std,
+            "min": self.pool_min if self.pool.count else 0.0,
+            "max": self.pool_max if self.pool.count else 0.0,
+            "quantiles": {q: est.value() for q, est in self.pool_quantiles.items()}
+        }
+
+    def platform_summary(self) -> Dict:
+        return {
+            "rounds": self.rounds,
+            "last_round_id": self.last_round_id,
+            "total_bet": self.total_bet,
+            "total_payout": self.total_payout,
+            "net_profit": self.total_bet - self.total_payout,
+            "rtp": self.total_payout / self.total_bet if self.total_bet > 0 else 0.0,
+            "target_rtp_rounds": dict(sorted(self.target_rtp_counts.items()))
+        }
+
+    def summary(self) -> Dict:
+        return {
+            "platform": self.platform_summary(),
+            "pool": self.pool_summary(),
+            "structures": self.structure_selection_rows(),
+            "shadows": self.shadow_summary_rows(),
+            "players": self.player_lifetime_rows()
+        }
@@ -0,0 +1,129 @@
+# paired_comparison.py
+
+"""
+策略变体配对比较（公共随机数模式）：
+- 两个变体（SimulationConfig 覆盖项）在每个重复中使用同一种子的分用途随机流，玩家画像与逐局下注完全一致
+- 按重复计算平台 RTP、水池终值的配对差值：均值、标准差、置信区间
+- 同时给出独立抽样下的方差估计，报告方差缩减倍数（≈ 达到相同置信度所需局数的缩减倍数）
+"""
+
+import time
+import math
+import statistics
+from typing import Dict, List
+from config import DEFAULT_SIMULATION_CONFIG, WINNING_STRUCTURES
+from db_logger import LogStream, use_log_stream
+from fast_simulation import build_initial_state
+from game_round_controller import GameRoundController
+from metrics_engine import compute_z_value
+from random_streams import RandomStreams
+
+COMPARE_ROUNDS = 200
+COMPARE_PLAYERS = 20
+COMPARE_REPLICATIONS = 10
+COMPARE_SEED = 42
+COMPARE_CONFIDENCE = 0.95
+
+VARIANT_A = {"enable_memory_filter": True}
+VARIANT_B = {"enable_memory_filter": False}
+
+METRICS = ["rtp", "pool_final", "net_profit"]
+
+
+# ✅ 单个变体的一次重复：使用给定种子的分用途随机流
+def run_variant(params: Dict, rounds: int, num_players: int, seed: int) -> Dict:
+    cfg = DEFAULT_SIMULATION_CONFIG.with_overrides(**params)
+    structures = [{"areas": list(s["areas"]), "base_weight": s["base_weight"]} for s in WINNING_STRUCTURES]
+    state = build_initial_state(num_players, sim_config=cfg, random_streams=RandomStreams(seed), structures=structures)
+    controller = GameRoundController(state)
+    logs = LogStream()
+
+    total_bet, total_payout = 0.0, 0.0
+    for _ in range(rounds):
+        with use_log_stream(logs):
+            controller.initialize_round()
+            controller.prepare_round_data()
+            controller.simulate_structures()
+            controller.choose_final_structure()
+            controller.settle_outcome()
+            controller.finalize_round()
+        logs.clear()
+        total_bet += state["_summary"]["total_bet_amount_platform"]
+        total_payout += state["_summary"]["total_payout_amount_platform"]
+
+    return {
+        "rtp": total_payout / total_bet if total_bet > 0 else 0.0,
+        "pool_final": controller.pool.get_pool_value(),
+        "net_profit": total_bet - total_payout,
+        "total_bet": total_bet
+    }
+
+
+# ✅ 配对差值统计：差值均值与置信区间；独立抽样方差 = Var(A) + Var(B)，配对方差 = Var(A - B)
+def paired_statistics(a: List[float], b: List[float], confidence: float = COMPARE_CONFIDENCE) -> Dict:
+    diffs = [x - y for x, y in zip(a, b)]
+    n = len(diffs)
+    mean_diff = statistics.fmean(diffs) if diffs else 0.0
+    if n < 2:
+        return {"mean_diff": mean_diff, "std_diff": 0.0, "ci": (mean_diff, mean_diff), "variance_reduction": 1.0, "n": n}
+
+    var_paired = statistics.variance(diffs)
+    var_independent = statistics.variance(a) + statistics.variance(b)
+    margin = compute_z_value(confidence) * math.sqrt(var_paired / n)
+    return {
+        "mean_diff": mean_diff,
+        "std_diff": math.sqrt(var_paired),
+        "ci": (mean_diff - margin, mean_diff + margin),
+        "variance_reduction": var_independent / var_paired if var_paired > 0 else float("inf"),
+        "n": n
+    }
+
+def compare_variants(
+    variant_a: Dict = VARIANT_A,
+    variant_b: Dict = VARIANT_B,
+    rounds: int = COMPARE_ROUNDS,
+    num_players: int = COMPARE_PLAYERS,
+    replications: int = COMPARE_REPLICATIONS,
+    seed: int = COMPARE_SEED,
+    confidence: float = COMPARE_CONFIDENCE
+) -> Dict:
+    runs_a, runs_b = [], []
+    for rep in range(replications):
+        runs_a.append(run_variant(variant_a, rounds, num_players, seed + rep))
+        runs_b.append(run_variant(variant_b, rounds, num_players, seed + rep))
+
+    return {
+        "variant_a": variant_a,
+        "variant_b": variant_b,
+        "rounds": rounds,
+        "replications": replications,
+        "confidence": confidence,
+        "identical_bets": all(ra["total_bet"] == rb["total_bet"] for ra, rb in zip(runs_a, runs_b)),
+        "metrics": {
+            m: {
+                "mean_a": statistics.fmean(r[m] for r in runs_a),
+                "mean_b": statistics.fmean(r[m] for r in runs_b),
+                **paired_statistics([r[m] for r in runs_a], [r[m] for r in runs_b], confidence)
+            }
+            for m in METRICS
+        }
+    }
+
+
+def main():
+    print(
+        f"\n⚖️ 配对比较：A={VARIANT_A} vs B={VARIANT_B}，"
+        f"{COMPARE_REPLICATIONS} 次重复 × {COMPARE_ROUNDS} 局，{COMPARE_PLAYERS} 名玩家..."
+    )
+    start = time.time()
+    report = compare_variants()
+    for name, s in report["metrics"].items():
+        low, high = s["ci"]
+        print(
+            f"  {name}: A {s['mean_a']:,.4f} / B {s['mean_b']:,.4f}，差值 {s['mean_diff']:+,.4f}"
+            f"（{report['confidence']:.0%} 区间 {low:+,.4f} ~ {high:+,.4f}），方差缩减 ×{s['variance_reduction']:.1f}"
+        )
+    print(f"✅ 完成，用时 {time.time() - start:.1f} 秒（两变体下注完全一致：{'是' if report['identical_bets'] else '否'}）")
+
+if __name__ == "__main__":
+    main()
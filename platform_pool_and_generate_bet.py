@@ -6,37 +6,25 @@
 - 根据水位线调整目标 RTP（实现动态放水 / 回收策略）
 """
 
-from config import TARGET_RTP, PAYOUT_RATES
+from config import TARGET_RTP, PAYOUT_RATES, POOL_RTP_THRESHOLDS
 from typing import List, Tuple
+from collections import deque
 import random
+from random_streams import ACTIVITY, BET_AMOUNT, AREA_CHOICE
 
 # 平台公共水池、投注在抽水后流入、开奖从水池流出
+# history_limit：逐笔流水只保留最近 N 条（None 表示全量保留）
 class PlatformPool:
-    def __init__(self, tax_rate: float = 1.0 - TARGET_RTP):
-        rtp_thresholds: List[Tuple[int, float, float]] = [
-            # (200,   10_000_000, float("inf")),
-            # (140,   8_000_000, 10_000_000),
-            # (120,   6_000_000, 8_000_000),
-            # (97,    4_000_000, 6_000_000),
-            # (80,    2_000_000, 4_000_000),
-            # (60,    0,         2_000_000),
-            # (0,     -float("inf"), 0),
-            (105,   2_500_000, float("inf")),
-            (100,   2_000_000, 2_500_000),
-            (97,    1_500_000, 2_000_000),
-            (90,    1000_000, 1_500_000),
-            (80,    500_000, 1000_000),
-            (70,    0,          500_000),
-            (50,     -float("inf"), 0),
-        ]
-        self.rtp_thresholds = rtp_thresholds
+    def __init__(self, tax_rate: float = 1.0 - TARGET_RTP, rtp_thresholds: List[Tuple[int, float, float]] = POOL_RTP_THRESHOLDS, history_limit: int = None):
+        # 水位线配置见 config.POOL_RTP_THRESHOLDS（参数扫描时可按 SimulationConfig 覆盖）
+        self.rtp_thresholds = [tuple(t) for t in rtp_thresholds]
 
         middle_entry = self.rtp_thresholds[len(self.rtp_thresholds) // 2]
         middle_low, middle_high = middle_entry[1], middle_entry[2]
         self.pool_value = (middle_low + middle_high) / 2
 
         self.tax_rate = tax_rate
-        self.history = []
+        self.history = [] if history_limit is None else deque(maxlen=history_limit)
 
     def inflow(self, bet_amount: float):
         taxed = bet_amount * (1 - self.tax_rate)
@@ -57,27 +45,36 @@ class PlatformPool:
         return self.pool_value
 
     def get_latest_deltas(self, n: int = 10):
+        if isinstance(self.history, deque):
+            return list(self.history)[-n:]
         return self.history[-n:]
 
 
 # 玩家下注模拟：基于频率、区域偏好与金额分布动态生成下注结构
-def generate_player_bets(players: dict, round_index: int) -> dict:
+# streams：可选的分用途随机流（公共随机数模式），活跃度 / 下注金额 / 区域选择各用一条按局派生的随机流
+def generate_player_bets(players: dict, round_index: int, streams=None) -> dict:
     bets = {}
+    if streams is not None:
+        activity_rng = streams.for_round(ACTIVITY, round_index)
+        amount_rng = streams.for_round(BET_AMOUNT, round_index)
+        area_rng = streams.for_round(AREA_CHOICE, round_index)
+    else:
+        activity_rng = amount_rng = area_rng = random
 
     for pid, player in players.items():
         if round_index == 1:
-            player.is_active = random.random() < 1
+            player.is_active = activity_rng.random() < 1
             if not player.is_active:
                 player.consecutive_missed = 1
         
         else:
             if player.is_active:
-                if random.random() > 2:
+                if activity_rng.random() > 2:
                     player.is_active = False
                     player.consecutive_missed = 1
             else:
                 p_restore = min(1.0, 0.1 + 0.05 * player.consecutive_missed)
-                if random.random() < p_restore:
+                if activity_rng.random() < p_restore:
                     player.is_active = True
                     player.consecutive_missed = 0
                 else:
@@ -86,10 +83,10 @@ def generate_player_bets(players: dict, round_index: int) -> dict:
         if not player.is_active:
             continue
 
-        total_amount = random.randint(int(player.amount_scale * 0.8), int(player.amount_scale * 1.2))
+        total_amount = amount_rng.randint(int(player.amount_scale * 0.8), int(player.amount_scale * 1.2))
         min_area, max_area = player.area_range
-        chosen_num = random.randint(min_area, max_area)
-        chosen_areas = random.sample(range(1, 9), chosen_num)
+        chosen_num = area_rng.randint(min_area, max_area)
+        chosen_areas = area_rng.sample(range(1, 9), chosen_num)
 
         base_weights = [1 / PAYOUT_RATES[area] for area in chosen_areas]
         total_weight = sum(base_weights)
@@ -99,7 +96,7 @@ def generate_player_bets(players: dict, round_index: int) -> dict:
         unit_allocations = [0] * chosen_num
 
         for _ in range(total_units):
-            r = random.random()
+            r = area_rng.random()
             acc = 0.0
             for i, w in enumerate(norm_weights):
                 acc += w
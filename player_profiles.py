@@ -1,9 +1,19 @@
 import random
-import numpy as np
+from array import array
 from typing import List, Dict
 from collections import deque
+from collections.abc import MutableMapping
 import math
 from config import RECENT_RTP_WINDOW, MEMORY_WINDOW
+from config import PLAYER_HISTORY_MODE, PLAYER_HISTORY_LIMIT, PLAYER_HISTORY_CHUNK_SIZE, BULK_POPULATION_MIN_PLAYERS
+
+# 充值额分布：等级 → (对数均值, 对数标准差, 下限, 上限, 取整步长)；逐个生成与批量生成共用
+RECHARGE_PARAMS = {
+    '超R': (5, 0.6, 1000, 100000, 1000),
+    '大R': (4, 0.5, 100, 5000, 100),
+    '中R': (3, 0.4, 30, 100, 10),
+    '小R': (2, 0.3, 0, 30, 5),
+}
 
 # 初始化玩家信息(给玩家打上各个类型的标签、并决定投注额的等级)
 class Player:
@@ -12,62 +22,281 @@ class Player:
     BET_FREQUENCY = {'高频': 10, '中频': 3, '低频': 1}
     REBET_PROBABILITY = {'高概率': 0.8, '低概率': 0.3, '零概率': 0.0}
 
-    def __init__(self, uid, force_super=False):
+    # rng：可选的随机流（公共随机数模式下为玩家画像流），默认使用全局 random
+    def __init__(self, uid, force_super=False, rng=None):
         self.uid = uid
+        rng = rng or random
 
         if force_super:
             self.bet_amount_class = '超R'
         else:
-            self.bet_amount_class = random.choices(
+            self.bet_amount_class = rng.choices(
                 ['大R', '中R', '小R'], weights=[2, 3, 4], k=1
             )[0]
 
-        self.bet_area_style = random.choices(list(self.AREA_RANGE_MAP.keys()), weights=[0, 6, 2], k=1)[0]
-        self.bet_freq_class = random.choices(list(self.BET_FREQUENCY.keys()), weights=[3, 3, 1], k=1)[0]
-        self.rebet_prob_class = random.choices(list(self.REBET_PROBABILITY.keys()), weights=[5, 3, 2], k=1)[0]
+        self.bet_area_style = rng.choices(list(self.AREA_RANGE_MAP.keys()), weights=[0, 6, 2], k=1)[0]
+        self.bet_freq_class = rng.choices(list(self.BET_FREQUENCY.keys()), weights=[3, 3, 1], k=1)[0]
+        self.rebet_prob_class = rng.choices(list(self.REBET_PROBABILITY.keys()), weights=[5, 3, 2], k=1)[0]
 
         self.amount_scale = self.AMOUNT_SCALE_MAP[self.bet_amount_class]
         self.area_range = self.AREA_RANGE_MAP[self.bet_area_style]
         self.bet_freq_value = self.BET_FREQUENCY[self.bet_freq_class]
         self.rebet_prob = self.REBET_PROBABILITY[self.rebet_prob_class]
 
-        self.recharge_amount = self._generate_recharge_amount()
+        self.recharge_amount = self._generate_recharge_amount(rng)
         self.consecutive_missed = 0
         self.is_active = False
 
-    def _generate_recharge_amount(self):
-        if self.bet_amount_class == "超R":
-            val = int(np.random.lognormal(mean=5, sigma=0.6))
-            val = min(max(val, 1000), 100000)
-            return val // 1000 * 1000
-        elif self.bet_amount_class == "大R":
-            val = int(np.random.lognormal(mean=4, sigma=0.5))
-            val = min(max(val, 100), 5000)
-            return val // 100 * 100
-        elif self.bet_amount_class == "中R":
-            val = int(np.random.lognormal(mean=3, sigma=0.4))
-            val = min(max(val, 30), 100)
-            return val // 10 * 10
-        else:
-            val = int(np.random.lognormal(mean=2, sigma=0.3))
-            val = min(max(val, 0), 30)
-            return val // 5 * 5
+    def _generate_recharge_amount(self, rng=random):
+        mu, sigma, low, high, step = RECHARGE_PARAMS[self.bet_amount_class]
+        val = int(rng.lognormvariate(mu, sigma))
+        val = min(max(val, low), high)
+        return val // step * step
+
+
+# ✅ 列式玩家群体：画像存为 numpy 数组（每列一个），按玩家 ID 取出的是轻量 Player 视图
+# - 标签列存类别编码，派生属性（金额档位 / 区域范围 / 频率 / 复投概率）按编码查表
+# - 视图读写直接落到数组（活跃状态、连续缺席局数、充值额），与 Player 对象的属性接口一致
+# - 批量生成的玩家 ID 为 player_1..player_N，不逐个存储；运行中新加入的玩家（服务 / 回放）以普通 Player 对象另存
+AMOUNT_CLASSES = ('超R', '大R', '中R', '小R')
+AREA_STYLES = tuple(Player.AREA_RANGE_MAP)
+FREQ_CLASSES = tuple(Player.BET_FREQUENCY)
+REBET_CLASSES = tuple(Player.REBET_PROBABILITY)
+
+_AMOUNT_SCALES = tuple(Player.AMOUNT_SCALE_MAP[c] for c in AMOUNT_CLASSES)
+_AREA_RANGES = tuple(Player.AREA_RANGE_MAP[s] for s in AREA_STYLES)
+_FREQ_VALUES = tuple(Player.BET_FREQUENCY[c] for c in FREQ_CLASSES)
+_REBET_PROBS = tuple(Player.REBET_PROBABILITY[c] for c in REBET_CLASSES)
+
+
+class PlayerView:
+    __slots__ = ("_pop", "_i", "uid")
+
+    def __init__(self, population, index: int, uid: str):
+        self._pop = population
+        self._i = index
+        self.uid = uid
+
+    bet_amount_class = property(lambda self: AMOUNT_CLASSES[self._pop.amount_code[self._i]])
+    bet_area_style = property(lambda self: AREA_STYLES[self._pop.area_code[self._i]])
+    bet_freq_class = property(lambda self: FREQ_CLASSES[self._pop.freq_code[self._i]])
+    rebet_prob_class = property(lambda self: REBET_CLASSES[self._pop.rebet_code[self._i]])
+    amount_scale = property(lambda self: _AMOUNT_SCALES[self._pop.amount_code[self._i]])
+    area_range = property(lambda self: _AREA_RANGES[self._pop.area_code[self._i]])
+    bet_freq_value = property(lambda self: _FREQ_VALUES[self._pop.freq_code[self._i]])
+    rebet_prob = property(lambda self: _REBET_PROBS[self._pop.rebet_code[self._i]])
+
+    @property
+    def recharge_amount(self):
+        return int(self._pop.recharge_amount[self._i])
+
+    @recharge_amount.setter
+    def recharge_amount(self, value):
+        self._pop.recharge_amount[self._i] = value
+
+    @property
+    def consecutive_missed(self):
+        return int(self._pop.consecutive_missed[self._i])
+
+    @consecutive_missed.setter
+    def consecutive_missed(self, value):
+        self._pop.consecutive_missed[self._i] = value
+
+    @property
+    def is_active(self):
+        return bool(self._pop.is_active[self._i])
+
+    @is_active.setter
+    def is_active(self, value):
+        self._pop.is_active[self._i] = value
+
+
+class PlayerPopulation(MutableMapping):
+    ID_PREFIX = "player_"
+
+    def __init__(self, amount_code, area_code, freq_code, rebet_code, recharge_amount):
+        import numpy as np
+
+        self.size = len(amount_code)
+        self.amount_code = amount_code
+        self.area_code = area_code
+        self.freq_code = freq_code
+        self.rebet_code = rebet_code
+        self.recharge_amount = recharge_amount
+        self.consecutive_missed = np.zeros(self.size, dtype=np.int32)
+        self.is_active = np.zeros(self.size, dtype=bool)
+        self.extra: Dict[str, Player] = {}
+
+    # ✅ 批量生成：与 Player 逐个生成相同的分布与截断规则，全部属性一次性按数组抽取
+    @classmethod
+    def generate(cls, num_players: int, super_r_count: int = 1, seed: int = None) -> "PlayerPopulation":
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        n, supers = num_players, min(super_r_count, num_players)
+
+        def draw(weights, size):
+            p = np.asarray(weights, dtype=np.float64)
+            return rng.choice(len(p), size=size, p=p / p.sum()).astype(np.int8)
+
+        amount_code = np.zeros(n, dtype=np.int8)  # 编码 0 = 超R（前 super_r_count 名）
+        amount_code[supers:] = draw([2, 3, 4], n - supers) + 1
+        area_code = draw([0, 6, 2], n)
+        freq_code = draw([3, 3, 1], n)
+        rebet_code = draw([5, 3, 2], n)
+
+        params = np.array([RECHARGE_PARAMS[c] for c in AMOUNT_CLASSES], dtype=np.float64)
+        mu, sigma, low, high, step = (params[amount_code, k] for k in range(5))
+        raw = np.floor(rng.lognormal(mu, sigma)).astype(np.int64)
+        recharge = np.clip(raw, low.astype(np.int64), high.astype(np.int64))
+        recharge = recharge // step.astype(np.int64) * step.astype(np.int64)
+
+        return cls(amount_code, area_code, freq_code, rebet_code, recharge)
+
+    def _index(self, pid) -> int:
+        if isinstance(pid, str) and pid.startswith(self.ID_PREFIX):
+            suffix = pid[len(self.ID_PREFIX):]
+            if suffix.isdigit() and 1 <= int(suffix) <= self.size:
+                return int(suffix) - 1
+        return -1
+
+    def __getitem__(self, pid):
+        if pid in self.extra:
+            return self.extra[pid]
+        i = self._index(pid)
+        if i < 0:
+            raise KeyError(pid)
+        return PlayerView(self, i, pid)
+
+    def __setitem__(self, pid, player):
+        self.extra[pid] = player
+
+    def __delitem__(self, pid):
+        del self.extra[pid]
+
+    def __contains__(self, pid):
+        return pid in self.extra or self._index(pid) >= 0
+
+    def __iter__(self):
+        for i in range(1, self.size + 1):
+            pid = f"{self.ID_PREFIX}{i}"
+            if pid not in self.extra:
+                yield pid
+        yield from self.extra
+
+    def __len__(self):
+        return self.size + sum(1 for pid in self.extra if self._index(pid) < 0)
+
+# ✅ 不保留历史：append 为空操作，所有副本共用同一实例
+class NullHistory:
+    __slots__ = ()
+
+    def append(self, bet: float, payout: float):
+        pass
+
+    def copy(self):
+        return self
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+    def to_list(self) -> List[dict]:
+        return []
+
+NULL_HISTORY = NullHistory()
+
+
+# ✅ 分块列式历史：(bet, payout) 交错存入 float64 数组，写满 chunk_size 局后冻结
+# - 冻结块放在不可变元组中，copy() 共享全部冻结块，只复制未满的尾块（写时复制，副本开销 ≤ 一个块）
+# - limit 非空时为环形保留：只对外呈现最近 limit 局，整块丢弃更早的数据，存储不超过 limit + 2 个块
+class ChunkedHistory:
+    __slots__ = ("chunk_size", "limit", "_chunks", "_tail", "_count")
+
+    def __init__(self, chunk_size: int = PLAYER_HISTORY_CHUNK_SIZE, limit: int = None):
+        self.chunk_size = chunk_size
+        self.limit = limit
+        self._chunks = ()
+        self._tail = array("d")
+        self._count = 0  # 当前存储的记录数（含尚未对外呈现的环形溢出部分）
+
+    def append(self, bet: float, payout: float):
+        tail = self._tail
+        tail.append(bet)
+        tail.append(payout)
+        self._count += 1
+        if len(tail) >= 2 * self.chunk_size:
+            self._chunks = self._chunks + (tail,)
+            self._tail = array("d")
+            if self.limit is not None:
+                dropped = 0
+                while self._count - self.chunk_size * (dropped + 1) >= self.limit:
+                    dropped += 1
+                if dropped:
+                    self._chunks = self._chunks[dropped:]
+                    self._count -= dropped * self.chunk_size
+
+    def copy(self):
+        new = ChunkedHistory(self.chunk_size, self.limit)
+        new._chunks = self._chunks
+        new._tail = array("d", self._tail)
+        new._count = self._count
+        return new
+
+    def __len__(self):
+        return self._count if self.limit is None else min(self._count, self.limit)
+
+    def __iter__(self):
+        skip = self._count - len(self)
+        for block in self._chunks + (self._tail,):
+            for i in range(0, len(block), 2):
+                if skip:
+                    skip -= 1
+                    continue
+                yield block[i], block[i + 1]
+
+    # 列式读取：返回 (bets, payouts) 两个 float64 数组
+    def columns(self) -> tuple:
+        flat = array("d")
+        for block in self._chunks:
+            flat.extend(block)
+        flat.extend(self._tail)
+        start = 2 * (self._count - len(self))
+        return flat[start::2], flat[start + 1::2]
+
+    def to_list(self) -> List[dict]:
+        return [{"bet": bet, "payout": payout} for bet, payout in self]
+
+
+# ✅ 按保留方式创建历史容器（"off" / "ring" / "columnar"）
+def make_history(mode: str = PLAYER_HISTORY_MODE, limit: int = PLAYER_HISTORY_LIMIT):
+    if mode == "off":
+        return NULL_HISTORY
+    if mode == "ring":
+        return ChunkedHistory(limit=limit)
+    if mode == "columnar":
+        return ChunkedHistory()
+    raise ValueError(f"未知的玩家历史保留方式：{mode}")
+
 
 # 主要用于供其他模块调用此类的各种方法以配合计算（与初始化的类不同、本类主要负责过程）
+# 窗口长度可按实例传入（SimulationConfig），copy() 沿用原实例的窗口长度，并与原实例共享历史的冻结部分
 class PlayerStats:
-    def __init__(self):
+    def __init__(self, recent_window: int = RECENT_RTP_WINDOW, memory_window: int = MEMORY_WINDOW, history_mode: str = PLAYER_HISTORY_MODE):
         self.total_bet: float = 0.0
         self.total_payout: float = 0.0
-        self.history: List[dict] = []
-        self.recent_bets = deque(maxlen=RECENT_RTP_WINDOW)
-        self.recent_payouts = deque(maxlen=RECENT_RTP_WINDOW)
-        self.memory_profits = deque(maxlen=MEMORY_WINDOW)
+        self.history = make_history(history_mode)
+        self.recent_bets = deque(maxlen=recent_window)
+        self.recent_payouts = deque(maxlen=recent_window)
+        self.memory_profits = deque(maxlen=memory_window)
 
     def update(self, bet: float, payout: float):
         from metrics_engine import compute_memory_profit
         self.total_bet += bet
         self.total_payout += payout
-        self.history.append({"bet": bet, "payout": payout})
+        self.history.append(bet, payout)
 
         if bet > 0:
             self.recent_bets.append(bet)
@@ -77,7 +306,7 @@ class PlayerStats:
             self.memory_profits.append(memory_profit)
 
     def copy(self):
-        new = PlayerStats()
+        new = PlayerStats.__new__(PlayerStats)
         new.total_bet = self.total_bet
         new.total_payout = self.total_payout
         new.history = self.history.copy()
@@ -90,31 +319,34 @@ class PlayerStats:
         return {
             "total_bet": self.total_bet,
             "total_payout": self.total_payout,
-            "history": self.history.copy(),
+            "history": self.history.to_list(),
             "recent_bets": list(self.recent_bets),
             "recent_payouts": list(self.recent_payouts),
             "memory_profits": list(self.memory_profits)
         }
 
     @staticmethod
-    def from_dict(data):
-        obj = PlayerStats()
+    def from_dict(data, recent_window: int = RECENT_RTP_WINDOW, memory_window: int = MEMORY_WINDOW, history_mode: str = PLAYER_HISTORY_MODE):
+        obj = PlayerStats(recent_window, memory_window, history_mode)
         obj.total_bet = data.get("total_bet", 0.0)
         obj.total_payout = data.get("total_payout", 0.0)
-        obj.history = data.get("history", [])
-        obj.recent_bets = deque(data.get("recent_bets", []), maxlen=RECENT_RTP_WINDOW)
-        obj.recent_payouts = deque(data.get("recent_payouts", []), maxlen=RECENT_RTP_WINDOW)
-        obj.memory_profits = deque(data.get("memory_profits", []), maxlen=MEMORY_WINDOW)
+        for record in data.get("history", []):
+            obj.history.append(record["bet"], record["payout"])
+        obj.recent_bets = deque(data.get("recent_bets", []), maxlen=recent_window)
+        obj.recent_payouts = deque(data.get("recent_payouts", []), maxlen=recent_window)
+        obj.memory_profits = deque(data.get("memory_profits", []), maxlen=memory_window)
         return obj
 
 
-# ✅ 初始化玩家列表
-def initialize_players(num_players=10, super_r_count=1) -> Dict[str, Player]:
+# ✅ 初始化玩家列表（玩家数达到 BULK_POPULATION_MIN_PLAYERS 时返回列式 PlayerPopulation，种子取自 rng）
+def initialize_players(num_players=10, super_r_count=1, rng=None) -> Dict[str, Player]:
+    if num_players >= BULK_POPULATION_MIN_PLAYERS:
+        return PlayerPopulation.generate(num_players, super_r_count, seed=(rng or random).getrandbits(63))
     players = {}
     for i in range(1, super_r_count + 1):
         pid = f'player_{i}'
-        players[pid] = Player(uid=pid, force_super=True)
+        players[pid] = Player(uid=pid, force_super=True, rng=rng)
     for i in range(super_r_count + 1, num_players + 1):
         pid = f'player_{i}'
-        players[pid] = Player(uid=pid, force_super=False)
+        players[pid] = Player(uid=pid, force_super=False, rng=rng)
     return players
@@ -0,0 +1,40 @@
+# random_streams.py
+
+"""
+分用途随机流（公共随机数 / 方差缩减）：
+- 每个用途一条独立的带种子随机流：玩家画像、活跃度、下注金额、区域选择、最终开奖选择
+- 按局使用的随机流以 (种子, 用途, 局号) 派生，某一用途本局多抽或少抽一次不会影响其他用途与后续各局
+- 两个策略变体使用相同种子时，玩家画像与逐局下注完全一致，差异只来自策略本身，可做配对比较
+- 未提供 RandomStreams 时各模块仍使用全局 random 模块（原有行为不变）
+"""
+
+import random
+import hashlib
+
+POPULATION = "population"     # 玩家画像（initialize_players）
+ACTIVITY = "activity"         # 活跃 / 恢复判定
+BET_AMOUNT = "bet_amount"     # 单局下注总额
+AREA_CHOICE = "area_choice"   # 下注区域数量、区域与金额拆分
+SELECTION = "selection"       # 第三阶段按权重抽取最终结构
+
+STREAM_NAMES = (POPULATION, ACTIVITY, BET_AMOUNT, AREA_CHOICE, SELECTION)
+
+
+# ✅ 稳定派生种子（不依赖 PYTHONHASHSEED）
+def derive_seed(*parts) -> int:
+    digest = hashlib.sha256(":".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+class RandomStreams:
+    def __init__(self, seed: int):
+        self.seed = seed
+        self._streams = {name: random.Random(derive_seed(seed, name)) for name in STREAM_NAMES}
+
+    # 整个运行期共用的随机流（如玩家画像）
+    def get(self, name: str) -> random.Random:
+        return self._streams[name]
+
+    # ✅ 按局派生的随机流：同一 (种子, 用途, 局号) 在任何策略变体中得到相同序列
+    def for_round(self, name: str, round_id: int) -> random.Random:
+        return random.Random(derive_seed(self.seed, name, round_id))
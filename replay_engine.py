@@ -0,0 +1,207 @@
+# replay_engine.py
+
+"""
+下注回放引擎：
+- 用记录下来的逐局下注（round_log 的 all_player_bets_map_platform，或生产导出的明细 CSV）驱动打分引擎与选结构策略
+- 完全跳过下注生成；玩家统计（PlayerStats）与水池（PlatformPool）从全新状态开始，由回放下注逐局累积
+- 下注源为流式迭代器（.jsonl / CSV 逐行读取）；日志默认按局清空，玩家逐局 RTP 历史不保留、水池流水只保留最近
+  LONG_RUN_POOL_HISTORY_LIMIT 条，逐局决策只在策略对比时记录，单次回放的内存只随玩家数增长、与回放局数无关
+- 结构评估沿用 GameRoundController 的全部快速路径（STRUCTURE_EVAL_MODE：auto / bitmask 位掩码批量评估）
+- 固定种子时第三阶段按权重抽取使用按局派生的随机流，不同策略配置回放同一份下注时差异只来自策略本身
+"""
+
+import os
+import csv
+import json
+import math
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+from config import JSON_DIR, DEFAULT_SIMULATION_CONFIG, PAYOUT_RATES
+from db_logger import LogStream, use_log_stream
+from fast_simulation import build_initial_state
+from game_round_controller import GameRoundController
+from random_streams import RandomStreams
+
+REPLAY_SEED = 42
+PROGRESS_INTERVAL = 1000     # 每 N 局打印一次进度
+
+# 生产导出明细 CSV 的列名（每行一个玩家在一个区域的下注，同一局的行须连续）
+CSV_ROUND_COLUMN = "round_id"
+CSV_PLAYER_COLUMN = "player_id"
+CSV_AREA_COLUMN = "area"
+CSV_AMOUNT_COLUMN = "amount"
+
+
+# 下注区域键统一为 int（JSON 回放时为字符串）
+def normalize_bets(bets: Dict) -> Dict[str, Dict[int, float]]:
+    return {pid: {int(a): v for a, v in area_bets.items()} for pid, area_bets in bets.items()}
+
+
+# ✅ 外部下注校验（决策服务入口）：区域须在 PAYOUT_RATES 中，金额须为非负有限数值；不合法时抛出 ValueError
+def validate_bets(bets) -> Dict[str, Dict[int, float]]:
+    if not isinstance(bets, dict):
+        raise ValueError("下注须为 {玩家: {区域: 金额}} 对象")
+    for pid, area_bets in bets.items():
+        if not isinstance(area_bets, dict):
+            raise ValueError(f"玩家 {pid} 的下注须为 {{区域: 金额}} 对象")
+        for area, amount in area_bets.items():
+            try:
+                area_id = int(area)
+            except (TypeError, ValueError):
+                area_id = None
+            if area_id not in PAYOUT_RATES:
+                raise ValueError(f"玩家 {pid} 下注了不存在的区域 {area!r}（可选：{', '.join(map(str, PAYOUT_RATES))}）")
+            if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount) or amount < 0:
+                raise ValueError(f"玩家 {pid} 在区域 {area} 的下注金额无效：{amount!r}")
+    return normalize_bets(bets)
+
+
+# ✅ 下注源：round_log.json（整体加载）或 round_log.jsonl（逐行流式），产出 (局号, 下注)
+def iter_round_log_bets(path: str = None) -> Iterator[Tuple[object, Dict]]:
+    path = path or os.path.join(JSON_DIR, "round_log.json")
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            entries = (json.loads(line) for line in f if line.strip())
+        else:
+            entries = json.load(f)
+        for entry in entries:
+            yield entry.get("round_id"), normalize_bets(entry.get("all_player_bets_map_platform", {}))
+
+
+# ✅ 下注源：生产导出明细 CSV（按局分组，逐行流式读取）
+def iter_csv_bets(path: str) -> Iterator[Tuple[object, Dict]]:
+    current_round, bets = None, {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            round_id = row[CSV_ROUND_COLUMN]
+            if round_id != current_round:
+                if bets:
+                    yield current_round, bets
+                current_round, bets = round_id, {}
+            amount = float(row[CSV_AMOUNT_COLUMN])
+            if amount <= 0:
+                continue
+            area_bets = bets.setdefault(row[CSV_PLAYER_COLUMN], {})
+            area = int(row[CSV_AREA_COLUMN])
+            area_bets[area] = area_bets.get(area, 0.0) + amount
+    if bets:
+        yield current_round, bets
+
+# 按扩展名选择下注源
+def open_bet_source(path: str) -> Iterator[Tuple[object, Dict]]:
+    return iter_csv_bets(path) if path.endswith(".csv") else iter_round_log_bets(path)
+
+
+# ✅ 回放引擎：每个实例持有一套全新的玩家统计与水池状态
+class ReplayEngine:
+    # recharge_map：可选的玩家充值额（态势 STD 权重），未提供的玩家使用随机画像的充值额
+    # keep_logs：保留全部日志（用于导出），默认按局清空
+    # record_decisions：记录逐局决策（策略对比的基准配置使用），默认不记录
+    # baseline：可选的基准逐局决策，回放时逐局累计与之一致的局数（本实例无需保存决策）
+    def __init__(self, sim_config=None, seed: int = REPLAY_SEED, recharge_map: Dict[str, float] = None, keep_logs: bool = False,
+                 record_decisions: bool = False, baseline: List[Tuple[object, tuple]] = None):
+        self.sim_config = sim_config or DEFAULT_SIMULATION_CONFIG
+        streams = RandomStreams(seed) if seed is not None else None
+        self.state = build_initial_state(0, sim_config=self.sim_config, random_streams=streams, bounded_history=True)
+        self.controller = GameRoundController(self.state)
+        self.recharge_map = recharge_map or {}
+        self.keep_logs = keep_logs
+        self.logs = LogStream()
+        self.record_decisions = record_decisions
+        self.decisions: List[Tuple[object, tuple]] = []  # (源局号, 选中结构区域)，仅 record_decisions 时记录
+        self.baseline = baseline
+        self.agreed_rounds = 0
+        self.total_bet = 0.0
+        self.total_payout = 0.0
+
+    def _apply_recharge(self, bets: Dict):
+        for pid in bets:
+            if pid in self.recharge_map and pid in self.controller.sim_players:
+                self.controller.sim_players[pid].recharge_amount = self.recharge_map[pid]
+
+    # ✅ 回放一局：外部下注 → 结构评估 → 选结构 → 结算
+    def replay_round(self, source_round, bets: Dict) -> tuple:
+        controller = self.controller
+        with use_log_stream(self.logs):
+            controller.initialize_round()
+            controller.prepare_round_data(bets)
+            self._apply_recharge(bets)
+            controller.simulate_structures()
+            controller.choose_final_structure()
+            controller.settle_outcome()
+            controller.finalize_round()
+        if not self.keep_logs:
+            self.logs.clear()
+
+        summary = self.state["_summary"]
+        self.total_bet += summary["total_bet_amount_platform"]
+        self.total_payout += summary["total_payout_amount_platform"]
+        areas = tuple(self.state["final_outcome"]["game_areas"])
+        if self.record_decisions:
+            self.decisions.append((source_round, areas))
+        if self.baseline is not None:
+            index = self.controller.round_id - 1
+            if index < len(self.baseline) and self.baseline[index][1] == areas:
+                self.agreed_rounds += 1
+        return areas
+
+    def run(self, bet_source: Iterable[Tuple[object, Dict]], max_rounds: int = None, progress: bool = False) -> Dict:
+        start = time.time()
+        for source_round, bets in bet_source:
+            if max_rounds is not None and self.controller.round_id >= max_rounds:
+                break
+            self.replay_round(source_round, bets)
+            if progress and self.controller.round_id % PROGRESS_INTERVAL == 0:
+                elapsed = time.time() - start
+                print(f"\r已回放 {self.controller.round_id} 局，{self.controller.round_id / elapsed:.0f} 局/秒", end="", flush=True)
+        if progress:
+            print()
+        return self.summary(time.time() - start)
+
+    def summary(self, elapsed: float = 0.0) -> Dict:
+        rounds = self.controller.round_id
+        return {
+            "rounds": rounds,
+            "players": len(self.controller.stat_players),
+            "total_bet": self.total_bet,
+            "total_payout": self.total_payout,
+            "rtp": self.total_payout / self.total_bet if self.total_bet > 0 else 0.0,
+            "pool_final": self.controller.pool.get_pool_value(),
+            "elapsed_sec": elapsed,
+            "rounds_per_sec": rounds / elapsed if elapsed > 0 else 0.0
+        }
+
+
+# ✅ 多个策略配置回放同一份下注：各自的汇总 + 与第一个配置的逐局决策一致率
+# 只有第一个（基准）配置记录逐局决策，其余配置回放时逐局累计一致局数
+def compare_strategies(path: str, configs: Dict[str, object], seed: int = REPLAY_SEED, max_rounds: int = None) -> Dict[str, Dict]:
+    reports, baseline = {}, None
+    for name, cfg in configs.items():
+        engine = ReplayEngine(cfg, seed=seed, record_decisions=baseline is None, baseline=baseline)
+        report = engine.run(open_bet_source(path), max_rounds=max_rounds)
+        if baseline is None:
+            baseline = engine.decisions
+            engine.agreed_rounds = len(baseline)
+        rounds = engine.controller.round_id
+        report["decision_agreement"] = engine.agreed_rounds / rounds if rounds else 0.0
+        reports[name] = report
+    return reports
+
+
+def main():
+    path = os.path.join(JSON_DIR, "round_log.jsonl")
+    if not os.path.exists(path):
+        path = os.path.join(JSON_DIR, "round_log.json")
+    if not os.path.exists(path):
+        print(f"⚠️ 未找到下注记录 {path}，请先运行模拟或提供生产导出 CSV")
+        return
+
+    print(f"\n🔁 回放下注：{path}")
+    report = ReplayEngine().run(open_bet_source(path), progress=True)
+    print(
+        f"✅ 回放完成：{report['rounds']} 局 / {report['players']} 名玩家，RTP {report['rtp']:.4f}，"
+        f"水池终值 {report['pool_final']:,.0f}，{report['rounds_per_sec']:.0f} 局/秒"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# result_cache.py
+
+"""
+模拟结果缓存（内容寻址，本地磁盘）：
+- 缓存键 = SHA-256(完整 SimulationConfig + 额外参数 + 种子 + 玩家数 + 局数 + 代码版本)
+- 代码版本取核心模拟模块源码的内容哈希，改动任一模块后旧结果自动失效
+- 每条缓存保存运行汇总（JSON），可选保存 gzip 压缩的完整日志
+- 目录总大小超出上限时按最近访问时间（LRU）淘汰；写入先落临时文件再原子替换，多进程安全
+"""
+
+import os
+import json
+import gzip
+import hashlib
+from typing import Dict, Optional
+from config import CACHE_DIR, RESULT_CACHE_MAX_MB
+from log_records import json_default
+
+# 影响模拟结果的核心模块（导出 / 仪表盘等下游模块不计入代码版本）
+CODE_VERSION_MODULES = [
+    "config.py",
+    "fast_simulation.py",
+    "game_round_controller.py",
+    "score_engine.py",
+    "strategy.py",
+    "metrics_engine.py",
+    "player_profiles.py",
+    "platform_pool_and_generate_bet.py",
+    "structure_index.py",
+    "db_logger.py",
+    "random_streams.py",
+    "sweep_engine.py",
+]
+
+SUMMARY_SUFFIX = ".json"
+LOGS_SUFFIX = ".logs.json.gz"
+
+_code_version = None
+
+# ✅ 代码版本：核心模块源码内容哈希（进程内只计算一次）
+def get_code_version() -> str:
+    global _code_version
+    if _code_version is None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for name in CODE_VERSION_MODULES:
+            path = os.path.join(base_dir, name)
+            digest.update(name.encode("utf-8"))
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+# ✅ 缓存键：所有影响结果的输入按键排序后序列化再哈希
+def make_cache_key(sim_config, seed: int, num_players: int, rounds: int, **extra) -> str:
+    payload = {
+        "config": sim_config.to_dict(),
+        "seed": seed,
+        "players": num_players,
+        "rounds": rounds,
+        "code_version": get_code_version(),
+        "extra": extra
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, max_mb: float = RESULT_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key, SUMMARY_SUFFIX))
+
+    # ✅ 读取运行汇总；命中时刷新访问时间（LRU 依据）
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._path(key, SUMMARY_SUFFIX)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self._touch(key)
+        self.hits += 1
+        return summary
+
+    # 读取压缩日志（未缓存日志时返回 None）
+    def get_logs(self, key: str) -> Optional[Dict]:
+        path = self._path(key, LOGS_SUFFIX)
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            logs = json.load(f)
+        self._touch(key)
+        return logs
+
+    # ✅ 写入汇总（及可选日志）后执行容量淘汰；日志先于汇总写入，汇总存在即代表条目完整
+    def put(self, key: str, summary: Dict, logs: Dict = None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if logs is not None:
+            self._atomic_write(self._path(key, LOGS_SUFFIX), logs, compress=True)
+        self._atomic_write(self._path(key, SUMMARY_SUFFIX), summary)
+        self.evict()
+
+    def _atomic_write(self, path: str, data, compress: bool = False):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if compress:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=json_default)
+        else:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=json_default)
+        os.replace(tmp_path, path)
+
+    def _touch(self, key: str):
+        for suffix in (SUMMARY_SUFFIX, LOGS_SUFFIX):
+            try:
+                os.utime(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    # ✅ 按条目聚合大小与最近访问时间，超出上限时从最久未用的条目开始删除
+    def evict(self) -> int:
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        entries = {}
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            key = entry.name.split(".", 1)[0]
+            stat = entry.stat()
+            size, last_used = entries.get(key, (0, 0.0))
+            entries[key] = (size + stat.st_size, max(last_used, stat.st_mtime))
+
+        total = sum(size for size, _ in entries.values())
+        removed = 0
+        for key, (size, _) in sorted(entries.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            self.remove(key)
+            total -= size
+            removed += 1
+        return removed
+
+    def remove(self, key: str):
+        for suffix in (SUMMARY_SUFFIX, LOGS_SUFFIX):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def size_bytes(self) -> int:
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        return sum(e.stat().st_size for e in os.scandir(self.cache_dir) if e.is_file())
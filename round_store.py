@@ -0,0 +1,193 @@
+# round_store.py
+
+"""
+定长二进制轮次存储（numpy.memmap 随机访问）：
+- 每局一条定长记录：轮次、水池值、目标 RTP、总投注 / 总返奖、置信区间上下界、选中结构 ID、各结构 rtp_std / attitude_std
+- 文件 = 定长文件头（魔数 + JSON 模式：字段 dtype、结构数、结构区域）+ 连续记录
+- 读取端直接 memmap，按 round_id 二分定位任意区间，零解析、近零内存；运行中的文件同样可读（按当前大小计算记录数）
+- 未计算的指标（如未进入第二阶段结构的 attitude_std）记为 NaN
+"""
+
+import os
+import json
+from typing import Dict, List
+import numpy as np
+
+MAGIC = b"RNDSTORE"
+FORMAT_VERSION = 1
+HEADER_SIZE = 4096          # 文件头固定长度（模式 JSON 以空格补齐）
+FLUSH_INTERVAL = 100        # 写入端每 N 局刷盘一次
+
+SCALAR_FIELDS = [
+    ("round_id", "<i8"),
+    ("pool_value", "<f8"),
+    ("target_rtp", "<f8"),
+    ("total_bet", "<f8"),
+    ("total_payout", "<f8"),
+    ("ci_low", "<f8"),
+    ("ci_high", "<f8"),
+    ("selected_structure_id", "<i4"),
+    ("fallback_count", "<i4"),
+]
+
+
+def record_dtype(num_structures: int) -> np.dtype:
+    return np.dtype(SCALAR_FIELDS + [
+        ("rtp_std", "<f8", (num_structures,)),
+        ("attitude_std", "<f8", (num_structures,)),
+    ])
+
+
+# ✅ 写入端：按局追加定长记录
+class RoundStoreWriter:
+    def __init__(self, path: str, structures: List[Dict], flush_interval: int = FLUSH_INTERVAL):
+        self.path = path
+        self.num_structures = len(structures)
+        self.dtype = record_dtype(self.num_structures)
+        self.flush_interval = flush_interval
+        self._pending = 0
+
+        schema = {
+            "version": FORMAT_VERSION,
+            "num_structures": self.num_structures,
+            "structures": [list(s.get("areas") or s.get("game_areas") or []) for s in structures],
+            "fields": [[name, fmt] for name, fmt in SCALAR_FIELDS]
+        }
+        header = MAGIC + json.dumps(schema, ensure_ascii=False).encode("utf-8")
+        if len(header) > HEADER_SIZE:
+            raise ValueError(f"结构数过多，模式头超过 {HEADER_SIZE} 字节")
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "wb")
+        self._file.write(header.ljust(HEADER_SIZE, b" "))
+        self._record = np.zeros(1, dtype=self.dtype)
+
+    # 从 controller 状态提取本局记录（在 finalize_round 之后调用）
+    def append_round(self, state: dict):
+        summary = state["_summary"]
+        cache = state["structure_result_cache"]
+        self._append(
+            round_id=state["round_id"],
+            pool_value=state["platform_pool"].get_pool_value(),
+            target_rtp=state["expected_rtp"],
+            total_bet=summary["total_bet_amount_platform"],
+            total_payout=summary["total_payout_amount_platform"],
+            bounds=cache.get("std_bounds"),
+            selected_structure_id=(state.get("final_outcome") or {}).get("structure_id", -1),
+            fallback_count=len(state.get("decision_fallback") or []),
+            structures=cache["all_structures"]
+        )
+
+    # 从 round_log 条目还原本局记录（结果缓存命中时重建存储；与运行时 append_round 写入的记录一致）
+    def append_log_entry(self, entry):
+        structures = entry.get("structure_results_simulation_output") or []
+        selected = next((s.get("structure_id", -1) for s in structures if s.get("is_final_outcome")), -1)
+        self._append(
+            round_id=entry["round_id"],
+            pool_value=entry.get("pool_value_platform"),
+            target_rtp=entry.get("target_rtp_platform_dynamic"),
+            total_bet=entry.get("total_bet_amount_platform"),
+            total_payout=entry.get("total_payout_amount_platform"),
+            bounds=entry.get("rtp_confidence_bounds_active"),
+            selected_structure_id=selected,
+            fallback_count=len(entry.get("decision_fallback_reasons") or []),
+            structures=structures
+        )
+
+    def _append(self, round_id, pool_value, target_rtp, total_bet, total_payout, bounds, selected_structure_id, fallback_count, structures):
+        rec = self._record
+        rec.fill(0)
+        bounds = bounds or (np.nan, np.nan)
+
+        rec["round_id"] = round_id
+        rec["pool_value"] = pool_value
+        rec["target_rtp"] = target_rtp
+        rec["total_bet"] = total_bet
+        rec["total_payout"] = total_payout
+        rec["ci_low"], rec["ci_high"] = bounds[0], bounds[1]
+        rec["selected_structure_id"] = selected_structure_id
+        rec["fallback_count"] = fallback_count
+
+        rtp_std = np.full(self.num_structures, np.nan)
+        attitude_std = np.full(self.num_structures, np.nan)
+        for s in structures[:self.num_structures]:
+            sid = s.get("structure_id")
+            if sid is None:
+                continue
+            rtp_std[sid] = s.get("rtp_std", np.nan)
+            attitude_std[sid] = s.get("attitude_std", np.nan) if s.get("entered_phase1") else np.nan
+        rec["rtp_std"][0] = rtp_std
+        rec["attitude_std"][0] = attitude_std
+
+        self._file.write(rec.tobytes())
+        self._pending += 1
+        if self._pending >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._pending = 0
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+# ✅ 由 round_log 整体重建存储文件（覆盖旧文件）
+def rebuild_round_store(path: str, structures: List[Dict], round_log) -> int:
+    writer = RoundStoreWriter(path, structures)
+    try:
+        for entry in round_log:
+            writer.append_log_entry(entry)
+    finally:
+        writer.close()
+    return len(round_log)
+
+
+# ✅ 读取端：memmap 整个记录区，按 round_id 切片
+class RoundStore:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if not header.startswith(MAGIC):
+            raise ValueError(f"{path} 不是轮次存储文件")
+        self.schema = json.loads(header[len(MAGIC):].decode("utf-8").rstrip())
+        self.num_structures = self.schema["num_structures"]
+        self.structures = self.schema["structures"]
+        self.dtype = record_dtype(self.num_structures)
+        self.records = self._map()
+
+    def _map(self) -> np.ndarray:
+        count = max(0, (os.path.getsize(self.path) - HEADER_SIZE) // self.dtype.itemsize)  # 忽略写入中的半条记录
+        if count == 0:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+    # 运行中的文件：重新按当前大小映射，纳入新追加的记录
+    def refresh(self) -> int:
+        before = len(self.records)
+        self.records = self._map()
+        return len(self.records) - before
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.dtype.names)
+
+    # ✅ 按轮次区间切片（闭区间），返回 memmap 视图，不复制数据
+    def slice(self, start_round: int = None, end_round: int = None) -> np.ndarray:
+        round_ids = self.records["round_id"]
+        lo = 0 if start_round is None else int(np.searchsorted(round_ids, start_round, side="left"))
+        hi = len(round_ids) if end_round is None else int(np.searchsorted(round_ids, end_round, side="right"))
+        return self.records[lo:hi]
+
+    def get(self, round_id: int):
+        view = self.slice(round_id, round_id)
+        return view[0] if len(view) else None
+
+    def column(self, name: str, start_round: int = None, end_round: int = None) -> np.ndarray:
+        return self.slice(start_round, end_round)[name]
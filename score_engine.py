@@ -12,11 +12,12 @@
 # ✅ 将字段名顺序统一：主体字段在前，修饰信息后置
 
 from typing import Dict, List
-from config import PAYOUT_RATES, WINNING_STRUCTURES, STD_THRESHOLD, MINIMUM_BET_THRESHOLD, MAX_STRUCTURE_SIM_THREADS, ATTITUDE_TARGET
+from config import PAYOUT_RATES, WINNING_STRUCTURES, MAX_STRUCTURE_SIM_THREADS, STRUCTURE_EVAL_MODE, BITMASK_EVAL_MIN_STRUCTURES, SimulationConfig, DEFAULT_SIMULATION_CONFIG
 from player_profiles import PlayerStats
 from metrics_engine import compute_rtp, compute_total_weight, compute_weighted_variance, compute_weighted_std, compute_target_diff, compute_attitude, compute_dynamic_std_confidence_interval, compute_memory_avg_bet, compute_memory_profit, compute_equivalent_sample_size
 from db_logger import log_rtp_std_details, log_attitude_std_details
 import math
+import time
 from concurrent.futures import ThreadPoolExecutor
 
 
@@ -47,8 +48,10 @@ def compute_rtp_std_for_structure(
     current_bets: Dict[str, Dict[int, float]],
     expected_rtp: float,
     round_id: int = -1,
-    structure_id: int = -1
+    structure_id: int = -1,
+    sim_config: SimulationConfig = None
 ):
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
     game_areas = structure.get("areas") or structure.get("game_areas")
     base_weight = structure["base_weight"]
 
@@ -81,7 +84,7 @@ def compute_rtp_std_for_structure(
     filtered_players = {
         pid: simulated_players[pid]
         for pid, bets in current_bets.items()
-        if sum(bets.values()) >= MINIMUM_BET_THRESHOLD
+        if sum(bets.values()) >= cfg.minimum_bet_threshold
     }
 
     total_rtp_weight = compute_total_weight(filtered_players.values())
@@ -95,7 +98,9 @@ def compute_rtp_std_for_structure(
         std_value = math.sqrt(weighted_var / total_rtp_weight)
 
     estimate = calculate_structure_estimates(current_bets, game_areas)
+    structure.pop("attitude_std", None)  # 态势 STD 由策略第二阶段按需重新计算
     structure.update({
+        "structure_id": structure_id,
         "game_areas": game_areas,
         "rtp_std": std_value,
         "base_weight": base_weight,
@@ -118,7 +123,9 @@ def compute_rtp_std_for_structure(
 
 
 # 对单个结构、计算模拟下的态势_STD、同时输出日志供细致检查
-def compute_attitude_std_for_structure(struct: Dict, structure_id: int, attitude_map_template: Dict[str, float], recharge_map: dict[str, float], round_id: int) -> float:
+# record=False：只计算不写日志、不回写结构字典（影子策略打分用）
+def compute_attitude_std_for_structure(struct: Dict, structure_id: int, attitude_map_template: Dict[str, float], recharge_map: dict[str, float], round_id: int, sim_config: SimulationConfig = None, record: bool = True) -> float:
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
     simulated_players = struct.get("simulated_players", {})
     values = []
     weights = []
@@ -139,8 +146,8 @@ def compute_attitude_std_for_structure(struct: Dict, structure_id: int, attitude
 
         mem_avg_bet = compute_memory_avg_bet(sim_bet, history_bets)
         mem_profit = compute_memory_profit(sim_bet, sim_payout, history_bets)
-        influence = compute_attitude(stat)  # 使用 memory_profits，模拟前已独立复制
-        diff = compute_target_diff(influence, ATTITUDE_TARGET)
+        influence = compute_attitude(stat, cfg.memory_decay_alpha)  # 使用 memory_profits，模拟前已独立复制
+        diff = compute_target_diff(influence, cfg.attitude_target)
         w = recharge_map.get(pid, 0.0)
         if w > 0:
             values.append(diff)
@@ -159,6 +166,8 @@ def compute_attitude_std_for_structure(struct: Dict, structure_id: int, attitude
         })
 
     std = compute_weighted_std(values, weights) if weights else 0.0
+    if not record:
+        return std
     log_attitude_std_details(
         round_id=round_id,
         structure_id=structure_id,
@@ -176,7 +185,9 @@ def compute_rtp_std_for_all_structure(
     current_bets: Dict[str, Dict[int, float]],
     *,
     expected_rtp: float,
-    round_id: int
+    round_id: int,
+    structures: List[Dict] = WINNING_STRUCTURES,
+    sim_config: SimulationConfig = None
 ):
     with ThreadPoolExecutor(max_workers=MAX_STRUCTURE_SIM_THREADS) as executor:
         futures = [
@@ -187,35 +198,227 @@ def compute_rtp_std_for_all_structure(
                 current_bets,
                 expected_rtp,
                 round_id,
-                structure_id
-            ) for structure_id, structure in enumerate(WINNING_STRUCTURES)
+                structure_id,
+                sim_config
+            ) for structure_id, structure in enumerate(structures)
         ]
         for f in futures:
             f.result()
 
-    return WINNING_STRUCTURES
-
-
-# 对所有结构、调用上面的方法并行计算 态势_std
-def compute_attitude_std_for_all_structures(structure_cache: list[Dict], attitude_map_template: Dict[str, float], recharge_map: dict[str, float], round_id: int):
-    results = []
+    return structures
+
+
+# 对指定结构（默认全部）、调用上面的方法并行计算 态势_std，结果按 structure_id 索引
+def compute_attitude_std_for_all_structures(
+    structure_cache: list[Dict],
+    attitude_map_template: Dict[str, float],
+    recharge_map: dict[str, float],
+    round_id: int,
+    structure_ids: List[int] = None,
+    sim_config: SimulationConfig = None,
+    record: bool = True
+) -> Dict[int, float]:
+    if structure_ids is None:
+        structure_ids = range(len(structure_cache))
     with ThreadPoolExecutor(max_workers=MAX_STRUCTURE_SIM_THREADS) as executor:
-        futures = [
-            executor.submit(
+        futures = {
+            sid: executor.submit(
                 compute_attitude_std_for_structure,
-                struct,
+                structure_cache[sid],
                 sid,
                 attitude_map_template,
                 recharge_map,
-                round_id
-            ) for sid, struct in enumerate(structure_cache)
-        ]
-        for f, struct in zip(futures, structure_cache):
-            std = f.result()
-            results.append({
-                "game_areas": struct["game_areas"],
-                "attitude_std": std
-            })
+                round_id,
+                sim_config,
+                record
+            ) for sid in structure_ids
+        }
+        return {sid: f.result() for sid, f in futures.items()}
+
+
+# ✅ 是否走位掩码批量评估：显式指定，或 auto 模式下结构数达到阈值
+def use_bitmask_evaluation(structures: List[Dict]) -> bool:
+    if STRUCTURE_EVAL_MODE == "bitmask":
+        return True
+    if STRUCTURE_EVAL_MODE == "threaded":
+        return False
+    return len(structures) >= BITMASK_EVAL_MIN_STRUCTURES
+
+
+# 模拟 update 后各玩家的滑动窗口基数：窗口投注额、窗口返奖额（不含本局赔付）、累计投注权重
+def _simulated_window_bases(current_players: Dict[str, PlayerStats], player_ids: List[str], player_bets):
+    base_bets, base_payouts, weights = [], [], []
+    for pid, bet in zip(player_ids, player_bets):
+        stat = current_players[pid]
+        rb = sum(stat.recent_bets)
+        rp = sum(stat.recent_payouts)
+        if bet > 0:
+            # 与 deque(maxlen) 一致：窗口已满时淘汰最早一局
+            if stat.recent_bets.maxlen is not None and len(stat.recent_bets) == stat.recent_bets.maxlen:
+                rb -= stat.recent_bets[0]
+                rp -= stat.recent_payouts[0]
+            rb += bet
+        base_bets.append(rb)
+        base_payouts.append(rp)
+        weights.append(stat.total_bet + bet)
+    return base_bets, base_payouts, weights
+
+
+# 对所有结构、按位掩码批量计算 rtp_std（同一掩码的结构结果相同，只按去重后的掩码计算一次）
+def compute_rtp_std_for_all_structure_batched(
+    current_players: Dict[str, PlayerStats],
+    current_bets: Dict[str, Dict[int, float]],
+    *,
+    expected_rtp: float,
+    round_id: int,
+    structures: List[Dict] = WINNING_STRUCTURES,
+    evaluation=None,
+    sim_config: SimulationConfig = None
+):
+    import numpy as np
+    from structure_index import get_structure_index
+
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+
+    # 可传入预先计算的评估结果（如多房间合并批量评估），否则按本轮下注现算
+    if evaluation is None:
+        evaluation = get_structure_index(structures).evaluate(current_bets)
+    index = evaluation.index
+    unique_masks, inverse = np.unique(index.masks, return_inverse=True)
+
+    bets = evaluation.player_total_bets
+    base_bets, base_payouts, weights = (
+        np.array(x, dtype=np.float64)
+        for x in _simulated_window_bases(current_players, evaluation.player_ids, bets)
+    )
+
+    filtered = bets >= cfg.minimum_bet_threshold
+    w = weights[filtered]
+    total_rtp_weight = float(w.sum())
+    if total_rtp_weight > 0:
+        rb = base_bets[filtered][:, None]
+        rp = base_payouts[filtered][:, None] + evaluation.payout_lut[filtered][:, unique_masks]
+        rtp = np.divide(rp, rb, out=np.zeros_like(rp), where=rb > 0)
+        weighted_var_u = (w[:, None] * (rtp - expected_rtp) ** 2).sum(axis=0)
+        std_u = np.sqrt(weighted_var_u / total_rtp_weight)
+    else:
+        weighted_var_u = np.zeros(len(unique_masks))
+        std_u = np.zeros(len(unique_masks))
+
+    for structure_id, structure in enumerate(structures):
+        u = inverse[structure_id]
+        game_areas = structure.get("areas") or structure.get("game_areas")
+        structure.pop("simulated_players", None)
+        structure.pop("attitude_std", None)
+        structure.update({
+            "structure_id": structure_id,
+            "game_areas": game_areas,
+            "rtp_std": float(std_u[u]),
+            "base_weight": structure["base_weight"],
+            "related_bet": float(evaluation.related_bet[structure_id]),
+            "expected_award": float(evaluation.expected_award[structure_id]),
+            "profit_estimate": float(evaluation.profit_estimate[structure_id])
+        })
+
+        # ✅ 批量模式仅记录结构级汇总，不逐玩家展开明细
+        if round_id > 0:
+            log_rtp_std_details(
+                round_id=round_id,
+                structure_id=structure_id,
+                expected_rtp=expected_rtp,
+                rtp_std=float(std_u[u]),
+                total_weight=total_rtp_weight,
+                total_var=float(weighted_var_u[u]),
+                player_details=[],
+                game_areas=game_areas
+            )
+
+    return structures, evaluation
+
+
+# 对指定结构（默认全部）、按位掩码批量计算 态势_std（与 compute_attitude_std_for_structure 的模拟口径一致）
+def compute_attitude_std_for_all_structures_batched(
+    structure_cache: list[Dict],
+    attitude_map_template: Dict[str, PlayerStats],
+    recharge_map: dict[str, float],
+    round_id: int,
+    evaluation,
+    structure_ids: List[int] = None,
+    sim_config: SimulationConfig = None,
+    record: bool = True
+) -> Dict[int, float]:
+    import numpy as np
+
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+
+    if structure_ids is None:
+        structure_ids = list(range(len(structure_cache)))
+    if not structure_ids:
+        return {}
+    masks = evaluation.index.masks[structure_ids]
+    unique_masks, inverse = np.unique(masks, return_inverse=True)
+    row_of = {pid: i for i, pid in enumerate(evaluation.player_ids)}
+    bets = evaluation.player_total_bets
+
+    const_sum, const_weight = 0.0, 0.0
+    rows, row_weights, row_bets, row_avgs, row_decayed = [], [], [], [], []
+    for pid, stat in attitude_map_template.items():
+        i = row_of.get(pid)
+        bet = float(bets[i]) if i is not None else 0.0
+        w = recharge_map.get(pid, 0.0)
+        if stat.total_bet + bet <= 0 or w <= 0:
+            continue
+
+        if bet <= 0:
+            # 本局未下注：模拟后态势不随结构变化
+            diff = compute_target_diff(compute_attitude(stat, cfg.memory_decay_alpha), cfg.attitude_target)
+            const_sum += compute_weighted_variance(diff, w)
+            const_weight += w
+            continue
+
+        # 本局记忆盈亏 = (赔付 - 投注) / 均注，均注口径同 PlayerStats.update
+        recent = list(stat.recent_bets)
+        if stat.recent_bets.maxlen is not None and len(recent) == stat.recent_bets.maxlen:
+            recent = recent[1:]
+        recent.append(bet)
+        avg_bet = compute_memory_avg_bet(bet, recent)
+
+        kept = list(stat.memory_profits)
+        if stat.memory_profits.maxlen is not None and len(kept) == stat.memory_profits.maxlen:
+            kept = kept[1:]
+        decayed = sum(m * math.exp(-cfg.memory_decay_alpha * (k + 1)) for k, m in enumerate(reversed(kept)))
+
+        rows.append(i)
+        row_weights.append(w)
+        row_bets.append(bet)
+        row_avgs.append(avg_bet)
+        row_decayed.append(decayed)
+
+    total_weight = const_weight + sum(row_weights)
+    weighted_var_u = np.full(len(unique_masks), const_sum)
+    if rows:
+        payouts = evaluation.payout_lut[rows][:, unique_masks]
+        avgs = np.array(row_avgs)[:, None]
+        profit = np.divide(payouts - np.array(row_bets)[:, None], avgs, out=np.zeros_like(payouts), where=avgs > 0)
+        diff = profit + np.array(row_decayed)[:, None] - cfg.attitude_target
+        weighted_var_u += (np.array(row_weights)[:, None] * diff ** 2).sum(axis=0)
+    std_u = np.sqrt(weighted_var_u / total_weight) if total_weight > 0 else np.zeros(len(unique_masks))
+
+    results = {}
+    for k, sid in enumerate(structure_ids):
+        struct = structure_cache[sid]
+        std = float(std_u[inverse[k]])
+        results[sid] = std
+        if not record:
+            continue
+        log_attitude_std_details(
+            round_id=round_id,
+            structure_id=sid,
+            attitude_std=std,
+            player_details=[],
+            game_areas=struct["game_areas"]
+        )
+        struct["attitude_std"] = std
     return results
 
 
@@ -227,6 +430,7 @@ class SimulationContext:
         }
         from copy import deepcopy
         self.current_bets = deepcopy(current_bets)
+        self.structure_evaluation = None  # 位掩码批量评估结果（仅 bitmask 模式）
 
     def get_players(self) -> Dict[str, PlayerStats]:
         return self.stat_players
@@ -244,16 +448,17 @@ def mark_confidence_range_flags(structures: List[dict], std_bounds: tuple[float,
 
 
 # ✅ 主流程统一接口
-def simulate_structure_metrics(context: SimulationContext, confidence_level, expected_rtp, current_round_id):
+def simulate_structure_metrics(context: SimulationContext, confidence_level, expected_rtp, current_round_id, structures: List[Dict] = WINNING_STRUCTURES, evaluation=None, sim_config: SimulationConfig = None):
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
     current_players = context.get_players()
     current_bets = context.get_bets()
 
     # ✅ 一次性计算样本数与贡献
-    sample_size, contributions = compute_equivalent_sample_size(current_players, current_bets)
+    sample_size, contributions = compute_equivalent_sample_size(current_players, current_bets, cfg.minimum_bet_threshold)
 
     # ✅ 一次性计算置信区间并写入日志
     std_bounds = compute_dynamic_std_confidence_interval(
-        STD_THRESHOLD,
+        cfg.std_threshold,
         confidence_level,
         sample_size,
         round_id=current_round_id,
@@ -261,12 +466,25 @@ def simulate_structure_metrics(context: SimulationContext, confidence_level, exp
     )
 
     # ✅ 模拟结构 RTP std（结构不含 within_confidence 字段）
-    results = compute_rtp_std_for_all_structure(
-        current_players=current_players,
-        current_bets=current_bets,
-        expected_rtp=expected_rtp,
-        round_id=current_round_id
-    )
+    if evaluation is not None or use_bitmask_evaluation(structures):
+        results, context.structure_evaluation = compute_rtp_std_for_all_structure_batched(
+            current_players=current_players,
+            current_bets=current_bets,
+            expected_rtp=expected_rtp,
+            round_id=current_round_id,
+            structures=structures,
+            evaluation=evaluation,
+            sim_config=cfg
+        )
+    else:
+        results = compute_rtp_std_for_all_structure(
+            current_players=current_players,
+            current_bets=current_bets,
+            expected_rtp=expected_rtp,
+            round_id=current_round_id,
+            structures=structures,
+            sim_config=cfg
+        )
 
     # ✅ 打标结构是否落入置信区间
     mark_confidence_range_flags(results, std_bounds)
@@ -274,3 +492,57 @@ def simulate_structure_metrics(context: SimulationContext, confidence_level, exp
     return results, std_bounds, sample_size
 
 
+
+
+# ✅ 结构评估优先级：本局隐含返奖率（预计赔付 / 总投注）越接近目标 RTP 越优先，同距离时权重高者优先
+def prioritize_structures(structures: List[Dict], total_bet: float, expected_rtp: float) -> List[int]:
+    def key(sid):
+        s = structures[sid]
+        implied_rtp = s["expected_award"] / total_bet if total_bet > 0 else 0.0
+        return (abs(implied_rtp - expected_rtp), -s.get("base_weight", 0))
+    return sorted(range(len(structures)), key=key)
+
+
+# ✅ 限时版主流程：先算全部结构的廉价界（相关投注 / 预计赔付 / 系统盈亏），再按优先级逐个计算精确 rtp_std，
+# 到达截止时间（time.perf_counter() 绝对值）即停止；至少精确计算一个结构，未计算的结构不带 rtp_std
+def simulate_structure_metrics_anytime(context: SimulationContext, confidence_level, expected_rtp, current_round_id, deadline: float, structures: List[Dict] = WINNING_STRUCTURES, sim_config: SimulationConfig = None):
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+    current_players = context.get_players()
+    current_bets = context.get_bets()
+
+    sample_size, contributions = compute_equivalent_sample_size(current_players, current_bets, cfg.minimum_bet_threshold)
+    std_bounds = compute_dynamic_std_confidence_interval(
+        cfg.std_threshold,
+        confidence_level,
+        sample_size,
+        round_id=current_round_id,
+        player_contributions=contributions
+    )
+
+    total_bet = sum(sum(bets.values()) for bets in current_bets.values())
+    for structure_id, structure in enumerate(structures):
+        game_areas = structure.get("areas") or structure.get("game_areas")
+        for k in ("rtp_std", "attitude_std", "simulated_players"):
+            structure.pop(k, None)
+        structure.update({
+            "structure_id": structure_id,
+            "game_areas": game_areas,
+            **calculate_structure_estimates(current_bets, game_areas)
+        })
+
+    evaluated = 0
+    for structure_id in prioritize_structures(structures, total_bet, expected_rtp):
+        if evaluated > 0 and time.perf_counter() >= deadline:
+            break
+        compute_rtp_std_for_structure(
+            structures[structure_id], current_players, current_bets, expected_rtp, current_round_id, structure_id, cfg
+        )
+        evaluated += 1
+
+    mark_confidence_range_flags(structures, std_bounds)
+    meta = {
+        "structures_total": len(structures),
+        "rtp_std_evaluated": evaluated,
+        "deadline_hit": evaluated < len(structures)
+    }
+    return structures, std_bounds, sample_size, meta
@@ -1,19 +1,46 @@
+import os
+import time
 import streamlit as st
 import pandas as pd
 import altair as alt
-from data_loader import load_logs_by_round
+from config import JSON_DIR
+from data_loader import load_logs_by_round, load_trend_pyramids, LiveRoundIndex
+from downsample import TREND_MAX_POINTS, DOWNSAMPLE_FACTOR
 
 # ✅ 页面基本配置
 st.set_page_config(layout="wide", page_title="🎯 控奖结构快照仪表盘")
 
-# ✅ 加载本地日志数据（每次刷新从 JSON 读取）
-round_log, player_log, round_ids = load_logs_by_round()
-if not round_log or not player_log:
-    st.stop()
+LIVE_REFRESH_SEC = 2  # 实时跟踪模式的自动刷新间隔（秒）
+
+# ✅ 实时跟踪索引跨页面刷新复用，每次只增量读取新追加的日志
+@st.cache_resource
+def get_live_index():
+    return LiveRoundIndex()
+
+live_mode = st.sidebar.toggle("🔴 实时跟踪运行中的模拟", value=False, key="live_mode")
+
+if live_mode:
+    live_index = get_live_index()
+    new_rounds = live_index.refresh()
+    round_log, player_log, round_ids = live_index.round_dict, live_index.player_dict, live_index.round_ids
+    follow_latest = st.sidebar.checkbox("跟随最新一局", value=True, key="follow_latest")
+    st.sidebar.caption(f"已读取 {len(round_ids)} 局（本次新增 {new_rounds} 局），每 {LIVE_REFRESH_SEC} 秒刷新")
+    if not round_ids:
+        st.info("⏳ 等待模拟写入第一局日志...")
+        time.sleep(LIVE_REFRESH_SEC)
+        st.rerun()
+    if follow_latest:
+        st.session_state.selected_round_idx = len(round_ids) - 1
+else:
+    # ✅ 加载本地日志数据（每次刷新从 JSON 读取）
+    round_log, player_log, round_ids = load_logs_by_round()
+    if not round_log or not player_log:
+        st.stop()
 
 # ✅ 初始化 session_state：记录当前轮次索引（用于按钮切换）
 if "selected_round_idx" not in st.session_state:
     st.session_state.selected_round_idx = len(round_ids) - 1  # 默认显示最后一局
+st.session_state.selected_round_idx = min(st.session_state.selected_round_idx, len(round_ids) - 1)  # 切换数据源后局数可能变少
 
 # ✅ 侧边栏：轮次导航按钮 + 下拉栏组合区域
 st.sidebar.title("📂 快照轮次选择")
@@ -129,3 +156,60 @@ if player_df is not None:
 
     formatted_player_df = format_player_df(player_df.copy())
     st.dataframe(formatted_player_df, use_container_width=True, hide_index=True)
+
+
+# ✅ 趋势视图：多分辨率聚合金字塔，按所选轮次区间取合适层级（任意局数只渲染有限个点）
+@st.cache_resource
+def get_trend_pyramids(source_mtime):
+    return load_trend_pyramids()
+
+st.markdown("---")
+st.subheader("📈 趋势视图")
+if live_mode:
+    trend_pyramids = live_index.trend_pyramids()
+else:
+    trend_pyramids = get_trend_pyramids(os.path.getmtime(os.path.join(JSON_DIR, "round_log.json")))
+
+if trend_pyramids:
+    col_series, col_method = st.columns([2, 1])
+    with col_series:
+        series_name = st.selectbox("📌 指标", list(trend_pyramids.keys()), key="trend_series")
+    with col_method:
+        method = st.radio("降采样方式", ["区间极值带", "LTTB"], horizontal=True, key="trend_method")
+
+    pyramid = trend_pyramids[series_name]
+    first_round, last_round = pyramid.round_range
+    if last_round > first_round:
+        zoom = st.slider("🔎 轮次区间", first_round, last_round, (first_round, last_round), key="trend_range")
+    else:
+        zoom = (first_round, last_round)
+
+    if method == "LTTB":
+        xs, ys = pyramid.query_lttb(zoom[0], zoom[1], TREND_MAX_POINTS)
+        df_trend = pd.DataFrame({"轮次": xs, "均值": ys})
+        chart = alt.Chart(df_trend).mark_line().encode(
+            x=alt.X("轮次:Q", title="轮次"), y=alt.Y("均值:Q", title=series_name), tooltip=["轮次", "均值"]
+        )
+        st.caption(f"LTTB 降采样：{len(df_trend)} 个点")
+    else:
+        view = pyramid.query(zoom[0], zoom[1], TREND_MAX_POINTS)
+        df_trend = pd.DataFrame({
+            "轮次": view["start"], "结束轮次": view["end"], "最小值": view["min"], "最大值": view["max"], "均值": view["mean"]
+        })
+        band = alt.Chart(df_trend).mark_area(opacity=0.3).encode(
+            x=alt.X("轮次:Q", title="轮次"), y=alt.Y("最小值:Q", title=series_name), y2="最大值:Q"
+        )
+        line = alt.Chart(df_trend).mark_line().encode(
+            x="轮次:Q", y="均值:Q", tooltip=["轮次", "结束轮次", "最小值", "最大值", "均值"]
+        )
+        chart = band + line
+        st.caption(f"聚合层级 {view['level']}（每点约 {DOWNSAMPLE_FACTOR ** view['level']} 局），共 {len(df_trend)} 个点")
+
+    st.altair_chart(chart.properties(height=300), use_container_width=True)
+else:
+    st.info("暂无趋势数据")
+
+# ✅ 实时跟踪：定时重跑脚本，仅增量读取新追加的日志
+if live_mode:
+    time.sleep(LIVE_REFRESH_SEC)
+    st.rerun()
@@ -0,0 +1,85 @@
+# startup_benchmark.py
+
+"""
+引擎启动耗时基准：
+- 在全新子进程中多次测量 `import fast_simulation` 的耗时（取中位数，排除单次抖动）
+- 检查模拟核心路径是否误引入重量级依赖（pandas / scipy / streamlit 等只应在导出 / 分析时加载）
+- 每次运行追加一行到 DEBUG_DIR/startup_time_history.csv（时间、代码版本、耗时），用于跟踪回归
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import statistics
+import subprocess
+from config import DEBUG_DIR
+from result_cache import get_code_version
+
+STARTUP_RUNS = 7
+TARGET_MODULE = "fast_simulation"
+HEAVY_MODULES = ["pandas", "scipy", "streamlit", "altair", "sklearn", "openpyxl", "xlsxwriter"]
+
+_PROBE_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_ms": elapsed * 1000, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+# ✅ 单次测量：全新解释器中导入目标模块（子进程总耗时含解释器启动）
+def measure_once(module: str = TARGET_MODULE) -> dict:
+    script = _PROBE_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=base_dir, capture_output=True, text=True, check=True
+    ).stdout
+    process_ms = (time.perf_counter() - start) * 1000
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = process_ms
+    return result
+
+def measure_startup(runs: int = STARTUP_RUNS, module: str = TARGET_MODULE) -> dict:
+    samples = [measure_once(module) for _ in range(runs)]
+    import_ms = [s["import_ms"] for s in samples]
+    process_ms = [s["process_ms"] for s in samples]
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "code_version": get_code_version(),
+        "module": module,
+        "runs": runs,
+        "import_ms_median": statistics.median(import_ms),
+        "import_ms_min": min(import_ms),
+        "process_ms_median": statistics.median(process_ms),
+        "heavy_modules": " ".join(samples[-1]["heavy"])
+    }
+
+def append_history(row: dict, path: str = None) -> str:
+    path = path or os.path.join(DEBUG_DIR, "startup_time_history.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_header = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+        if write_header:
+            writer.writeheader()
+        writer.writerow(row)
+    return path
+
+
+def main():
+    print(f"\n⏱️ 启动耗时基准：import {TARGET_MODULE} × {STARTUP_RUNS} 次...")
+    row = measure_startup()
+    path = append_history(row)
+    print(
+        f"✅ 导入中位数 {row['import_ms_median']:.1f}ms（最快 {row['import_ms_min']:.1f}ms），"
+        f"子进程总耗时中位数 {row['process_ms_median']:.1f}ms，已追加至 {path}"
+    )
+    if row["heavy_modules"]:
+        print(f"⚠️ 模拟核心路径加载了重量级依赖：{row['heavy_modules']}")
+
+if __name__ == "__main__":
+    main()
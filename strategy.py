@@ -1,61 +1,171 @@
 # strategy.py
 
-from typing import List, Dict
+from typing import List, Dict, Callable, Tuple
 import random
-from config import RTP_STD_EXPAND_RATIO, MEMORY_STD_EXPAND_RATIO, ENABLE_STD_FILTER, ENABLE_MEMORY_FILTER
+from config import SimulationConfig, DEFAULT_SIMULATION_CONFIG, SHADOW_STRATEGIES
+
+# ✅ 策略注册表：名称 → 策略函数
+# 策略函数签名：fn(results, attitude_lookup, sim_config, rng) -> {"phase1": [sid], "phase2": [sid], "selected": sid 或 None}
+# - 只读取结构指标（within_confidence / rtp_std / base_weight），不修改结构字典，多个策略可对同一局的结果依次打分
+# - attitude_lookup：传入 structure_id 列表，返回 {structure_id: attitude_std}（可能只含部分结构）
+STRATEGY_REGISTRY: Dict[str, Callable] = {}
+
+def register_strategy(name: str):
+    def decorator(fn):
+        STRATEGY_REGISTRY[name] = fn
+        return fn
+    return decorator
+
+def get_strategy(name: str) -> Callable:
+    if name not in STRATEGY_REGISTRY:
+        raise ValueError(f"未注册的策略：{name}（可选：{', '.join(STRATEGY_REGISTRY)}）")
+    return STRATEGY_REGISTRY[name]
+
+
+# 结构字典中已有的 attitude_std（未提供 attitude_evaluator 时的旧行为）
+def _attitude_from_results(results: List[Dict]) -> Callable[[List[int]], Dict[int, float]]:
+    by_id = {r["structure_id"]: r for r in results}
+    return lambda ids: {sid: by_id[sid].get("attitude_std", 0.0) for sid in ids}
 
-# 策略筛选主逻辑：依次执行三阶段筛选并记录每阶段是否进入
-def select_structure(results: List[Dict]) -> Dict:
-    # ✅ 初始化阶段标记，确保每一轮的标记都从 False 开始
-    for r in results:
-        r["entered_phase1"] = False
-        r["entered_phase2"] = False
-        r["entered_phase3"] = False
+
+# ✅ 三阶段筛选（默认主策略）：RTP 标准差 → 态势标准差 → 按基础权重抽取
+@register_strategy("three_phase")
+def three_phase_strategy(results: List[Dict], attitude_lookup, cfg: SimulationConfig, rng) -> Dict:
+    decision = {"phase1": [], "phase2": [], "selected": None}
 
     # ✅ 第一阶段：RTP 标准差筛选
-    if ENABLE_STD_FILTER:
+    if cfg.enable_std_filter:
         phase1_candidates = [r for r in results if r.get("within_confidence")]
         if not phase1_candidates and results:
-            min_std = min(r["rtp_std"] for r in results if r.get("rtp_std") is not None)
-            std_threshold = min_std * RTP_STD_EXPAND_RATIO / 100
+            min_std = min(r["rtp_std"] for r in results if r.get("rtp_std") is not None)  # 限时决策时仅含已精确计算的结构
+            std_threshold = min_std * cfg.rtp_std_expand_ratio / 100
             phase1_candidates = [r for r in results if r.get("rtp_std", float("inf")) <= std_threshold]
     else:
-        phase1_candidates = results
+        # 限时决策未算到的结构没有 rtp_std 与模拟玩家，不参与后续阶段（完整计算时即全部结构）
+        phase1_candidates = [r for r in results if r.get("rtp_std") is not None] or results
 
     if not phase1_candidates:
-        return {}
-
-    # ✅ 标记通过第一阶段筛选的结构
-    for r in phase1_candidates:
-        r["entered_phase1"] = True
+        return decision
+    decision["phase1"] = [r["structure_id"] for r in phase1_candidates]
 
     # ✅ 第二阶段：按态势标准差筛选
-    if ENABLE_MEMORY_FILTER:
-        memstd_values = [r.get("attitude_std", 0.0) for r in phase1_candidates]
-        if memstd_values:
-            min_memstd = min(memstd_values)
-            mem_threshold = min_memstd * MEMORY_STD_EXPAND_RATIO / 100
-            phase2_candidates = [r for r in phase1_candidates if r.get("attitude_std", float("inf")) <= mem_threshold]
+    if cfg.enable_memory_filter:
+        attitude_map = attitude_lookup(decision["phase1"])
+        # 限时决策时回调可能只返回部分结构：未完成计算的结构不参与第二阶段
+        attitude_pool = [r for r in phase1_candidates if r["structure_id"] in attitude_map] or phase1_candidates
+        memstd_values = [attitude_map.get(r["structure_id"], 0.0) for r in attitude_pool]
+        min_memstd = min(memstd_values)
+        mem_threshold = min_memstd * cfg.memory_std_expand_ratio / 100
+        phase2_candidates = [r for r in attitude_pool if attitude_map.get(r["structure_id"], float("inf")) <= mem_threshold]
     else:
         phase2_candidates = phase1_candidates
 
-    # ✅ 标记通过第二阶段筛选的结构
-    for r in phase2_candidates:
-        r["entered_phase2"] = True
-
     if not phase2_candidates:
-        return {}
+        return decision
+    decision["phase2"] = [r["structure_id"] for r in phase2_candidates]
 
     # ✅ 第三阶段：选择最终结构
-    selected = random.choices(
+    selected = rng.choices(
         population=phase2_candidates,
         weights=[r.get("base_weight", 1.0) for r in phase2_candidates],
         k=1
     )[0]
+    decision["selected"] = selected["structure_id"]
+    return decision
+
+
+# ✅ 对照策略：只按 RTP 标准差取最小者（不看态势、不做随机抽取）
+@register_strategy("min_rtp_std")
+def min_rtp_std_strategy(results: List[Dict], attitude_lookup, cfg: SimulationConfig, rng) -> Dict:
+    scored = [r for r in results if r.get("rtp_std") is not None]
+    if not scored:
+        return {"phase1": [], "phase2": [], "selected": None}
+    best = min(scored, key=lambda r: r["rtp_std"])
+    return {"phase1": [best["structure_id"]], "phase2": [best["structure_id"]], "selected": best["structure_id"]}
+
 
+# ✅ 对照策略：忽略全部指标，仅按基础权重抽取
+@register_strategy("weighted_random")
+def weighted_random_strategy(results: List[Dict], attitude_lookup, cfg: SimulationConfig, rng) -> Dict:
+    if not results:
+        return {"phase1": [], "phase2": [], "selected": None}
+    ids = [r["structure_id"] for r in results]
+    selected = rng.choices(population=results, weights=[r.get("base_weight", 1.0) for r in results], k=1)[0]
+    return {"phase1": ids, "phase2": ids, "selected": selected["structure_id"]}
+
+
+# 策略筛选主逻辑：依次执行三阶段筛选并记录每阶段是否进入
+# attitude_evaluator：可选回调，传入通过第一阶段的 structure_id 列表，返回 {structure_id: attitude_std}；
+# 提供时第二阶段指标仅对幸存结构按需计算，否则沿用结构字典中已有的 attitude_std
+# sim_config：阶段开关与扩展幅度（默认取 config 模块常量）
+# rng：第三阶段抽取用的随机流（公共随机数模式下为本局的 selection 流），默认使用全局 random
+# 主策略的决策会回写到结构字典（entered_phase* / is_final_outcome / attitude_std），供日志与导出使用
+def select_structure(
+    results: List[Dict],
+    attitude_evaluator: Callable[[List[int]], Dict[int, float]] = None,
+    sim_config: SimulationConfig = None,
+    rng: random.Random = None,
+    strategy: str = "three_phase"
+) -> Dict:
+    cfg = sim_config or DEFAULT_SIMULATION_CONFIG
+    rng = rng or random
+
+    attitude_map = {}
+    def attitude_lookup(ids):
+        values = attitude_evaluator(ids) if attitude_evaluator is not None else _attitude_from_results(results)(ids)
+        attitude_map.update(values)
+        return values
+
+    decision = get_strategy(strategy)(results, attitude_lookup, cfg, rng)
+
+    # ✅ 标记各阶段（每一轮都从 False 开始）
+    phase1, phase2 = set(decision["phase1"]), set(decision["phase2"])
+    selected = None
     for r in results:
-        r["is_final_outcome"] = (r.get("game_areas") == selected.get("game_areas"))
+        sid = r["structure_id"]
+        if attitude_evaluator is not None and sid in attitude_map:
+            r["attitude_std"] = attitude_map[sid]
+        r["entered_phase1"] = sid in phase1
+        r["entered_phase2"] = sid in phase2
+        r["entered_phase3"] = False
+        if decision["selected"] is not None and sid == decision["selected"]:
+            selected = r
+
+    if selected is None:
+        return {}
+
+    for r in results:
+        r["is_final_outcome"] = (r is selected)
         if r["is_final_outcome"]:
             r["entered_phase3"] = True
 
     return selected
+
+
+# 影子策略可覆盖的配置项：只影响策略筛选本身；其余字段（std_threshold / confidence_level / 态势参数 / 水池参数等）
+# 作用于本局共用的结构模拟（rtp_std、within_confidence、attitude_std 均按主策略配置只算一次），覆盖不会生效
+SHADOW_OVERRIDABLE_FIELDS = ("enable_std_filter", "enable_memory_filter", "rtp_std_expand_ratio", "memory_std_expand_ratio")
+
+# ✅ 影子策略：(标签, 策略名, SimulationConfig 覆盖项)，与主策略使用同一局的结构指标，只记录假设选择，不参与结算
+def build_shadow_strategies(specs=SHADOW_STRATEGIES, base_config: SimulationConfig = None) -> List[Tuple[str, Callable, SimulationConfig]]:
+    base = base_config or DEFAULT_SIMULATION_CONFIG
+    shadows = []
+    for label, name, overrides in specs:
+        ignored = sorted(set(overrides or {}) - set(SHADOW_OVERRIDABLE_FIELDS))
+        if ignored:
+            raise ValueError(
+                f"影子策略 {label} 覆盖了作用于共用结构模拟的配置项 {ignored}，这些覆盖不会生效"
+                f"（可覆盖：{', '.join(SHADOW_OVERRIDABLE_FIELDS)}）"
+            )
+        shadows.append((label, get_strategy(name), base.with_overrides(**(overrides or {}))))
+    return shadows
+
+# 逐个影子策略打分；返回 {标签: (structure_id 或 None, 该结构的平台预计盈亏)}
+def evaluate_shadow_strategies(results: List[Dict], shadows, attitude_lookup, rng_factory) -> Dict[str, tuple]:
+    by_id = {r["structure_id"]: r for r in results}
+    choices = {}
+    for label, fn, cfg in shadows:
+        sid = fn(results, attitude_lookup, cfg, rng_factory())["selected"]
+        profit = by_id[sid].get("profit_estimate", 0.0) if sid is not None else None
+        choices[label] = (sid, profit)
+    return choices
@@ -0,0 +1,121 @@
+# structure_index.py
+
+"""
+结构位掩码索引模块：
+- 将中奖结构编译为 8 位区域掩码（区域 a 对应第 a-1 位）
+- 预计算 256×8 的掩码-区域赔付表，玩家下注经一次矩阵乘法映射为 256 项查找表
+- 所有结构按掩码批量取值，单轮代价与结构数近似线性、与结构内区域数无关
+"""
+
+from typing import Dict, List
+import numpy as np
+from config import PAYOUT_RATES
+
+NUM_AREAS = 8
+NUM_MASKS = 1 << NUM_AREAS
+
+# 区域 → 位掩码
+def area_mask(areas: List[int]) -> int:
+    mask = 0
+    for a in areas:
+        mask |= 1 << (a - 1)
+    return mask
+
+# 位掩码 → 区域列表（升序）
+def mask_areas(mask: int) -> List[int]:
+    return [a for a in range(1, NUM_AREAS + 1) if mask & (1 << (a - 1))]
+
+
+# ✅ 生成区域子集结构（如“所有区域组合”设计），权重可按区域列表自定义
+def build_subset_structures(min_areas: int = 1, max_areas: int = NUM_AREAS, weight_fn=None) -> List[Dict]:
+    structures = []
+    for mask in range(1, NUM_MASKS):
+        areas = mask_areas(mask)
+        if min_areas <= len(areas) <= max_areas:
+            structures.append({"areas": areas, "base_weight": weight_fn(areas) if weight_fn else 1})
+    return structures
+
+
+# 单轮批量评估结果：玩家顺序、本轮投注、每结构相关投注 / 预计赔付，以及玩家×掩码赔付查找表
+class StructureEvaluation:
+    def __init__(self, index: "StructureIndex", player_ids: List[str], bet_matrix: np.ndarray, amount_lut=None, payout_lut=None):
+        self.index = index
+        self.player_ids = player_ids
+        self.bet_matrix = bet_matrix                       # (P, 8) 各区域下注
+        self.player_total_bets = bet_matrix.sum(axis=1)    # (P,)
+        # (P, 256) 命中区域投注 / 赔付；合并批量评估时由调用方传入切片
+        self.amount_lut = bet_matrix @ index.area_bits.T if amount_lut is None else amount_lut
+        self.payout_lut = bet_matrix @ index.payout_table.T if payout_lut is None else payout_lut
+
+        masks = index.masks
+        self.related_bet = self.amount_lut.sum(axis=0)[masks]      # (S,)
+        self.expected_award = self.payout_lut.sum(axis=0)[masks]   # (S,)
+        self.total_bet = float(self.player_total_bets.sum())
+        self.profit_estimate = self.total_bet - self.expected_award
+
+    # 指定结构（列索引）下每位玩家的赔付矩阵 (P, len(cols))
+    def player_payouts(self, cols) -> np.ndarray:
+        return self.payout_lut[:, self.index.masks[cols]]
+
+
+# ✅ 结构索引：编译一次，按轮复用
+class StructureIndex:
+    def __init__(self, structures: List[Dict], payout_rates: Dict[int, float] = PAYOUT_RATES):
+        self.structures = structures
+        self.masks = np.array([area_mask(s.get("areas") or s.get("game_areas")) for s in structures], dtype=np.uint8)
+        self.base_weights = np.array([s.get("base_weight", 1.0) for s in structures], dtype=np.float64)
+
+        # 256×8：掩码包含区域 a 时为 1（相关投注）或赔率（预计赔付）
+        bits = (np.arange(NUM_MASKS)[:, None] >> np.arange(NUM_AREAS)[None, :]) & 1
+        self.area_bits = bits.astype(np.float64)
+        rates = np.array([payout_rates.get(a, 0) for a in range(1, NUM_AREAS + 1)], dtype=np.float64)
+        self.payout_table = self.area_bits * rates[None, :]
+
+    def __len__(self):
+        return len(self.structures)
+
+    # 下注字典 → (P, 8) 矩阵（区域键兼容 int / str）
+    def build_bet_matrix(self, current_bets: Dict[str, Dict[int, float]], player_ids: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(player_ids), NUM_AREAS), dtype=np.float64)
+        for i, pid in enumerate(player_ids):
+            for area, amount in current_bets.get(pid, {}).items():
+                matrix[i, int(area) - 1] += amount
+        return matrix
+
+    def evaluate(self, current_bets: Dict[str, Dict[int, float]]) -> StructureEvaluation:
+        player_ids = list(current_bets.keys())
+        return StructureEvaluation(self, player_ids, self.build_bet_matrix(current_bets, player_ids))
+
+    # ✅ 多组下注（如多个房间同一轮）合并为一次矩阵乘法，再按组切回各自的评估结果
+    def evaluate_many(self, bets_list: List[Dict[str, Dict[int, float]]]) -> List[StructureEvaluation]:
+        id_lists = [list(bets.keys()) for bets in bets_list]
+        matrices = [self.build_bet_matrix(bets, ids) for bets, ids in zip(bets_list, id_lists)]
+        if not matrices:
+            return []
+        stacked = np.vstack(matrices)
+        amount_lut = stacked @ self.area_bits.T
+        payout_lut = stacked @ self.payout_table.T
+
+        evaluations = []
+        start = 0
+        for ids, matrix in zip(id_lists, matrices):
+            end = start + len(ids)
+            evaluations.append(StructureEvaluation(
+                self, ids, matrix, amount_lut=amount_lut[start:end], payout_lut=payout_lut[start:end]
+            ))
+            start = end
+        return evaluations
+
+
+_INDEX_CACHE: Dict[tuple, StructureIndex] = {}
+
+# ✅ 按结构定义缓存索引（结构字典在每轮会被写入结果字段，故以区域与权重为键）
+def get_structure_index(structures: List[Dict]) -> StructureIndex:
+    key = tuple(
+        (tuple(s.get("areas") or s.get("game_areas")), s.get("base_weight", 1.0)) for s in structures
+    )
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        index = StructureIndex(structures)
+        _INDEX_CACHE[key] = index
+    return index
@@ -0,0 +1,182 @@
+# sweep_engine.py
+
+"""
+参数扫描引擎：
+- 每组参数构造独立的 SimulationConfig，在同一进程内按参数运行完整模拟（无需改写 config.py）
+- 支持网格搜索（笛卡尔积）与随机搜索（按区间 / 候选值采样）
+- 多组参数按进程并行执行，每组使用同一种子的分用途随机流（公共随机数），各参数点面对完全相同的玩家与下注
+- 结果按 (配置, 种子, 玩家数, 局数, 代码版本) 写入结果缓存，重复扫描只计算新的参数点
+- 输出整洁结果表（一组参数一行）：RTP、水池、玩家态势等指标，写入 EXCEL_DIR/sweep_results.csv
+"""
+
+import os
+import csv
+import time
+import random
+import itertools
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List
+from config import EXCEL_DIR, DEFAULT_SIMULATION_CONFIG, WINNING_STRUCTURES, ENABLE_RESULT_CACHE
+from db_logger import LogStream, use_log_stream, JsonlLogWriter
+from fast_simulation import build_initial_state
+from game_round_controller import GameRoundController
+from metrics_engine import compute_attitude
+from result_cache import ResultCache, make_cache_key
+from random_streams import RandomStreams
+
+SWEEP_ROUNDS = 200
+SWEEP_PLAYERS = 20
+SWEEP_SEED = 42
+SWEEP_MODE = "grid"      # "grid" 网格搜索 / "random" 随机搜索
+RANDOM_SAMPLES = 16      # 随机搜索的参数组数
+MAX_SWEEP_WORKERS = max(1, os.cpu_count() or 1)
+
+# 扫描空间：网格搜索取列表中的候选值；随机搜索时 (low, high) 元组按均匀分布采样，列表按候选值采样
+SWEEP_SPACE = {
+    "memory_decay_alpha": [0.1, 0.3, 0.6],
+    "memory_window": [5, 10, 20],
+    "rtp_std_expand_ratio": [110, 150],
+}
+
+
+# ✅ 网格搜索：所有候选值的笛卡尔积
+def grid_search(space: Dict[str, List]) -> List[Dict]:
+    keys = list(space.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+# ✅ 随机搜索：区间均匀采样 / 候选值随机选取（整数区间保持整数）
+def random_search(space: Dict[str, object], samples: int, seed: int = SWEEP_SEED) -> List[Dict]:
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(samples):
+        params = {}
+        for key, spec in space.items():
+            if isinstance(spec, tuple):
+                low, high = spec
+                params[key] = rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+            else:
+                params[key] = rng.choice(list(spec))
+        configs.append(params)
+    return configs
+
+
+# ✅ 单组参数：独立状态 + 独立日志流，逐局运行并汇总结果
+# log_dir：可选，逐局将日志追加写入该目录下的 *.jsonl（分布式任务的分片输出），默认不落盘
+def run_configuration(params: Dict, rounds: int = SWEEP_ROUNDS, num_players: int = SWEEP_PLAYERS, seed: int = SWEEP_SEED, log_dir: str = None) -> Dict:
+    cfg = DEFAULT_SIMULATION_CONFIG.with_overrides(**params)
+    structures = [{"areas": list(s["areas"]), "base_weight": s["base_weight"]} for s in WINNING_STRUCTURES]
+    state = build_initial_state(num_players, sim_config=cfg, random_streams=RandomStreams(seed), structures=structures)
+    controller = GameRoundController(state)
+    logs = LogStream()
+    writer = JsonlLogWriter(log_dir, stream=logs) if log_dir else None
+
+    pool_values, round_rtps = [], []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        with use_log_stream(logs):
+            controller.initialize_round()
+            controller.prepare_round_data()
+            controller.simulate_structures()
+            controller.choose_final_structure()
+            controller.settle_outcome()
+            controller.finalize_round()
+        if writer is not None:
+            writer.flush(clear_stream=True)
+        else:
+            logs.clear()  # 扫描只关心汇总结果，逐局清空日志避免内存增长
+
+        summary = state["_summary"]
+        if summary["total_bet_amount_platform"] > 0:
+            round_rtps.append(summary["total_payout_amount_platform"] / summary["total_bet_amount_platform"])
+        pool_values.append(controller.pool.get_pool_value())
+    elapsed = time.perf_counter() - start
+
+    stats = state["stat_players"].values()
+    total_bet = sum(s.total_bet for s in stats)
+    total_payout = sum(s.total_payout for s in stats)
+    attitudes = [compute_attitude(s, cfg.memory_decay_alpha) for s in stats]
+
+    return {
+        **params,
+        "seed": seed,
+        "rounds": rounds,
+        "players": num_players,
+        "rtp": total_payout / total_bet if total_bet > 0 else 0.0,
+        "round_rtp_std": statistics.pstdev(round_rtps) if round_rtps else 0.0,
+        "pool_final": pool_values[-1] if pool_values else 0.0,
+        "pool_min": min(pool_values, default=0.0),
+        "pool_max": max(pool_values, default=0.0),
+        "attitude_mean": statistics.fmean(attitudes) if attitudes else 0.0,
+        "attitude_std": statistics.pstdev(attitudes) if attitudes else 0.0,
+        "elapsed_sec": elapsed
+    }
+
+def _run_configuration(args) -> Dict:
+    return run_configuration(*args)
+
+
+def _cache_key(params: Dict, rounds: int, num_players: int, seed: int) -> str:
+    return make_cache_key(DEFAULT_SIMULATION_CONFIG.with_overrides(**params), seed, num_players, rounds, runner="sweep_engine")
+
+
+# ✅ 并行扫描：先查结果缓存，仅未命中的参数组分发到进程池；按输入顺序返回结果行
+def run_sweep(
+    param_sets: Iterable[Dict],
+    rounds: int = SWEEP_ROUNDS,
+    num_players: int = SWEEP_PLAYERS,
+    seed: int = SWEEP_SEED,
+    max_workers: int = MAX_SWEEP_WORKERS,
+    use_cache: bool = ENABLE_RESULT_CACHE
+) -> List[Dict]:
+    param_sets = list(param_sets)
+    cache = ResultCache() if use_cache else None
+    keys = [_cache_key(params, rounds, num_players, seed) for params in param_sets] if cache else [None] * len(param_sets)
+
+    rows = [None] * len(param_sets)
+    pending = []
+    for i, (params, key) in enumerate(zip(param_sets, keys)):
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            rows[i] = {**cached, "cached": True}
+        else:
+            pending.append(i)
+
+    tasks = [(param_sets[i], rounds, num_players, seed) for i in pending]
+    if max_workers <= 1 or len(tasks) <= 1:
+        results = [_run_configuration(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_run_configuration, tasks))
+
+    for i, row in zip(pending, results):
+        if cache:
+            cache.put(keys[i], row)
+        rows[i] = {**row, "cached": False}
+    return rows
+
+def write_results(rows: List[Dict], path: str = None) -> str:
+    path = path or os.path.join(EXCEL_DIR, "sweep_results.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fieldnames = list(dict.fromkeys(k for row in rows for k in row))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def main():
+    param_sets = grid_search(SWEEP_SPACE) if SWEEP_MODE == "grid" else random_search(SWEEP_SPACE, RANDOM_SAMPLES)
+    print(f"\n🔬 参数扫描启动：{len(param_sets)} 组参数 × {SWEEP_ROUNDS} 局，并行 {MAX_SWEEP_WORKERS} 进程...")
+    start = time.time()
+    rows = run_sweep(param_sets)
+    path = write_results(rows)
+    best = min(rows, key=lambda r: abs(r["rtp"] - DEFAULT_SIMULATION_CONFIG.target_rtp)) if rows else None
+    cached = sum(1 for r in rows if r["cached"])
+    print(f"✅ 扫描完成，用时 {time.time() - start:.1f} 秒（缓存命中 {cached}/{len(rows)} 组），结果已写入 {path}")
+    if best:
+        print(f"   最接近目标 RTP 的参数：{ {k: best[k] for k in param_sets[0]} } → RTP {best['rtp']:.4f}")
+
+if __name__ == "__main__":
+    main()
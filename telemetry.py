@@ -0,0 +1,181 @@
+# telemetry.py
+
+"""
+运行时遥测（可选启用，仅依赖标准库）：
+- 本地 HTTP 端点 /metrics 以 Prometheus 文本格式输出：累计局数、局/秒、各阶段耗时直方图、水池值、当前目标 RTP、内存中日志条数、进程 RSS
+- 指标在模拟线程中更新，由后台线程的 HTTP 服务读取；RSS 与日志条数在抓取时才计算，不占用模拟循环
+- http.server 仅在启动端点时导入，未启用遥测时不增加启动开销
+- ProgressPrinter：控制台进度按时间间隔限速打印（而非每局打印并 flush），小局数负载不再被输出拖慢
+"""
+
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List
+from config import TELEMETRY_HOST, TELEMETRY_PORT, PROGRESS_INTERVAL_SEC
+
+METRIC_PREFIX = "sim"
+# 阶段耗时直方图桶上界（秒）
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RATE_WINDOW_SEC = 1.0  # 局/秒按该时间窗口滚动计算
+
+
+# ✅ 进程常驻内存（字节）：Linux 读取 /proc/self/statm，其他平台退化为 ru_maxrss（峰值）
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+# 固定桶直方图（桶计数非累计存储，输出时再累加）
+class Histogram:
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[tuple]:
+        total, rows = 0, []
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            rows.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return rows
+
+
+# ✅ 指标容器：模拟循环调用 observe_stage / record_round，HTTP 线程调用 render
+class Telemetry:
+    def __init__(self, log_backlog: Callable[[], int] = None):
+        self.log_backlog = log_backlog
+        self.stages: Dict[str, Histogram] = {}
+        self.rounds_total = 0
+        self.rounds_per_sec = 0.0
+        self.pool_value = 0.0
+        self.target_rtp = 0.0
+        self.start_time = time.time()
+        self._rate_mark = (time.perf_counter(), 0)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def observe_stage(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    # 每局结束调用：累计局数、水池值、目标 RTP；局/秒每 RATE_WINDOW_SEC 滚动更新一次
+    def record_round(self, pool_value: float, target_rtp: float):
+        now = time.perf_counter()
+        with self._lock:
+            self.rounds_total += 1
+            self.pool_value = pool_value
+            self.target_rtp = target_rtp
+            mark_time, mark_rounds = self._rate_mark
+            if now - mark_time >= RATE_WINDOW_SEC:
+                self.rounds_per_sec = (self.rounds_total - mark_rounds) / (now - mark_time)
+                self._rate_mark = (now, self.rounds_total)
+
+    # ✅ Prometheus 文本格式（text/plain; version=0.0.4）
+    def render(self) -> str:
+        p = METRIC_PREFIX
+        with self._lock:
+            lines = [
+                f"# HELP {p}_rounds_total 已完成局数",
+                f"# TYPE {p}_rounds_total counter",
+                f"{p}_rounds_total {self.rounds_total}",
+                f"# HELP {p}_rounds_per_second 最近 {RATE_WINDOW_SEC:g} 秒窗口的模拟速度",
+                f"# TYPE {p}_rounds_per_second gauge",
+                f"{p}_rounds_per_second {self.rounds_per_sec:.6g}",
+                f"# HELP {p}_pool_value 当前水池值",
+                f"# TYPE {p}_pool_value gauge",
+                f"{p}_pool_value {self.pool_value:.6g}",
+                f"# HELP {p}_target_rtp 当前动态目标 RTP",
+                f"# TYPE {p}_target_rtp gauge",
+                f"{p}_target_rtp {self.target_rtp:.6g}",
+                f"# HELP {p}_stage_seconds 单局各阶段耗时",
+                f"# TYPE {p}_stage_seconds histogram",
+            ]
+            for stage, hist in self.stages.items():
+                for le, total in hist.cumulative():
+                    lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {total}')
+                lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {hist.sum:.9g}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+
+        lines += [
+            f"# HELP {p}_log_backlog_entries 内存中尚未清理的日志条数",
+            f"# TYPE {p}_log_backlog_entries gauge",
+            f"{p}_log_backlog_entries {self.log_backlog() if self.log_backlog else 0}",
+            f"# HELP {p}_process_rss_bytes 进程常驻内存",
+            f"# TYPE {p}_process_rss_bytes gauge",
+            f"{p}_process_rss_bytes {current_rss_bytes()}",
+            f"# HELP {p}_uptime_seconds 遥测启动以来的秒数",
+            f"# TYPE {p}_uptime_seconds gauge",
+            f"{p}_uptime_seconds {time.time() - self.start_time:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    # ✅ 启动后台 HTTP 服务（port=0 时由系统分配端口），返回实际地址
+    def serve(self, host: str = TELEMETRY_HOST, port: int = TELEMETRY_PORT) -> str:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # 仅启用端点时加载
+
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 不向控制台输出访问日志
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return f"http://{host}:{self._server.server_address[1]}/metrics"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# ✅ 限速进度输出：距上次打印超过 interval 秒或到达最后一局时才打印
+class ProgressPrinter:
+    def __init__(self, total: int, interval: float = PROGRESS_INTERVAL_SEC):
+        self.total = total
+        self.interval = interval
+        self.start = time.perf_counter()
+        self._last = float("-inf")
+
+    def update(self, done: int):
+        now = time.perf_counter()
+        if now - self._last < self.interval and done < self.total:
+            return
+        self._last = now
+        print(f"\r已完成 {done}/{self.total} 局，用时 {now - self.start:.1f} 秒", end="", flush=True)
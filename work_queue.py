@@ -0,0 +1,347 @@
+# work_queue.py
+
+"""
+共享目录任务队列（多机分布式批量模拟，无需消息中间件）：
+- 协调者把 (参数组, 种子) 批次写成任务文件放入 pending/；任意主机上的工作者只需能访问同一共享目录
+- 领取任务 = 将 pending/<任务>.json 原子重命名为 claimed/<任务>@<工作者>.json，同一任务只有一个工作者能改名成功
+- 租约：工作者运行期间定期刷新领取文件的修改时间（心跳）；超过 LEASE_SECONDS 未刷新视为工作者失联，任务退回 pending/ 重试
+- 重试：失联或运行报错时尝试次数 +1，达到 MAX_ATTEMPTS 后移入 failed/
+- 输出分片：每个任务先写到 tmp/ 下的私有目录（逐局 *.jsonl 日志 + summary.json），完成后整体改名为 results/<任务>/，
+  改名失败说明已有工作者发布过同一任务（同一种子结果相同），直接丢弃，保证每个任务恰好一份结果
+- 合并：各分片日志按 round_id 有序，k 路归并为 merged/*.jsonl（每条附 task_id），汇总写为 merged/summary.csv
+- 各主机时钟偏差需远小于 LEASE_SECONDS（租约按共享目录上的文件修改时间判断）
+
+用法：
+    python work_queue.py coordinator [队列目录]   # 提交扫描任务，回收过期租约，全部完成后合并
+    python work_queue.py worker [队列目录]        # 在任意主机上启动，可启动多个
+    python work_queue.py merge [队列目录]         # 单独执行合并
+"""
+
+import os
+import sys
+import json
+import heapq
+import time
+import uuid
+import shutil
+import socket
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from config import WORK_QUEUE_DIR
+from db_logger import LIVE_LOG_NAMES
+from sweep_engine import SWEEP_SPACE, SWEEP_ROUNDS, SWEEP_PLAYERS, SWEEP_SEED, grid_search, run_configuration, write_results
+
+LEASE_SECONDS = 120          # 租约时长：心跳超过该时长未刷新即视为失联
+HEARTBEAT_INTERVAL = 20      # 心跳间隔（需远小于 LEASE_SECONDS）
+MAX_ATTEMPTS = 3             # 单个任务最多尝试次数
+POLL_INTERVAL = 2.0          # 队列为空时工作者 / 协调者的轮询间隔（秒）
+QUEUE_SEEDS = [SWEEP_SEED, SWEEP_SEED + 1, SWEEP_SEED + 2]  # 每组参数运行的种子
+
+STATES = ("pending", "claimed", "done", "failed", "results", "tmp", "merged")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+# ✅ 队列目录：所有状态转换都是同一文件系统内的重命名
+class WorkQueue:
+    def __init__(self, root: str = WORK_QUEUE_DIR):
+        self.root = root
+        for name in STATES:
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def path(self, state: str, name: str = "") -> str:
+        return os.path.join(self.root, state, name)
+
+    def _write_json(self, state: str, name: str, data: Dict):
+        # 先写私有临时文件再改名，其他主机不会读到半个文件
+        tmp_path = self.path("tmp", f"{name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path(state, name))
+
+    @staticmethod
+    def _read_json(path: str) -> Dict:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _task_ids(self, state: str) -> List[str]:
+        ids = []
+        for name in os.listdir(self.path(state)):
+            if state == "results":
+                ids.append(name)
+            elif name.endswith(".json"):
+                ids.append(name[:-len(".json")].split("@", 1)[0])
+        return sorted(ids)
+
+    # ✅ 提交任务：(参数组, 种子) 的笛卡尔积；任务号由序号与种子确定，重复提交时跳过已存在的任务
+    def submit(self, param_sets: Iterable[Dict], seeds: Iterable[int], rounds: int = SWEEP_ROUNDS, num_players: int = SWEEP_PLAYERS) -> List[str]:
+        existing = set()
+        for state in ("pending", "claimed", "done", "failed"):
+            existing.update(self._task_ids(state))
+
+        submitted = []
+        seeds = list(seeds)
+        for index, params in enumerate(param_sets):
+            for seed in seeds:
+                task_id = f"task_{index:05d}_s{seed}"
+                if task_id in existing:
+                    continue
+                task = {"task_id": task_id, "params": params, "seed": seed, "rounds": rounds, "players": num_players, "attempt": 0, "errors": []}
+                self._write_json("pending", f"{task_id}.json", task)
+                submitted.append(task_id)
+        return submitted
+
+    # ✅ 领取：重命名成功即获得任务，失败（已被其他工作者领走）则尝试下一个
+    def claim(self, worker_id: str) -> Optional[Tuple[Dict, str]]:
+        for name in sorted(os.listdir(self.path("pending"))):
+            if not name.endswith(".json"):
+                continue
+            claim_path = self.path("claimed", f"{name[:-len('.json')]}@{worker_id}.json")
+            try:
+                os.rename(self.path("pending", name), claim_path)
+            except FileNotFoundError:
+                continue
+            os.utime(claim_path)  # 改名不更新修改时间，领取时即开始计算租约
+            return self._read_json(claim_path), claim_path
+        return None
+
+    # 心跳：刷新领取文件的修改时间；文件已不存在说明租约已被回收
+    @staticmethod
+    def heartbeat(claim_path: str) -> bool:
+        try:
+            os.utime(claim_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def has_result(self, task_id: str) -> bool:
+        return os.path.isdir(self.path("results", task_id))
+
+    def new_shard_dir(self, task_id: str) -> str:
+        shard_dir = self.path("tmp", f"{task_id}.{uuid.uuid4().hex}")
+        os.makedirs(shard_dir)
+        return shard_dir
+
+    # ✅ 发布分片：私有目录整体改名为 results/<任务>；已有结果时丢弃本次输出
+    def publish(self, task_id: str, shard_dir: str) -> bool:
+        try:
+            os.rename(shard_dir, self.path("results", task_id))
+            return True
+        except OSError:
+            if not self.has_result(task_id):
+                raise
+            shutil.rmtree(shard_dir, ignore_errors=True)
+            return False
+
+    def complete(self, task: Dict, claim_path: str):
+        try:
+            os.rename(claim_path, self.path("done", f"{task['task_id']}.json"))
+        except FileNotFoundError:
+            pass  # 租约已被回收：结果已发布，重新领取该任务的工作者会直接标记完成
+
+    # 任务失败或租约过期：尝试次数 +1 后退回 pending/，超出上限移入 failed/
+    def _retry(self, task: Dict, reason: str):
+        task = {**task, "attempt": task.get("attempt", 0) + 1, "errors": task.get("errors", []) + [reason]}
+        state = "failed" if task["attempt"] >= MAX_ATTEMPTS else "pending"
+        self._write_json(state, f"{task['task_id']}.json", task)
+
+    def fail(self, task: Dict, claim_path: str, reason: str) -> bool:
+        release_path = self.path("tmp", f"{os.path.basename(claim_path)}.released")
+        try:
+            os.rename(claim_path, release_path)
+        except FileNotFoundError:
+            return False  # 租约已被回收，由回收方负责重试
+        self._retry(task, reason)
+        os.remove(release_path)
+        return True
+
+    # ✅ 回收过期租约：先把领取文件改名到 tmp/（只有一个回收方能成功），再退回 pending/
+    def reap_expired(self, lease_seconds: float = LEASE_SECONDS) -> List[str]:
+        reaped = []
+        now = time.time()
+        for name in os.listdir(self.path("claimed")):
+            claim_path = self.path("claimed", name)
+            try:
+                if now - os.path.getmtime(claim_path) <= lease_seconds:
+                    continue
+                expired_path = self.path("tmp", f"{name}.expired.{uuid.uuid4().hex}")
+                os.rename(claim_path, expired_path)
+            except FileNotFoundError:
+                continue
+            task = self._read_json(expired_path)
+            if self.has_result(task["task_id"]):
+                self._write_json("done", f"{task['task_id']}.json", task)
+            else:
+                self._retry(task, f"租约过期（{name.split('@', 1)[-1][:-len('.json')]}）")
+            os.remove(expired_path)
+            reaped.append(task["task_id"])
+        return reaped
+
+    def status(self) -> Dict[str, int]:
+        return {state: len(self._task_ids(state)) for state in ("pending", "claimed", "done", "failed")}
+
+    # 已有任务且全部结束（完成或失败）；队列尚未提交任务时不算结束，先启动的工作者会等待
+    def is_finished(self) -> bool:
+        counts = self.status()
+        return counts["pending"] == 0 and counts["claimed"] == 0 and counts["done"] + counts["failed"] > 0
+
+
+# 后台心跳线程：任务运行期间定期刷新租约
+class _LeaseKeeper(threading.Thread):
+    def __init__(self, claim_path: str, interval: float = HEARTBEAT_INTERVAL):
+        super().__init__(daemon=True)
+        self.claim_path = claim_path
+        self.interval = interval
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if not WorkQueue.heartbeat(self.claim_path):
+                self.lost = True
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# ✅ 执行单个任务：日志逐局写入私有分片目录，汇总写 summary.json
+def run_task(queue: WorkQueue, task: Dict) -> str:
+    shard_dir = queue.new_shard_dir(task["task_id"])
+    try:
+        summary = run_configuration(task["params"], task["rounds"], task["players"], task["seed"], log_dir=shard_dir)
+        with open(os.path.join(shard_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump({"task_id": task["task_id"], **summary}, f, ensure_ascii=False)
+    except Exception:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        raise
+    return shard_dir
+
+
+# ✅ 工作者循环：回收过期租约 → 领取 → 运行（带心跳）→ 发布分片 → 标记完成
+# idle_exit：队列空闲（无待领取、无进行中任务）时退出；否则持续等待新任务
+def run_worker(queue: WorkQueue, worker_id: str = None, idle_exit: bool = True, poll_interval: float = POLL_INTERVAL) -> int:
+    worker_id = worker_id or default_worker_id()
+    completed = 0
+    while True:
+        queue.reap_expired()
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            if idle_exit and queue.is_finished():
+                return completed
+            time.sleep(poll_interval)
+            continue
+
+        task, claim_path = claimed
+        if queue.has_result(task["task_id"]):
+            queue.complete(task, claim_path)
+            continue
+
+        keeper = _LeaseKeeper(claim_path)
+        keeper.start()
+        start = time.time()
+        try:
+            shard_dir = run_task(queue, task)
+        except Exception as e:
+            keeper.stop()
+            queue.fail(task, claim_path, f"{type(e).__name__}: {e}")
+            print(f"⚠️ [{worker_id}] 任务 {task['task_id']} 失败（第 {task.get('attempt', 0) + 1} 次）：{e}")
+            continue
+        keeper.stop()
+
+        queue.publish(task["task_id"], shard_dir)
+        queue.complete(task, claim_path)
+        completed += 1
+        lease_note = "，租约曾丢失" if keeper.lost else ""
+        print(f"✅ [{worker_id}] 任务 {task['task_id']} 完成，用时 {time.time() - start:.1f} 秒{lease_note}")
+
+
+# 逐行读取分片日志（按 round_id 有序）
+def _iter_shard_log(path: str, task_id: str) -> Iterator[Tuple[tuple, Dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield (entry.get("round_id", 0), task_id), {"task_id": task_id, **entry}
+
+
+# ✅ 合并：各分片日志 k 路归并（按 round_id，同局按任务号），流式写出，内存与总日志量无关
+def merge_results(queue: WorkQueue, out_dir: str = None, names: List[str] = None) -> Dict[str, int]:
+    out_dir = out_dir or queue.path("merged")
+    os.makedirs(out_dir, exist_ok=True)
+    task_ids = sorted(os.listdir(queue.path("results")))
+
+    counts = {}
+    for name in names or LIVE_LOG_NAMES:
+        sources = [
+            _iter_shard_log(path, task_id)
+            for task_id in task_ids
+            for path in [os.path.join(queue.path("results", task_id), f"{name}.jsonl")]
+            if os.path.exists(path)
+        ]
+        count = 0
+        with open(os.path.join(out_dir, f"{name}.jsonl"), "w", encoding="utf-8") as f:
+            for _, entry in heapq.merge(*sources, key=lambda item: item[0]):
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                count += 1
+        counts[name] = count
+
+    summaries = []
+    for task_id in task_ids:
+        summary_path = os.path.join(queue.path("results", task_id), "summary.json")
+        if os.path.exists(summary_path):
+            summaries.append(WorkQueue._read_json(summary_path))
+    if summaries:
+        write_results(summaries, os.path.join(out_dir, "summary.csv"))
+    counts["summary"] = len(summaries)
+    return counts
+
+
+# ✅ 协调者：提交任务后持续回收过期租约，全部完成后合并
+def run_coordinator(
+    queue: WorkQueue,
+    param_sets: List[Dict],
+    seeds: List[int] = QUEUE_SEEDS,
+    rounds: int = SWEEP_ROUNDS,
+    num_players: int = SWEEP_PLAYERS,
+    poll_interval: float = POLL_INTERVAL
+) -> Dict[str, int]:
+    submitted = queue.submit(param_sets, seeds, rounds, num_players)
+    print(f"\n🗂️ 已提交 {len(submitted)} 个任务到 {queue.root}（{len(param_sets)} 组参数 × {len(seeds)} 个种子），等待工作者领取...")
+
+    last = None
+    while not queue.is_finished():
+        reaped = queue.reap_expired()
+        if reaped:
+            print(f"\n♻️ 回收过期租约：{', '.join(reaped)}")
+        counts = queue.status()
+        if counts != last:
+            print(f"\r⏳ 待领取 {counts['pending']} / 运行中 {counts['claimed']} / 完成 {counts['done']} / 失败 {counts['failed']}", end="", flush=True)
+            last = counts
+        time.sleep(poll_interval)
+    print()
+
+    counts = queue.status()
+    if counts["failed"]:
+        print(f"⚠️ {counts['failed']} 个任务超出重试次数，详见 {queue.path('failed')}")
+    merged = merge_results(queue)
+    print(f"✅ 合并完成：{merged['summary']} 个任务汇总，日志条数 { {k: v for k, v in merged.items() if k != 'summary'} }")
+    return merged
+
+
+def main():
+    role = sys.argv[1] if len(sys.argv) > 1 else "coordinator"
+    queue = WorkQueue(sys.argv[2] if len(sys.argv) > 2 else WORK_QUEUE_DIR)
+    if role == "worker":
+        completed = run_worker(queue)
+        print(f"👷 工作者退出，共完成 {completed} 个任务")
+    elif role == "merge":
+        print(f"✅ 合并完成：{merge_results(queue)}")
+    else:
+        run_coordinator(queue, grid_search(SWEEP_SPACE))
+
+if __name__ == "__main__":
+    main()